@@ -1,32 +1,127 @@
+import json
 import os
 import sys
 
 # Add backend directory to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from flask import Flask, jsonify, send_from_directory
+import click
+from flask import Flask, jsonify
+from flask.cli import AppGroup
 from flask_cors import CORS
 from config import Config
+import database
 from database import init_db
-
-from routes.auth import auth_bp
-from routes.campaigns import campaigns_bp
-from routes.content import content_bp
-from routes.analytics import analytics_bp
-from routes.chat import chat_bp
-from routes.calendar import calendar_bp
-from routes.auto_reply import auto_reply_bp
-
-# Initialize database on app startup
-init_db()
+from compression import compress_response
+import instrumentation
+import replicas
+from static_assets import AssetPipeline
 
 def create_app():
-    app = Flask(__name__, static_folder="../frontend", static_url_path="")
+    # Static files are served by the asset pipeline below, not Flask's static route
+    app = Flask(__name__, static_folder=None)
 
     # CORS
     CORS(app, resources={r"/api/*": {"origins": [Config.FRONTEND_URL]}}, supports_credentials=True)
 
-    # Register blueprints
+    # Per-request spans, /api/metrics and the slow-request profiler
+    instrumentation.init_app(app)
+
+    # Read-your-writes for read replicas; registered first so it sees the request committed
+    replicas.init_app(app)
+
+    # One connection and transaction per request, committed after the view (see request_db)
+    database.init_app(app)
+
+    # Schema setup is a one-time deploy step (`flask --app backend.app migrate`), not a per-worker one
+    if Config.AUTO_MIGRATE:
+        init_db()
+
+    @app.cli.command("migrate")
+    def migrate():
+        """Create or upgrade the database schema."""
+        init_db()
+
+    @app.cli.command("scheduler")
+    def run_scheduler():
+        """Publish scheduled content and calendar events (runs until interrupted)."""
+        from scheduler import Scheduler
+        try:
+            Scheduler().run()
+        except KeyboardInterrupt:
+            pass
+
+    @app.cli.command("sweep-tokens")
+    def sweep_tokens():
+        """Delete expired refresh tokens."""
+        import refresh_tokens
+        from database import get_db
+        db = get_db()
+        print(f"Removed {refresh_tokens.sweep(db)} expired refresh tokens")
+        db.close()
+
+    @app.cli.command("train-engagement")
+    @click.option("--full", is_flag=True, help="rebuild from every settled post instead of adding new ones")
+    def train_engagement(full):
+        """Fold newly settled posts into the engagement model."""
+        from services import engagement
+        added = engagement.retrain(full)
+        if added is None:
+            raise click.ClickException("not retrained: another process is retraining, or the database is Postgres")
+        print(f"Added {added} posts to the engagement model")
+
+    shards_cli = AppGroup("shards", help="Inspect tenant shards and move tenants between them.")
+
+    @shards_cli.command("list")
+    def list_shards():
+        """Tenants, rows and file size per shard."""
+        import sharding
+        for s in sharding.stats():
+            print(f"{s['shard']:<16}{s['tenants']:>8} tenants{s['rows']:>10} rows{s['bytes'] / 1e6:>10.1f} MB")
+
+    @shards_cli.command("move")
+    @click.argument("user_id", type=int)
+    @click.argument("shard")
+    @click.option("--grace", type=float, default=None, help="seconds to let in-flight requests finish")
+    def move_tenant(user_id, shard, grace):
+        """Move USER_ID's rows to SHARD (created if new); the tenant gets 503s meanwhile."""
+        import sharding
+        try:
+            copied = sharding.move_tenant(user_id, shard, grace)
+        except sharding.TenantMoveError as e:
+            raise click.ClickException(str(e))
+        print(f"Moved user {user_id} to {shard} ({copied} rows)")
+
+    @shards_cli.command("query")
+    @click.argument("sql")
+    def query_shards(sql):
+        """Run a read-only SQL query on every shard and print the rows, tagged with their shard."""
+        import sharding
+        for shard, rows in sharding.query_all(sql):
+            for row in rows:
+                print(shard, json.dumps(dict(row), default=str))
+
+    app.cli.add_command(shards_cli)
+
+    # Scheduled publishing inside the web workers (gunicorn's post_fork restarts it per worker)
+    if Config.SCHEDULER_ENABLED:
+        import scheduler
+        scheduler.start_background()
+
+    # Start loading the engagement model now, so the first content request doesn't wait for it
+    from services import get_engagement_model
+    get_engagement_model()
+
+    # Register blueprints (imported here so importing this module stays cheap)
+    from routes.auth import auth_bp
+    from routes.campaigns import campaigns_bp
+    from routes.content import content_bp
+    from routes.analytics import analytics_bp
+    from routes.chat import chat_bp
+    from routes.calendar import calendar_bp
+    from routes.auto_reply import auto_reply_bp
+    from routes.search import search_bp
+
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(campaigns_bp, url_prefix="/api/campaigns")
     app.register_blueprint(content_bp, url_prefix="/api/content")
@@ -34,21 +129,25 @@ def create_app():
     app.register_blueprint(chat_bp, url_prefix="/api/chat")
     app.register_blueprint(calendar_bp, url_prefix="/api/calendar")
     app.register_blueprint(auto_reply_bp, url_prefix="/api/auto-reply")
+    app.register_blueprint(search_bp, url_prefix="/api/search")
 
     # Health check
     @app.route("/api/health")
     def health():
         return jsonify({"status": "ok", "service": "AI Marketing Command Center", "version": "1.0.0"})
 
+    # Fingerprint and pre-compress frontend assets once per process
+    frontend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend"))
+    assets = AssetPipeline(frontend_dir, Config.STATIC_BUILD_DIR).build()
+
     # Serve frontend for all non-API routes (SPA routing)
     @app.route("/", defaults={"path": ""})
     @app.route("/<path:path>")
     def serve_frontend(path):
-        frontend_dir = os.path.join(os.path.dirname(__file__), "..", "frontend")
-        frontend_dir = os.path.abspath(frontend_dir)
-        if path and os.path.exists(os.path.join(frontend_dir, path)):
-            return send_from_directory(frontend_dir, path)
-        return send_from_directory(frontend_dir, "index.html")
+        return assets.serve(path)
+
+    # Compress large API responses
+    app.after_request(compress_response)
 
     # Error handlers
     @app.errorhandler(404)
@@ -61,11 +160,18 @@ def create_app():
 
     return app
 
-# Create app instance for gunicorn
-app = create_app()
+# App instance for `gunicorn backend.app:app`, built on first access rather than at import
+def __getattr__(name):
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     print("\nInitialising AI Marketing Command Center...")
+    init_db()
+    app = create_app()
     print("All systems ready!")
     print(f"Server running on port {Config.PORT}")
     app.run(host="0.0.0.0", port=Config.PORT, debug=Config.DEBUG)
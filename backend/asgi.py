@@ -0,0 +1,16 @@
+"""ASGI entry point for async-capable servers, e.g.
+
+    gunicorn -k uvicorn.workers.UvicornWorker backend.asgi:application
+
+Each request runs the WSGI app on asgiref's thread pool, so slow Gemini/DB calls
+no longer pin the worker. Requires the optional `asgiref` and `uvicorn` packages.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app
+
+application = WsgiToAsgi(create_app())
@@ -0,0 +1,95 @@
+"""FAQ auto-reply benchmark: BM25 index build, incremental update and lookup latency.
+
+Generates N synthetic FAQ questions for one user, indexes them with services.faq_index.FAQIndex
+and times best_match() on short customer messages.
+
+    python backend/benchmarks/faq_lookup.py --faqs 50000 --lookups 5000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+TEMPLATES = [
+    "What is the {a} for {b}?",
+    "How do I {a} my {b}?",
+    "Can I {a} {b} online?",
+    "Do you offer {a} on {b}?",
+    "Where can I find {a} {b} details?",
+    "Is {a} included with {b}?",
+]
+
+def build_vocabulary(rng, size):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 9))))
+    return sorted(words)
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--faqs", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from services.faq_index import FAQIndex
+
+    rng = random.Random(args.seed)
+    vocabulary = build_vocabulary(rng, args.vocabulary)
+    faqs = [{
+        "id": i,
+        "question": rng.choice(TEMPLATES).format(a=rng.choice(vocabulary), b=rng.choice(vocabulary)),
+        "answer": f"Answer {i}",
+    } for i in range(1, args.faqs + 1)]
+
+    index = FAQIndex()
+    start = time.perf_counter()
+    for faq in faqs:
+        index.add(faq)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for faq in faqs[:1000]:
+        index.remove(faq["id"])
+        index.add(faq)
+    update_us = (time.perf_counter() - start) / 2000 * 1e6
+
+    timings, hits = [], 0
+    for _ in range(args.lookups):
+        target = rng.choice(faqs)["question"].rstrip("?")
+        message = f"hi there, {target.lower()} please? thanks {rng.choice(vocabulary)}"
+        start = time.perf_counter()
+        match = index.best_match(message)
+        timings.append((time.perf_counter() - start) * 1000)
+        hits += match is not None
+    timings.sort()
+
+    summary = {
+        "faqs": args.faqs,
+        "build_ms": round(build_ms, 1),
+        "update_us": round(update_us, 1),
+        "lookup_p50_ms": round(percentile(timings, 50), 4),
+        "lookup_p95_ms": round(percentile(timings, 95), 4),
+        "lookup_p99_ms": round(percentile(timings, 99), 4),
+        "match_rate": round(hits / args.lookups, 3),
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{args.faqs} FAQs: built in {summary['build_ms']} ms, add/remove {summary['update_us']} us each")
+    print(f"  lookup p50 {summary['lookup_p50_ms']:.4f}  p95 {summary['lookup_p95_ms']:.4f}  "
+          f"p99 {summary['lookup_p99_ms']:.4f} ms  matched {summary['match_rate']:.1%}")
+
+if __name__ == "__main__":
+    main()
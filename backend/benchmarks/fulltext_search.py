@@ -0,0 +1,104 @@
+"""Full-text search benchmark: index build time and query latency on a synthetic corpus.
+
+Builds a scratch SQLite database with N content items spread over M users (indexed through
+the same triggers the app uses), then times search.search() for several query shapes.
+
+    python backend/benchmarks/fulltext_search.py --docs 1000000 --users 1000 --queries 200
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def build_vocabulary(rng, size):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 9))))
+    return sorted(words)
+
+def populate(db, rng, vocabulary, docs, users, chunk=50000):
+    # Zipf-like word frequencies so there are both very common and very rare terms
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    db.executemany("INSERT INTO users (id, email, name) VALUES (?, ?, ?)",
+                   [(u, f"user{u}@bench.local", f"User {u}") for u in range(1, users + 1)])
+    start = time.perf_counter()
+    for offset in range(0, docs, chunk):
+        rows = []
+        for _ in range(min(chunk, docs - offset)):
+            words = rng.choices(vocabulary, cum_weights=cum_weights, k=36)
+            rows.append((rng.randint(1, users), "instagram", "social_post", " ".join(words[:6]), " ".join(words[6:])))
+        db.executemany(
+            "INSERT INTO content_items (user_id, channel, content_type, title, body) VALUES (?, ?, ?, ?, ?)", rows)
+        db.commit()
+    return time.perf_counter() - start
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200, help="queries per shape")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="database path (default: a temporary file)")
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="search-bench-"), "bench.db")
+    os.environ["DATABASE_PATH"] = path
+    sys.path.insert(0, BACKEND_DIR)
+    from database import get_db, init_db
+    import search
+
+    init_db()
+    rng = random.Random(args.seed)
+    vocabulary = build_vocabulary(rng, args.vocabulary)
+    db = get_db()
+    build_seconds = populate(db, rng, vocabulary, args.docs, args.users)
+
+    shapes = {
+        "common_term": lambda: rng.choice(vocabulary[:20]),
+        "rare_term": lambda: rng.choice(vocabulary[-5000:]),
+        "two_terms": lambda: f"{rng.choice(vocabulary[:200])} {rng.choice(vocabulary[:2000])}",
+        "prefix": lambda: rng.choice(vocabulary[:500])[:3],
+    }
+    summary = {"docs": args.docs, "users": args.users, "index_build_s": round(build_seconds, 2),
+               "db_mb": round(os.path.getsize(path) / 1e6, 1), "queries": {}}
+    for name, make_query in shapes.items():
+        timings, hits = [], []
+        for _ in range(args.queries):
+            query = make_query()
+            start = time.perf_counter()
+            results, _ = search.search(db, rng.randint(1, args.users), query, limit=20)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits.append(len(results))
+        timings.sort()
+        summary["queries"][name] = {
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "mean_hits": round(statistics.mean(hits), 1),
+        }
+    db.close()
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{args.docs} docs / {args.users} users: index built in {summary['index_build_s']}s, "
+          f"database {summary['db_mb']} MB ({path})")
+    for name, s in summary["queries"].items():
+        print(f"  {name:<12} p50 {s['p50_ms']:>8.2f}  p95 {s['p95_ms']:>8.2f}  "
+              f"p99 {s['p99_ms']:>8.2f} ms  hits {s['mean_hits']}")
+
+if __name__ == "__main__":
+    main()
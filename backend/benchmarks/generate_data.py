@@ -0,0 +1,381 @@
+"""Synthetic data: fill a fresh SQLite database with seeded, realistic rows for benchmarks.
+
+Creates the schema with init_sqlite_db, then bulk-inserts --users tenants with their campaigns
+(and channels), content items (and hashtags), per-post reach, engagement, clicks and conversions
+for the published ones, calendar events, analytics events, chat history, auto-reply rules and
+FAQs. Per-table sizes are means per tenant; tenant sizes are skewed (lognormal) so a few large
+accounts sit among many small ones. Text comes from a seeded AIService, and timestamps are
+spread over --days from --start rather than taken from the clock, so the same arguments always
+produce the same database file (its sha256 is printed at the end). Every tenant's password is
+"password".
+
+Each table has its own random stream, so changing one table's size leaves the others' rows
+unchanged. The search index and content ranking triggers are dropped during the load and both
+are built once at the end, with the ranking windows ending on the last generated day. To
+benchmark shards, generate into the main database and move tenants with `flask shards move`.
+
+    python backend/benchmarks/generate_data.py --db /tmp/bench.db --users 2000 --seed 42
+"""
+import argparse
+import array
+import datetime
+import hashlib
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHANNELS = ["instagram", "facebook", "twitter", "linkedin", "email", "sms"]
+CONTENT_TYPES = {"email": ["newsletter", "promotional"], "sms": ["promotional"]}
+TONES = ["professional", "casual", "urgent", "playful", "inspirational"]
+TOPICS = ["spring sale", "product launch", "customer success", "behind the scenes", "holiday offers",
+          "new feature", "webinar invite", "loyalty program", "free shipping", "industry trends",
+          "brand anniversary", "community event"]
+GOALS = ["awareness", "engagement", "leads", "sales", "retention"]
+AUDIENCES = ["Millennials in urban areas", "Small business owners", "Parents of young children",
+             "B2B decision makers", "Students", "Fitness enthusiasts", "Returning customers"]
+FIRST_NAMES = ["Ava", "Ben", "Chloe", "Dev", "Elena", "Farid", "Grace", "Hiro", "Isla", "Jonas", "Kemi",
+               "Liam", "Maya", "Noah", "Omar", "Priya", "Quinn", "Rosa", "Sam", "Tariq", "Uma", "Yusuf"]
+LAST_NAMES = ["Adams", "Brooks", "Chen", "Diaz", "Evans", "Fischer", "Garcia", "Haddad", "Ito", "Jones",
+              "Khan", "Lopez", "Meyer", "Nguyen", "Okafor", "Patel", "Rossi", "Silva", "Tanaka", "Walsh"]
+CHAT_PROMPTS = ["How do I plan a campaign for a product launch?", "What content works best on LinkedIn?",
+                "How are my analytics looking?", "When should I schedule posts?", "Who is my audience?",
+                "How should I split my budget?", "Hello!", "Any tips for better captions?"]
+FAQ_TOPICS = [("shipping", "Do you ship internationally?", "Yes, we ship to over 40 countries."),
+              ("shipping", "How long does delivery take?", "Orders arrive within 3 to 5 business days."),
+              ("billing", "What payment methods do you accept?", "All major cards, PayPal and bank transfer."),
+              ("billing", "Can I get a refund?", "Yes, within 30 days of purchase, no questions asked."),
+              ("account", "How do I reset my password?", "Use the Forgot password link on the login page."),
+              ("account", "Can I change my email address?", "Yes, under Settings, then Account."),
+              ("general", "What are your opening hours?", "Monday to Friday, 9 AM to 6 PM."),
+              ("general", "Do you offer student discounts?", "Students get 15% off with a valid ID."),
+              ("product", "Is the product waterproof?", "It is splash resistant, not waterproof."),
+              ("product", "Does it come with a warranty?", "Every product has a two-year warranty.")]
+RULE_KEYWORDS = [("price", "Our plans start at $29/month."), ("refund", "Email refunds@brand.com with your order."),
+                 ("hours", "We're open 9 to 6 on weekdays."), ("discount", "Sign up to our newsletter for 10% off."),
+                 ("shipping", "Free shipping on orders over $50."), ("cancel", "You can cancel anytime in Settings.")]
+# Hidden effects behind the per-post metrics: by channel, tone and 4-hour block of the day
+POST_LIFT = {
+    "channel": {"instagram": 1.4, "facebook": 1.0, "twitter": 0.7, "linkedin": 0.9, "email": 1.2, "sms": 0.5},
+    "tone": {"professional": 1.0, "casual": 1.1, "urgent": 0.9, "playful": 1.2, "inspirational": 1.05},
+    "hour": [0.4, 0.9, 1.2, 1.0, 1.3, 0.8],
+}
+METRICS = [("impressions", 200, 20000), ("reach", 100, 12000), ("clicks", 5, 900), ("conversions", 0, 60),
+           ("engagement_rate", 0.5, 12.0), ("revenue", 0, 2500)]
+
+def password_hash(password, method, salt):
+    """werkzeug's "method$salt$hash" with a chosen salt, so the same seed gives the same hash."""
+    name, *params = method.split(":")
+    if name == "scrypt" and len(params) == 3:
+        n, r, p = map(int, params)
+        digest = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=132 * n * r * p)
+    elif name == "pbkdf2" and len(params) == 2:
+        digest = hashlib.pbkdf2_hmac(params[0], password.encode(), salt.encode(), int(params[1]))
+    else:
+        raise ValueError(f"--password-method needs all parameters spelled out, e.g. scrypt:32768:8:1 (got {method})")
+    return f"{method}${salt}${digest.hex()}"
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.seed = args.seed
+        self.start = datetime.datetime.fromisoformat(args.start)
+        self.span = args.days * 86400
+
+    def rng(self, stream):
+        # str seeds hash with sha512, not hash(), so they're stable across runs
+        return random.Random(f"{self.seed}:{stream}")
+
+    def when(self, rng):
+        return self.start + datetime.timedelta(seconds=rng.randrange(self.span))
+
+    def plan(self):
+        """Rows per tenant per table, skewed so a few tenants are much larger than most."""
+        rng = self.rng("sizes")
+        tables = ("campaigns", "content", "events", "analytics", "chat", "rules", "faqs")
+        sizes = []
+        for _ in range(self.args.users):
+            # mean ~1, heavy right tail capped at 10x
+            weight = min(rng.lognormvariate(-0.32, 0.8), 10)
+            sizes.append({t: round(getattr(self.args, t) * weight) for t in tables})
+        return sizes
+
+    def text_pools(self):
+        from services.ai_service import AIService
+        ai = AIService(self.seed)
+        content = []
+        for channel in CHANNELS:
+            for i in range(self.args.pool):
+                topic = TOPICS[i % len(TOPICS)]
+                content_type = ai.random.choice(CONTENT_TYPES.get(channel, ["social_post"]))
+                tone = ai.random.choice(TONES)
+                result = ai.generate_content(channel, content_type, topic, tone, "Brand")
+                content.append((channel, content_type, tone, result["title"] or topic.title(), result["body"],
+                                result["hashtags"]))
+        chat = [(prompt, ai.chat_response(prompt)) for prompt in CHAT_PROMPTS for _ in range(4)]
+        calendar = ai.generate_calendar(0, 1, 2025, [])["events"]
+        return content, chat, calendar
+
+    def tables(self, sizes, method):
+        """[(table, INSERT statement, row generator)] in foreign-key order."""
+        content_pool, chat_pool, calendar_pool = self.text_pools()
+        stamp = lambda t: t.strftime("%Y-%m-%d %H:%M:%S")
+        users = range(1, len(sizes) + 1)
+
+        def users_rows():
+            rng = self.rng("users")
+            # routes.auth hashes password + the users.salt column; one hash serves every tenant
+            salt = f"{rng.getrandbits(128):032x}"
+            hashed = password_hash("password" + salt, method, f"{rng.getrandbits(64):016x}")
+            for user_id in users:
+                name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                created = stamp(self.when(rng))
+                yield user_id, f"user{user_id}@example.com", name, hashed, salt, created, created
+
+        campaign_ranges = {}
+
+        def campaign_rows():
+            rng = self.rng("campaigns")
+            campaign_id = 0
+            for user_id, size in zip(users, sizes):
+                campaign_ranges[user_id] = (campaign_id + 1, size["campaigns"])
+                for _ in range(size["campaigns"]):
+                    campaign_id += 1
+                    topic = rng.choice(TOPICS)
+                    start = self.when(rng)
+                    created = stamp(start - datetime.timedelta(days=rng.randint(1, 30)))
+                    yield (campaign_id, user_id, f"{topic.title()} {start.year}", f"Campaign for our {topic}",
+                           rng.choice(GOALS), round(rng.uniform(200, 50000), 2), rng.choice(AUDIENCES),
+                           rng.choice(["draft", "active", "active", "paused", "completed"]), start.date().isoformat(),
+                           (start + datetime.timedelta(days=rng.randint(7, 90))).date().isoformat(), created, created)
+
+        def campaign_channel_rows():
+            rng = self.rng("campaign_channels")
+            for user_id in users:
+                first, count = campaign_ranges[user_id]
+                for campaign_id in range(first, first + count):
+                    for position, channel in enumerate(rng.sample(CHANNELS, rng.randint(1, 3))):
+                        yield campaign_id, user_id, channel, position
+
+        def pick_campaign(rng, user_id):
+            first, count = campaign_ranges[user_id]
+            return first + rng.randrange(count) if count and rng.random() < 0.7 else None
+
+        # (content id - 1) -> owner and pool entry, for the hashtag pass
+        content_users, content_texts = array.array("q"), array.array("I")
+        content_published = []  # (content id, published_at) of published items
+
+        def content_rows():
+            rng = self.rng("content")
+            content_id = 0
+            for user_id, size in zip(users, sizes):
+                for _ in range(size["content"]):
+                    content_id += 1
+                    text = rng.randrange(len(content_pool))
+                    channel, content_type, tone, title, body, _hashtags = content_pool[text]
+                    created = self.when(rng)
+                    status = rng.choices(["draft", "scheduled", "published", "failed"], [30, 15, 50, 5])[0]
+                    scheduled = published = None
+                    if status == "scheduled":
+                        # Due after the generated period, so a scheduler doesn't publish them at once
+                        scheduled = (self.start + datetime.timedelta(seconds=self.span + rng.randrange(86400 * 30))
+                                     ).isoformat(timespec="seconds")
+                    elif status == "published":
+                        published = (created + datetime.timedelta(hours=rng.randint(1, 72))).isoformat()
+                        content_published.append((content_id, published))
+                    content_users.append(user_id)
+                    content_texts.append(text)
+                    yield (content_id, user_id, pick_campaign(rng, user_id), channel, content_type, title, body, tone,
+                           status, scheduled, published, round(rng.uniform(0, 10), 2) if published else 0,
+                           stamp(created), stamp(created))
+
+        def hashtag_rows():
+            for content_id, (user_id, text) in enumerate(zip(content_users, content_texts), 1):
+                seen = set()
+                for position, hashtag in enumerate(content_pool[text][5]):
+                    tag = hashtag.lstrip("#").lower()
+                    if tag and tag not in seen:
+                        seen.add(tag)
+                        yield content_id, user_id, hashtag, tag, position
+
+        def event_rows():
+            rng = self.rng("events")
+            for user_id, size in zip(users, sizes):
+                for _ in range(size["events"]):
+                    event = rng.choice(calendar_pool)
+                    day = self.when(rng)
+                    yield (user_id, pick_campaign(rng, user_id), event["title"], event["description"],
+                           day.date().isoformat(), event["event_time"], event["channel"],
+                           rng.choice(["planned", "planned", "published"]), event["color"], stamp(day))
+
+        def post_metric_rows():
+            # Reach and engagement per published post, shaped by channel, tone, weekday and hour
+            # so there is something for the engagement model to learn
+            rng = self.rng("post_metrics")
+            for content_id, published in content_published:
+                channel, _, tone, _, _, _ = content_pool[content_texts[content_id - 1]]
+                when = datetime.datetime.fromisoformat(published)
+                lift = POST_LIFT["channel"][channel] * POST_LIFT["tone"][tone] * POST_LIFT["hour"][when.hour // 4]
+                lift *= 0.8 if when.weekday() >= 5 else 1.0
+                recorded = stamp(when + datetime.timedelta(days=1))
+                user_id = content_users[content_id - 1]
+                reach = round(6000 * lift * rng.lognormvariate(0, 0.4))
+                engagement = round(max(0.1, 4.0 * lift + rng.gauss(0, 0.8)), 2)
+                yield user_id, None, content_id, "reach", reach, channel, recorded
+                yield user_id, None, content_id, "engagement_rate", engagement, channel, recorded
+                clicks = round(reach * engagement / 100 * rng.uniform(0.1, 0.4))
+                yield user_id, None, content_id, "clicks", clicks, channel, recorded
+                yield user_id, None, content_id, "conversions", round(clicks * rng.uniform(0.01, 0.08)), channel, recorded
+
+        def analytics_rows():
+            rng = self.rng("analytics")
+            for user_id, size in zip(users, sizes):
+                for _ in range(size["analytics"]):
+                    metric, low, high = rng.choice(METRICS)
+                    value = round(rng.uniform(low, high), 2) if isinstance(low, float) else rng.randint(low, high)
+                    yield (user_id, pick_campaign(rng, user_id), metric, value, rng.choice(CHANNELS),
+                           stamp(self.when(rng)))
+
+        def chat_rows():
+            rng = self.rng("chat")
+            for user_id, size in zip(users, sizes):
+                at = self.when(rng)
+                for _ in range(size["chat"] // 2):
+                    prompt, reply = rng.choice(chat_pool)
+                    at += datetime.timedelta(minutes=rng.randint(1, 600))
+                    yield user_id, "user", prompt, stamp(at)
+                    yield user_id, "assistant", reply, stamp(at + datetime.timedelta(seconds=2))
+
+        def rule_rows():
+            rng = self.rng("rules")
+            for user_id, size in zip(users, sizes):
+                for keyword, reply in rng.sample(RULE_KEYWORDS, min(size["rules"], len(RULE_KEYWORDS))):
+                    yield (user_id, keyword, reply, rng.choice(["all", *CHANNELS]), int(rng.random() < 0.9),
+                           rng.randint(0, 500), stamp(self.when(rng)))
+
+        def faq_rows():
+            rng = self.rng("faqs")
+            for user_id, size in zip(users, sizes):
+                for i in range(size["faqs"]):
+                    category, question, answer = FAQ_TOPICS[i % len(FAQ_TOPICS)]
+                    if i >= len(FAQ_TOPICS):
+                        product = rng.choice(TOPICS)
+                        question, answer = f"{question[:-1]} for the {product}?", f"{answer} This covers the {product}."
+                    yield user_id, question, answer, category, rng.randint(0, 200), stamp(self.when(rng))
+
+        return [
+            ("users", "INSERT INTO users (id, email, name, password_hash, salt, created_at, last_login) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?)", users_rows),
+            ("campaigns", "INSERT INTO campaigns (id, user_id, name, description, goal, budget, target_audience, "
+                          "status, start_date, end_date, created_at, updated_at) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", campaign_rows),
+            ("campaign_channels", "INSERT INTO campaign_channels (campaign_id, user_id, channel, position) "
+                                  "VALUES (?, ?, ?, ?)", campaign_channel_rows),
+            ("content_items", "INSERT INTO content_items (id, user_id, campaign_id, channel, content_type, title, "
+                              "body, tone, status, scheduled_at, published_at, engagement_score, created_at, "
+                              "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", content_rows),
+            ("content_hashtags", "INSERT INTO content_hashtags (content_id, user_id, hashtag, tag, position) "
+                                 "VALUES (?, ?, ?, ?, ?)", hashtag_rows),
+            ("calendar_events", "INSERT INTO calendar_events (user_id, campaign_id, title, description, event_date, "
+                                "event_time, channel, status, color, created_at) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", event_rows),
+            ("post_metrics", "INSERT INTO analytics (user_id, campaign_id, content_id, metric_type, metric_value, "
+                             "channel, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?)", post_metric_rows),
+            ("analytics", "INSERT INTO analytics (user_id, campaign_id, metric_type, metric_value, channel, "
+                          "recorded_at) VALUES (?, ?, ?, ?, ?, ?)", analytics_rows),
+            ("chat_messages", "INSERT INTO chat_messages (user_id, role, message, created_at) VALUES (?, ?, ?, ?)",
+             chat_rows),
+            ("auto_reply_rules", "INSERT INTO auto_reply_rules (user_id, trigger_keyword, reply_text, channel, "
+                                 "is_active, match_count, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)", rule_rows),
+            ("faqs", "INSERT INTO faqs (user_id, question, answer, category, usage_count, created_at) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", faq_rows),
+        ]
+
+def load(db, sql, rows, chunk_size=10000):
+    """executemany in chunks, so only one chunk of rows is in memory at a time."""
+    count = 0
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        db.executemany(sql, chunk)
+        count += len(chunk)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="SQLite file to create")
+    parser.add_argument("--force", action="store_true", help="replace --db if it exists")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--campaigns", type=int, default=10, help="mean per tenant (likewise below)")
+    parser.add_argument("--content", type=int, default=150)
+    parser.add_argument("--events", type=int, default=60)
+    parser.add_argument("--analytics", type=int, default=1000)
+    parser.add_argument("--chat", type=int, default=40)
+    parser.add_argument("--rules", type=int, default=3)
+    parser.add_argument("--faqs", type=int, default=15)
+    parser.add_argument("--pool", type=int, default=40, help="generated texts per channel")
+    parser.add_argument("--start", default="2025-01-01", help="first timestamp (ISO date)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--password-method", default="scrypt:32768:8:1")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            sys.exit(f"{args.db} exists (use --force to replace it)")
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    # Plain single-file SQLite, and no live LLM calls for the chat replies
+    os.environ.update(DATABASE_PATH=os.path.abspath(args.db), SHARD_COUNT="0", SQLITE_POOL_SIZE="0",
+                      GEMINI_API_KEY="")
+    sys.path.insert(0, BACKEND_DIR)
+    from database import SEARCH_SOURCES, init_sqlite_db, init_sqlite_rankings, init_sqlite_search
+
+    init_sqlite_db()
+    db = sqlite3.connect(args.db)
+    db.execute("PRAGMA synchronous = OFF")
+    db.execute("PRAGMA journal_mode = MEMORY")
+    # Index once at the end instead of through a trigger per row
+    for table in {table for _, table, _, _ in SEARCH_SOURCES.values()}:
+        for op in ("ai", "au", "ad"):
+            db.execute(f"DROP TRIGGER IF EXISTS {table}_search_{op}")
+    db.execute("DROP TABLE search_index")
+    db.execute("DROP TRIGGER analytics_rankings_ai")
+    for table in ("content_rankings", "ranking_windows", "content_metric_days"):
+        db.execute(f"DROP TABLE {table}")
+
+    generator = Generator(args)
+    started = time.perf_counter()
+    total = 0
+    for name, sql, rows in generator.tables(generator.plan(), args.password_method):
+        t = time.perf_counter()
+        count = load(db, sql, rows())
+        db.commit()
+        total += count
+        print(f"{name:<20}{count:>12,} rows {time.perf_counter() - t:>8.1f}s")
+
+    t = time.perf_counter()
+    init_sqlite_search(db.cursor())
+    db.commit()
+    print(f"{'search_index':<20}{'':>17}{time.perf_counter() - t:>8.1f}s")
+    t = time.perf_counter()
+    last_day = datetime.date.fromisoformat(args.start) + datetime.timedelta(days=args.days - 1)
+    init_sqlite_rankings(db.cursor(), today=last_day)
+    db.commit()
+    print(f"{'content_rankings':<20}{'':>17}{time.perf_counter() - t:>8.1f}s")
+    db.execute("ANALYZE")
+    db.commit()
+    db.close()
+
+    digest = hashlib.sha256()
+    with open(args.db, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    print(f"{total:,} rows in {time.perf_counter() - started:.1f}s, {os.path.getsize(args.db) / 1e6:.1f} MB, "
+          f"sha256 {digest.hexdigest()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Load test: simulated tenants running the product's traffic mix against a server.
+
+Each virtual user signs up, adds a few FAQs and an auto-reply rule, then loops over weighted
+tasks (see TASKS) with a think time between them, like a locust user class: dashboard loads
+across the seven analytics endpoints, list views, chat, content generation, auto-reply bursts,
+token refreshes, logins, campaign creation and calendar generation. Users start at
+--spawn-rate per second. Without --url a gunicorn server is started on a scratch database.
+
+Reports requests/s and p50/p95/p99 per endpoint; 429/503 answers are counted as rejected,
+not as latency samples. --out saves the run as JSON, --baseline compares against a saved run
+and --max-regression makes the exit status fail when p95 or throughput got worse by more
+than that percentage.
+
+    python backend/benchmarks/load_test.py --users 50 --spawn-rate 10 --duration 60 --out run.json
+    python backend/benchmarks/load_test.py --users 50 --duration 60 --baseline run.json --max-regression 15
+"""
+import argparse
+import datetime
+import http.cookiejar
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from worker_classes import _free_port, percentile, start_server
+
+ANALYTICS = ["overview", "engagement", "channels", "top-content", "funnel", "demographics", "heatmap"]
+CHANNELS = ["instagram", "facebook", "twitter", "linkedin", "email", "tiktok"]
+CUSTOMER_MESSAGES = ["Do you ship abroad?", "What are your opening hours?", "How do I get a refund?",
+                     "Is there a discount for students?", "My order hasn't arrived", "Can I change my address?"]
+REJECTED = (429, 503)
+# Endpoints with fewer samples than this in either run are left out of baseline comparisons
+MIN_COMPARE_REQUESTS = 20
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, name, status, elapsed_ms):
+        with self._lock:
+            s = self.endpoints.setdefault(name, {"ms": [], "rejected": 0, "errors": 0})
+            if status in REJECTED:
+                s["rejected"] += 1
+            elif status == 0 or status >= 400:
+                s["errors"] += 1
+            else:
+                s["ms"].append(elapsed_ms)
+
+    def summary(self, wall):
+        def row(ms, rejected, errors):
+            ms = sorted(ms)
+            return {
+                "requests": len(ms) + rejected + errors,
+                "rejected": rejected,
+                "errors": errors,
+                "rps": round(len(ms) / wall, 2),
+                "p50_ms": round(percentile(ms, 50), 2),
+                "p95_ms": round(percentile(ms, 95), 2),
+                "p99_ms": round(percentile(ms, 99), 2),
+            }
+        endpoints = {name: row(s["ms"], s["rejected"], s["errors"]) for name, s in sorted(self.endpoints.items())}
+        total = row([m for s in self.endpoints.values() for m in s["ms"]],
+                    sum(s["rejected"] for s in self.endpoints.values()),
+                    sum(s["errors"] for s in self.endpoints.values()))
+        return endpoints, total
+
+class VirtualUser:
+    """One tenant: its own cookie jar (for the refresh token) and access token."""
+
+    def __init__(self, base, n, stats, rng):
+        self.base = base
+        self.email = f"load-{n}-{int(time.time())}@example.com"
+        self.stats = stats
+        self.rng = rng
+        self.token = None
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def call(self, method, path, body=None, name=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, headers=headers, method=method)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                status, payload = resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        except OSError:
+            status, payload = 0, b""
+        self.stats.record(name or f"{method} {path}", status, (time.perf_counter() - start) * 1000)
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+    def on_start(self):
+        status, body = self.call("POST", "/api/auth/signup",
+                                 {"email": self.email, "password": "load-test-password", "name": "Load Test"})
+        if status != 201:
+            raise RuntimeError(f"signup failed with {status}")
+        self.token = body["access_token"]
+        for question, answer in [("Do you ship abroad?", "Yes, to 40 countries."),
+                                 ("What are your opening hours?", "9 to 5, Monday to Friday."),
+                                 ("How do I get a refund?", "Reply with your order number.")]:
+            self.call("POST", "/api/auto-reply/faqs", {"question": question, "answer": answer})
+        self.call("POST", "/api/auto-reply/rules", {"trigger_keyword": "refund", "reply_text": "We're on it!"})
+
+    # Tasks
+    def dashboard(self):
+        for name in ANALYTICS:
+            self.call("GET", f"/api/analytics/{name}")
+
+    def browse(self):
+        self.call("GET", "/api/campaigns/")
+        self.call("GET", "/api/content/")
+        self.call("GET", "/api/calendar/")
+
+    def chat(self):
+        self.call("POST", "/api/chat/message", {"message": "How can I grow my email list?"})
+        self.call("GET", "/api/chat/history")
+
+    def generate_content(self):
+        self.call("POST", "/api/content/generate", {"channel": self.rng.choice(CHANNELS), "topic": "spring sale",
+                                                    "tone": "friendly", "brand_name": "Load Co"})
+
+    def auto_reply_burst(self):
+        # A burst of incoming messages answered back to back, as after a post goes viral
+        for _ in range(self.rng.randint(5, 10)):
+            self.call("POST", "/api/auto-reply/simulate", {"message": self.rng.choice(CUSTOMER_MESSAGES)})
+
+    def refresh(self):
+        status, body = self.call("POST", "/api/auth/refresh")
+        if status == 200:
+            self.token = body["access_token"]
+
+    def login(self):
+        status, body = self.call("POST", "/api/auth/login", {"email": self.email, "password": "load-test-password"})
+        if status == 200:
+            self.token = body["access_token"]
+
+    def create_campaign(self):
+        self.call("POST", "/api/campaigns/", {"name": "Load campaign", "channels": self.rng.sample(CHANNELS, 2),
+                                              "status": "active"})
+
+    def generate_calendar(self):
+        today = datetime.date.today()
+        self.call("POST", "/api/calendar/generate", {"month": today.month, "year": today.year})
+
+# (weight, task): relative frequency of each task in the mix
+TASKS = [
+    (30, VirtualUser.dashboard),
+    (20, VirtualUser.browse),
+    (12, VirtualUser.chat),
+    (10, VirtualUser.generate_content),
+    (8, VirtualUser.auto_reply_burst),
+    (8, VirtualUser.refresh),
+    (5, VirtualUser.create_campaign),
+    (4, VirtualUser.login),
+    (3, VirtualUser.generate_calendar),
+]
+
+def run_load(base, users, spawn_rate, duration, wait, seed):
+    stats = Stats()
+    weights = [w for w, _ in TASKS]
+    started = time.perf_counter()
+    stop_at = started + duration
+
+    def user_loop(n):
+        rng = random.Random(seed + n)
+        time.sleep(n / spawn_rate)
+        user = VirtualUser(base, n, stats, rng)
+        try:
+            user.on_start()
+        except RuntimeError:
+            return
+        while time.perf_counter() < stop_at:
+            rng.choices(TASKS, weights)[0][1](user)
+            time.sleep(rng.uniform(*wait))
+
+    threads = [threading.Thread(target=user_loop, args=(n,), daemon=True) for n in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return stats.summary(time.perf_counter() - started)
+
+def compare(result, baseline, max_regression):
+    """Print p95 and throughput against the baseline; return the regressions past max_regression (%)."""
+    def change(new, old):
+        return (new - old) / old * 100 if old else 0.0
+
+    regressions = []
+    print(f"\nvs baseline {baseline['meta'].get('started_at', '?')}")
+    print(f"{'endpoint':<36}{'p95 ms':>10}{'base':>10}{'change':>9}{'req/s':>9}{'base':>9}{'change':>9}")
+    rows = [(name, r, baseline["endpoints"].get(name)) for name, r in result["endpoints"].items()]
+    rows.append(("total", result["total"], baseline["total"]))
+    for name, new, old in rows:
+        if not old or min(new["requests"], old["requests"]) < MIN_COMPARE_REQUESTS:
+            continue
+        p95_change, rps_change = change(new["p95_ms"], old["p95_ms"]), change(new["rps"], old["rps"])
+        flag = ""
+        if max_regression is not None and (p95_change > max_regression or
+                                           (name == "total" and -rps_change > max_regression)):
+            regressions.append(name)
+            flag = "  REGRESSED"
+        print(f"{name:<36}{new['p95_ms']:>10}{old['p95_ms']:>10}{p95_change:>+8.1f}%"
+              f"{new['rps']:>9}{old['rps']:>9}{rps_change:>+8.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="run against this server instead of starting one")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--spawn-rate", type=float, default=5, help="users started per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds from the first user starting")
+    parser.add_argument("--wait", type=float, nargs=2, default=[0.5, 2.0], metavar=("MIN", "MAX"),
+                        help="think time between tasks (0 0 for a closed loop)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (started server only)")
+    parser.add_argument("--worker-class", default="gthread")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--no-rate-limit", action="store_true", help="start the server with rate limits off")
+    parser.add_argument("--out", help="save the results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier --out to compare against")
+    parser.add_argument("--max-regression", type=float, help="fail if p95 (or total req/s) is worse by this %%")
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    meta = {"started_at": datetime.datetime.now().isoformat(timespec="seconds"), "users": args.users,
+            "spawn_rate": args.spawn_rate, "duration": args.duration, "wait": args.wait, "seed": args.seed,
+            "url": args.url, "mix": {task.__name__: weight for weight, task in TASKS}}
+    if args.url:
+        endpoints, total = run_load(args.url.rstrip("/"), args.users, args.spawn_rate, args.duration,
+                                    args.wait, args.seed)
+    else:
+        meta.update(workers=args.workers, worker_class=args.worker_class, threads=args.threads)
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_PATH=os.path.join(tmp, "load.db"),
+                       STATIC_BUILD_DIR=os.path.join(tmp, "static"), AUTO_MIGRATE="true")
+            if args.no_rate_limit:
+                env["RATE_LIMIT_ENABLED"] = "false"
+            proc, base = start_server(args.worker_class, _free_port(), args.workers,
+                                      args.threads if args.worker_class == "gthread" else 1, False, env)
+            try:
+                endpoints, total = run_load(base, args.users, args.spawn_rate, args.duration, args.wait, args.seed)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+    result = {"meta": meta, "endpoints": endpoints, "total": total}
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{'endpoint':<36}{'reqs':>7}{'rej':>6}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for name, r in [*endpoints.items(), ("total", total)]:
+            print(f"{name:<36}{r['requests']:>7}{r['rejected']:>6}{r['errors']:>6}{r['rps']:>9}"
+                  f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        if regressions:
+            print(f"\nregressed past {args.max_regression}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""Microbenchmarks for the service hot paths, with a baseline and a regression gate.
+
+Covers AIService.generate_content per channel, generate_calendar and generate_auto_reply
+against a large FAQ index (a hit and a miss), every AnalyticsService get_* method (top content
+read from the maintained rankings of --rows items), JWT encode/decode in routes.auth, and the
+row-to-JSON step of the content and campaign list endpoints. Everything runs in-process on a
+scratch database with seeded services, no network.
+
+Each benchmark is timed like timeit: the loop count is calibrated until one sample takes
+--min-time, then --repeat samples are taken with the GC off. The best per-call time is what
+gets compared: --save writes the results to --baseline (merged into it with --filter), and a
+later run exits non-zero if any benchmark got slower than the baseline by more than --threshold
+percent. Baselines are machine specific; keep them out of git.
+
+    python backend/benchmarks/micro.py --save
+    python backend/benchmarks/micro.py --threshold 10
+    python backend/benchmarks/micro.py --filter analytics --repeat 9
+"""
+import argparse
+import datetime
+import fnmatch
+import functools
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "data", "benchmarks", "micro.json")
+
+CHANNELS = ["instagram", "facebook", "twitter", "linkedin", "email", "sms"]
+
+BENCHMARKS = []  # (name, setup); setup(args) returns the zero-argument callable to time
+
+def bench(name):
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+# ─────────────────────────────────────────────
+# AIService
+# ─────────────────────────────────────────────
+def _ai(args):
+    from services.ai_service import AIService
+    return AIService(args.seed)
+
+def _generate_content(channel, args):
+    ai = _ai(args)
+    return lambda: ai.generate_content(channel, "social_post", "spring sale", "casual", "Brand", ["sale", "spring"])
+
+for _channel in CHANNELS:
+    bench(f"ai.generate_content[{_channel}]")(functools.partial(_generate_content, _channel))
+
+@bench("ai.generate_calendar")
+def _generate_calendar(args):
+    ai = _ai(args)
+    campaigns = [{"id": i, "name": f"Campaign {i}"} for i in range(5)]
+    return lambda: ai.generate_calendar(1, 3, 2025, campaigns)
+
+def _faq_index(args):
+    from services.faq_index import FAQIndex
+    index = FAQIndex()
+    topics = ["shipping", "refund", "warranty", "discount", "password", "invoice", "delivery", "account"]
+    for i in range(args.faqs):
+        a, b = topics[i % len(topics)], topics[(i // len(topics)) % len(topics)]
+        index.add({"id": i + 1, "question": f"How does {a} work with {b} for order {i}?",
+                   "answer": f"Answer {i}"})
+    return index
+
+@bench("ai.generate_auto_reply[faq hit]")
+def _auto_reply_hit(args):
+    ai, index = _ai(args), _faq_index(args)
+    return lambda: ai.generate_auto_reply("How does refund work with delivery for order 1234?", index)
+
+@bench("ai.generate_auto_reply[faq miss]")
+def _auto_reply_miss(args):
+    ai, index = _ai(args), _faq_index(args)
+    return lambda: ai.generate_auto_reply("What are your opening hours this weekend?", index)
+
+# ─────────────────────────────────────────────
+# AnalyticsService
+# ─────────────────────────────────────────────
+def _analytics(method, args):
+    from services.analytics_service import AnalyticsService
+    fn = getattr(AnalyticsService(args.seed), method)
+    return functools.partial(fn, 1) if method == "get_overview" else fn
+
+def _register_analytics():
+    from services.analytics_service import AnalyticsService
+    # get_top_content reads the database; it has its own benchmark below
+    for method in sorted(m for m in vars(AnalyticsService) if m.startswith("get_") and m != "get_top_content"):
+        bench(f"analytics.{method}")(functools.partial(_analytics, method))
+
+# ─────────────────────────────────────────────
+# JWT (routes.auth)
+# ─────────────────────────────────────────────
+@bench("auth.jwt_encode")
+def _jwt_encode(args):
+    from routes.auth import generate_access_token
+    return lambda: generate_access_token(42, "user42@example.com")
+
+@bench("auth.jwt_decode")
+def _jwt_decode(args):
+    from routes.auth import generate_access_token, verify_access_token
+    token = generate_access_token(42, "user42@example.com")
+    return lambda: verify_access_token(token)
+
+# ─────────────────────────────────────────────
+# List endpoint serialization
+# ─────────────────────────────────────────────
+@functools.lru_cache(maxsize=None)
+def _app():
+    from app import create_app
+    app = create_app()
+    app.app_context().push()
+    return app
+
+def _list_rows(kind, rows):
+    """Rows as the list endpoints fetch them, from a scratch database holding `rows` of `kind`."""
+    from database import get_db
+    import tags
+    _app()
+    db = get_db()
+    user_id = db.execute("INSERT INTO users (email, name) VALUES (?, 'Bench') RETURNING id",
+                         (f"{kind}-{rows}@example.com",)).fetchone()[0]
+    if kind == "content":
+        for i in range(rows):
+            content_id = db.execute(
+                "INSERT INTO content_items (user_id, channel, content_type, title, body, status) "
+                "VALUES (?, ?, 'social_post', ?, ?, 'draft') RETURNING id",
+                (user_id, CHANNELS[i % 6], f"Post {i}", "Spring sale is here, don't miss out! " * 8)).fetchone()[0]
+            tags.insert_content_hashtags(db, tags.content_hashtag_rows(user_id, content_id,
+                                                                       ["#sale", "#spring", "#brand"]))
+        query = tags.content_select() + " WHERE ci.user_id = ? ORDER BY ci.created_at DESC"
+    else:
+        for i in range(rows):
+            campaign_id = db.execute(
+                "INSERT INTO campaigns (user_id, name, description, goal, budget, status) "
+                "VALUES (?, ?, 'Seasonal push', 'sales', 5000, 'active') RETURNING id",
+                (user_id, f"Campaign {i}")).fetchone()[0]
+            tags.insert_campaign_channels(db, tags.campaign_channel_rows(user_id, campaign_id, CHANNELS[:3]))
+        query = tags.campaigns_select() + " WHERE c.user_id = ? ORDER BY c.created_at DESC"
+    db.commit()
+    result = db.execute(query, (user_id, user_id)).fetchall()
+    db.close()
+    return result
+
+def _serialize(kind, column, args):
+    from flask import jsonify
+    import tags
+    rows = _list_rows(kind, args.rows)
+
+    def run():
+        # The loop in list_content / list_campaigns
+        items = []
+        for r in rows:
+            item = dict(r)
+            item[column] = tags.split(item[column])
+            items.append(item)
+        return jsonify(items).get_data()
+    return run
+
+def _top_content(args):
+    from database import get_db
+    from services.analytics_service import AnalyticsService
+    _app()
+    db = get_db()
+    user_id = db.execute("INSERT INTO users (email, name) VALUES ('top-content@example.com', 'Bench') "
+                         "RETURNING id").fetchone()[0]
+    today = datetime.datetime.utcnow().date()
+    for i in range(args.rows):
+        content_id = db.execute(
+            "INSERT INTO content_items (user_id, channel, content_type, title, body, status) "
+            "VALUES (?, ?, 'social_post', ?, 'Body', 'published') RETURNING id",
+            (user_id, CHANNELS[i % 6], f"Post {i}")).fetchone()[0]
+        recorded = (today - datetime.timedelta(days=i % 30)).isoformat()
+        db.executemany("INSERT INTO analytics (user_id, content_id, metric_type, metric_value, recorded_at) "
+                       "VALUES (?, ?, ?, ?, ?)",
+                       [(user_id, content_id, "reach", 1000 + i * 37 % 5000, recorded),
+                        (user_id, content_id, "engagement_rate", 1 + i * 13 % 90 / 10, recorded),
+                        (user_id, content_id, "conversions", i * 7 % 50, recorded)])
+    db.commit()
+    service = AnalyticsService(args.seed)
+    return lambda: service.get_top_content(db, user_id, "reach", 30, 5)
+
+def _register_top_content(rows):
+    bench(f"analytics.get_top_content[{rows} items]")(_top_content)
+
+def _register_serialization(rows):
+
+    bench(f"serialize.content_list[{rows} rows]")(functools.partial(_serialize, "content", "hashtags"))
+    bench(f"serialize.campaign_list[{rows} rows]")(functools.partial(_serialize, "campaigns", "channels"))
+
+# ─────────────────────────────────────────────
+# Runner
+# ─────────────────────────────────────────────
+def measure(fn, min_time, repeat):
+    """Best and median seconds per call, and the loop count used."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10:
+            break
+        number *= 2
+    number = max(1, round(number * min_time / elapsed))
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return min(samples), statistics.median(samples), number
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", nargs="+", help="glob(s) of benchmark names to run, e.g. 'ai.*'")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per sample")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--faqs", type=int, default=10000, help="FAQs in the auto-reply index")
+    parser.add_argument("--rows", type=int, default=500, help="rows in the list serialization and top content benchmarks")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed slowdown vs the baseline (%%)")
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update(DATABASE_PATH=os.path.join(tmp.name, "micro.db"), AUTO_MIGRATE="true",
+                      STATIC_BUILD_DIR=os.path.join(tmp.name, "static"), SHARD_COUNT="0",
+                      SQLITE_REPLICA_REFRESH_SECONDS="0", PASSWORD_HASH_WORKERS="0", SLOW_QUERY_MS="60000",
+                      GEMINI_API_KEY="")
+    sys.path.insert(0, BACKEND_DIR)
+    _register_analytics()
+    _register_top_content(args.rows)
+    _register_serialization(args.rows)
+
+    selected = [(name, setup) for name, setup in BENCHMARKS
+                if not args.filter or any(fnmatch.fnmatch(name, f"*{f}*") for f in args.filter)]
+    if args.list:
+        print("\n".join(name for name, _ in selected))
+        return
+
+    results = {}
+    for name, setup in selected:
+        best, median, number = measure(setup(args), args.min_time, args.repeat)
+        results[name] = {"best_us": round(best * 1e6, 3), "median_us": round(median * 1e6, 3), "loops": number}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = []
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'benchmark':<40}{'best µs':>12}{'median µs':>12}{'baseline':>12}{'change':>9}")
+    for name, r in results.items():
+        old = baseline.get("benchmarks", {}).get(name)
+        change = (r["best_us"] - old["best_us"]) / old["best_us"] * 100 if old else None
+        if change is not None and change > args.threshold:
+            regressions.append(name)
+        if not args.json:
+            print(f"{name:<40}{r['best_us']:>12}{r['median_us']:>12}"
+                  f"{old['best_us'] if old else '-':>12}{f'{change:+.1f}%' if old else '-':>9}"
+                  f"{'  REGRESSED' if name in regressions else ''}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        saved = baseline.get("benchmarks", {}) if args.filter else {}
+        saved.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({"meta": {"saved_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                                "python": platform.python_version(), "machine": platform.node()},
+                       "benchmarks": saved}, f, indent=2, sort_keys=True)
+        print(f"\nbaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} regressed by more than {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Password hashing benchmark: hash cost per method, and a login storm against other traffic.
+
+First times one hash for each --methods entry. Then, for each --pool-workers value, starts
+gunicorn (gthread) on a scratch database with PASSWORD_HASH_WORKERS set to it and runs login
+clients alongside clients on --probe-path, reporting logins/s, 503s and the probe latency.
+
+    python backend/benchmarks/password_hashing.py --pool-workers 0 1 2 --login-clients 16 --duration 15
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from worker_classes import _free_port, _request, percentile, start_server
+
+def hash_cost(methods, rounds):
+    from werkzeug.security import generate_password_hash
+    costs = {}
+    for method in methods:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            generate_password_hash("correct horse battery staple", method=method)
+        costs[method] = round((time.perf_counter() - start) / rounds * 1000, 1)
+    return costs
+
+def storm(base, token, email, login_clients, probe_clients, probe_path, duration):
+    logins, rejected, probe = [], 0, []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def login_client():
+        nonlocal rejected
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            status, _ = _request(base, "POST", "/api/auth/login", {"email": email, "password": "bench-password"})
+            with lock:
+                if status == 200:
+                    logins.append(time.perf_counter() - t0)
+                elif status == 503:
+                    rejected += 1
+            if status == 503:
+                # Well-behaved clients honour Retry-After (1s)
+                time.sleep(1)
+
+    def probe_client():
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            status, _ = _request(base, "GET", probe_path, token=token)
+            if status == 200:
+                with lock:
+                    probe.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=login_client) for _ in range(login_clients)]
+    threads += [threading.Thread(target=probe_client) for _ in range(probe_clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    probe.sort()
+    return {
+        "logins_per_s": round(len(logins) / duration, 1),
+        "login_503s": rejected,
+        "probe_requests": len(probe),
+        "probe_p50_ms": round(percentile(probe, 50), 2),
+        "probe_p99_ms": round(percentile(probe, 99), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--methods", nargs="+",
+                        default=["scrypt:16384:8:1", "scrypt:32768:8:1", "scrypt:65536:8:1", "pbkdf2:sha256:600000"])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--method", default="scrypt:32768:8:1", help="PASSWORD_HASH_METHOD for the storm")
+    parser.add_argument("--pool-workers", type=int, nargs="+", default=[0, 1])
+    parser.add_argument("--max-pending", type=int, default=2, help="PASSWORD_HASH_MAX_PENDING")
+    parser.add_argument("--threads", type=int, default=8, help="gthread threads per web worker")
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--probe-clients", type=int, default=2)
+    parser.add_argument("--probe-path", default="/api/campaigns/")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    summary = {"hash_ms": hash_cost(args.methods, args.rounds), "storm": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for pool_workers in args.pool_workers:
+            env = dict(os.environ, DATABASE_PATH=os.path.join(tmp, f"bench-{pool_workers}.db"),
+                       STATIC_BUILD_DIR=os.path.join(tmp, "static"), AUTO_MIGRATE="true",
+                       PASSWORD_HASH_METHOD=args.method, PASSWORD_HASH_WORKERS=str(pool_workers),
+                       PASSWORD_HASH_MAX_PENDING=str(args.max_pending))
+            proc, base = start_server("gthread", _free_port(), 1, args.threads, False, env)
+            try:
+                email = f"bench-{pool_workers}@example.com"
+                _, body = _request(base, "POST", "/api/auth/signup",
+                                   {"email": email, "password": "bench-password", "name": "Bench"})
+                token = json.loads(body)["access_token"]
+                summary["storm"][pool_workers] = storm(base, token, email, args.login_clients,
+                                                       args.probe_clients, args.probe_path, args.duration)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print("hash cost")
+    for method, ms in summary["hash_ms"].items():
+        print(f"  {method:<24}{ms:>8} ms")
+    print(f"login storm ({args.method}, max {args.max_pending} pending, {args.login_clients} login clients, "
+          f"{args.probe_clients} on {args.probe_path})")
+    print(f"  {'pool':>4}{'logins/s':>10}{'503s':>7}{'probe p50':>11}{'probe p99':>11}")
+    for pool_workers, r in summary["storm"].items():
+        print(f"  {pool_workers:>4}{r['logins_per_s']:>10}{r['login_503s']:>7}"
+              f"{r['probe_p50_ms']:>11}{r['probe_p99_ms']:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Outbound publishing benchmark: throughput of the Publisher against stub connectors.
+
+Publishes N synthetic posts spread over every channel through services.publishing.Publisher,
+with simulated per-send latency, once per worker count, and reports posts/s and send latency.
+
+    python backend/benchmarks/publishing.py --posts 10000 --latency-ms 50 --workers 1 8 32
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rate", type=float, default=1e6, help="per-channel posts/s (default: unthrottled)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from services import publishing
+    from services.ai_service import AIService
+
+    rng = random.Random(args.seed)
+    channels = list(AIService.CHANNEL_LIMITS)
+    posts = [{
+        "id": i, "user_id": 1, "channel": rng.choice(channels),
+        "title": f"Post {i}", "body": "Benchmark post body", "hashtags": [],
+    } for i in range(1, args.posts + 1)]
+
+    summary = {"posts": args.posts, "latency_ms": args.latency_ms, "runs": []}
+    for workers in args.workers:
+        for channel in channels:
+            publishing.register_connector(publishing.StubConnector(
+                channel, max_batch=publishing.STUB_BATCH_SIZES.get(channel, 1),
+                latency=args.latency_ms / 1000, failure_rate=args.failure_rate, seed=args.seed))
+        publisher = publishing.Publisher(workers, {}, args.rate, max_attempts=4, backoff=0.01)
+        start = time.perf_counter()
+        results = publisher.publish(posts)
+        seconds = time.perf_counter() - start
+        summary["runs"].append({
+            "workers": workers,
+            "seconds": round(seconds, 2),
+            "posts_per_s": round(args.posts / seconds, 1),
+            "failed": sum(not r.ok for r in results.values()),
+        })
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{args.posts} posts over {len(channels)} channels, {args.latency_ms} ms per send")
+    for run in summary["runs"]:
+        print(f"  {run['workers']:>3} workers: {run['seconds']:>7.2f} s  "
+              f"{run['posts_per_s']:>9.1f} posts/s  failed {run['failed']}")
+
+if __name__ == "__main__":
+    main()
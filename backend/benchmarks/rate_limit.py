@@ -0,0 +1,87 @@
+"""Rate limiter benchmark: cost of one admission decision per backend under contention.
+
+Runs P processes that each make N admission checks (per-user + global bucket, then a
+concurrency slot acquire/release, as @rate_limit does) against the memory backend and a
+shared SQLite backend, and reports per-check latency and how many were rejected.
+
+    python backend/benchmarks/rate_limit.py --processes 1 4 8 --checks 5000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def worker(backend_name, path, checks, users, seed, queue):
+    sys.path.insert(0, BACKEND_DIR)
+    import ratelimit
+
+    backend = ratelimit.SQLiteBackend(path) if backend_name == "sqlite" else ratelimit.MemoryBackend()
+    limits = ratelimit.RouteLimits(600, 10, 6000000, 1000, concurrency=4)
+    rng = random.Random(seed)
+    timings, rejected = [], 0
+    for _ in range(checks):
+        start = time.perf_counter()
+        denied = backend.take(ratelimit._buckets("bench", limits, rng.randint(1, users)))
+        token = backend.acquire_slot("bench:inflight", limits.concurrency) if denied is None else None
+        if token is not None:
+            backend.release_slot("bench:inflight", token)
+        timings.append((time.perf_counter() - start) * 1e6)
+        rejected += denied is not None
+    queue.put((timings, rejected))
+
+def run(backend_name, path, processes, checks, users, seed):
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(backend_name, path, checks, users, seed + i, queue))
+             for i in range(processes)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    results = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - start
+    timings = sorted(t for r in results for t in r[0])
+    return {
+        "backend": backend_name,
+        "processes": processes,
+        "checks_per_s": round(len(timings) / wall, 1),
+        "p50_us": round(percentile(timings, 50), 1),
+        "p99_us": round(percentile(timings, 99), 1),
+        "rejected": sum(r[1] for r in results),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--checks", type=int, default=5000, help="admission checks per process")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for processes in args.processes:
+            for backend_name in ("memory", "sqlite"):
+                path = os.path.join(tmp, f"ratelimit-{processes}.db")
+                runs.append(run(backend_name, path, processes, args.checks, args.users, args.seed))
+
+    if args.json:
+        print(json.dumps(runs, indent=2))
+        return
+    print(f"{'backend':<8}{'procs':>6}{'checks/s':>12}{'p50 us':>10}{'p99 us':>10}{'rejected':>10}")
+    for r in runs:
+        print(f"{r['backend']:<8}{r['processes']:>6}{r['checks_per_s']:>12}{r['p50_us']:>10}"
+              f"{r['p99_us']:>10}{r['rejected']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Read replica benchmark: read latency and write throughput with and without a SQLite replica.
+
+Seeds --tenants users with --rows campaigns and content items each, then runs --readers
+threads on the read-only list views alongside --writers threads creating campaigns, for
+--duration seconds. Without a replica, readers share the primary's rollback journal with the
+writers; with SQLITE_REPLICA_REFRESH_SECONDS set they read a snapshot refreshed in place (by a
+thread standing in for the scheduler), except right after their own writes. Reports reader
+p50/p99, writes/s and where reads were routed. Each setup runs in a fresh interpreter. All
+threads share one interpreter here; the lock contention a replica removes is largest across
+gunicorn worker processes.
+
+    python backend/benchmarks/read_replica.py --refresh-seconds 0 1 --readers 8 --writers 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+READ_PATHS = ["/api/campaigns/", "/api/content/", "/api/campaigns/stats", "/api/chat/history"]
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def run(refresh_seconds, tenants, rows, readers, writers, duration, tmp):
+    os.environ.update(DATABASE_PATH=os.path.join(tmp, f"bench-{refresh_seconds}.db"), AUTO_MIGRATE="true",
+                      SQLITE_REPLICA_REFRESH_SECONDS=str(refresh_seconds), STATIC_BUILD_DIR=os.path.join(tmp, "static"),
+                      RATE_LIMIT_ENABLED="false", PASSWORD_HASH_WORKERS="0", SLOW_QUERY_MS="60000")
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    from database import get_db
+    from instrumentation import REPLICA_ROUTING
+    import replicas
+    app = create_app()
+
+    client = app.test_client()
+    headers = []
+    for i in range(tenants):
+        signup = client.post("/api/auth/signup", json={"email": f"t{i}@example.com", "password": "bench", "name": "T"})
+        headers.append(({"Authorization": f"Bearer {signup.json['access_token']}"}, signup.json["user"]["id"]))
+    db = get_db()
+    for _, user_id in headers:
+        db.executemany("INSERT INTO campaigns (user_id, name, status) VALUES (?, ?, 'active')",
+                       [(user_id, f"Campaign {i}") for i in range(rows)])
+        db.executemany("INSERT INTO content_items (user_id, channel, content_type, body) VALUES (?, 'email', 'post', ?)",
+                       [(user_id, f"Body {i}") for i in range(rows)])
+    db.commit()
+    db.close()
+
+    reads, writes = [], 0
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def refresher():
+        while not stop.wait(refresh_seconds / 2):
+            replicas.refresh_due()
+
+    def reader(n):
+        c = app.test_client()
+        # Writers take the first tenants; readers start after them so most never write
+        h = headers[(writers + n) % len(headers)][0]
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            c.get(READ_PATHS[i % len(READ_PATHS)], headers=h)
+            with lock:
+                reads.append((time.perf_counter() - start) * 1000)
+            i += 1
+
+    def writer(n):
+        nonlocal writes
+        c = app.test_client()
+        h = headers[n % len(headers)][0]
+        while not stop.is_set():
+            if c.post("/api/campaigns/", json={"name": "New", "channels": ["email"]}, headers=h).status_code == 201:
+                with lock:
+                    writes += 1
+
+    if refresh_seconds:
+        replicas.refresh_due()
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    if refresh_seconds:
+        threads.append(threading.Thread(target=refresher))
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    reads.sort()
+    return {
+        "reads": len(reads),
+        "read_p50_ms": round(percentile(reads, 50), 2),
+        "read_p99_ms": round(percentile(reads, 99), 2),
+        "writes_per_s": round(writes / duration, 1),
+        "routing": {f"{target}/{reason}": n for (target, reason), n in REPLICA_ROUTING._values.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--refresh-seconds", type=float, nargs="+", default=[0, 1],
+                        help="SQLITE_REPLICA_REFRESH_SECONDS per setup (0 = no replica)")
+    parser.add_argument("--tenants", type=int, default=6)
+    parser.add_argument("--rows", type=int, default=100, help="campaigns and content items per tenant")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    summary = {}
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for refresh_seconds in args.refresh_seconds:
+            with ctx.Pool(1) as pool:
+                summary[refresh_seconds] = pool.apply(run, (refresh_seconds, args.tenants, args.rows, args.readers,
+                                                            args.writers, args.duration, tmp))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{args.readers} readers, {args.writers} writers, {args.tenants} tenants, {args.duration}s")
+    print(f"{'refresh s':>10}{'reads':>8}{'read p50':>10}{'read p99':>10}{'writes/s':>10}  routing")
+    for refresh_seconds, r in summary.items():
+        routing = ", ".join(f"{k}={v}" for k, v in sorted(r["routing"].items())) or "-"
+        print(f"{refresh_seconds:>10}{r['reads']:>8}{r['read_p50_ms']:>10}{r['read_p99_ms']:>10}"
+              f"{r['writes_per_s']:>10}  {routing}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Cold-start benchmark: time from interpreter start to the first served response.
+
+Each run spawns a fresh interpreter (like a new gunicorn worker), imports the app module,
+builds the app and issues one request through the test client.
+
+    python backend/benchmarks/startup.py --runs 10 --path /api/health
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {backend!r})
+import app as app_module
+t_import = time.perf_counter()
+application = app_module.create_app()
+t_create = time.perf_counter()
+response = application.test_client().get({path!r})
+t_first = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (t_import - t0) * 1000,
+    "create_app_ms": (t_create - t_import) * 1000,
+    "first_response_ms": (t_first - t_create) * 1000,
+    "total_ms": (t_first - t0) * 1000,
+    "status": response.status_code,
+}}))
+"""
+
+def run_once(path):
+    code = PROBE.format(backend=BACKEND_DIR, path=path)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def summarise(samples, key):
+    values = sorted(s[key] for s in samples)
+    return {
+        "mean": round(statistics.mean(values), 2),
+        "p50": round(values[len(values) // 2], 2),
+        "max": round(values[-1], 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/health")
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    samples = [run_once(args.path) for _ in range(args.runs)]
+    keys = ["import_ms", "create_app_ms", "first_response_ms", "total_ms"]
+    summary = {k: summarise(samples, k) for k in keys}
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"Cold start over {args.runs} runs ({args.path}):")
+    for k in keys:
+        s = summary[k]
+        print(f"  {k:<20} mean {s['mean']:>8.2f}  p50 {s['p50']:>8.2f}  max {s['max']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Statement cache benchmark: cost of a request's registered statements with and without reuse.
+
+Simulates requests that each take a connection, run a few registered statements (the auth
+lookup plus two reads, as a typical list view does) and give it back, under these setups:
+a fresh connection per request (SQLITE_POOL_SIZE=0, the old behaviour), pooled connections
+with the statement cache disabled, and pooled connections with it on. Reports per-request
+latency and the statement cache hit ratio from db_statement_cache_total.
+
+    python backend/benchmarks/statement_cache.py --requests 5000 --rows 2000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SETUPS = [
+    ("connect per request", 0, 128),
+    ("pooled, no cache", 4, 0),
+    ("pooled + cache", 4, 256),
+]
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def seed(database, rows):
+    db = database.get_db()
+    user_id = db.execute("INSERT INTO users (email, name) VALUES ('bench@example.com', 'Bench') RETURNING id").fetchone()[0]
+    db.executemany("INSERT INTO campaigns (user_id, name, status) VALUES (?, ?, ?)",
+                   [(user_id, f"Campaign {i}", ("draft", "active", "scheduled")[i % 3]) for i in range(rows)])
+    db.executemany("INSERT INTO chat_messages (user_id, role, message) VALUES (?, 'user', ?)",
+                   [(user_id, f"message {i}") for i in range(rows)])
+    db.commit()
+    db.close()
+    return user_id
+
+def run(requests, rows):
+    sys.path.insert(0, BACKEND_DIR)
+    import database
+    from config import Config
+    from instrumentation import STATEMENT_CACHE
+    import routes.auth, routes.campaigns, routes.chat  # noqa: F401 -- registers their statements
+
+    database.init_db()
+    user_id = seed(database, rows)
+    results = []
+    for label, pool_size, cache in SETUPS:
+        Config.SQLITE_POOL_SIZE, Config.SQLITE_STATEMENT_CACHE = pool_size, cache
+        database.reset_pools()
+        STATEMENT_CACHE._values.clear()
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            db = database.get_db()
+            db.run("users.by_id", (user_id,)).fetchone()
+            db.run("campaigns.status_counts", (user_id,)).fetchall()
+            db.run("chat.history", (user_id, 20)).fetchall()
+            db.close()
+            timings.append((time.perf_counter() - start) * 1e6)
+        timings.sort()
+        counts = STATEMENT_CACHE._values
+        hits = sum(v for (_, result), v in counts.items() if result == "hit")
+        total = sum(counts.values())
+        results.append({
+            "setup": label,
+            "p50_us": round(percentile(timings, 50), 1),
+            "p99_us": round(percentile(timings, 99), 1),
+            "hit_ratio": round(hits / total, 3) if total else 0.0,
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=1000, help="campaigns and chat messages seeded")
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+        results = run(args.requests, args.rows)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'setup':<22}{'p50 us':>10}{'p99 us':>10}{'hit ratio':>11}")
+    for r in results:
+        print(f"{r['setup']:<22}{r['p50_us']:>10}{r['p99_us']:>10}{r['hit_ratio']:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Tenant shard benchmark: write throughput of many tenants with and without SHARD_COUNT.
+
+For each --shard-counts value, signs up --tenants users on a scratch database and runs one
+writer thread per tenant through the test client (campaign creates and content updates, each
+a one-commit request) for --duration seconds. With SHARD_COUNT=0 every commit queues on the
+one database's write lock; with shards, tenants on different files commit in parallel. Each
+setup runs in a fresh interpreter, since the shard routing is fixed at import.
+
+    python backend/benchmarks/tenant_shards.py --shard-counts 0 4 --tenants 16 --duration 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def run(shard_count, tenants, duration, tmp):
+    os.environ.update(DATABASE_PATH=os.path.join(tmp, f"bench-{shard_count}.db"), AUTO_MIGRATE="true",
+                      SHARD_DIR=os.path.join(tmp, f"shards-{shard_count}"), SHARD_COUNT=str(shard_count),
+                      STATIC_BUILD_DIR=os.path.join(tmp, "static"), RATE_LIMIT_ENABLED="false",
+                      PASSWORD_HASH_WORKERS="0", SLOW_QUERY_MS="60000")
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    app = create_app()
+
+    headers = []
+    client = app.test_client()
+    for i in range(tenants):
+        signup = client.post("/api/auth/signup", json={"email": f"t{i}@example.com", "password": "bench", "name": "T"})
+        headers.append({"Authorization": f"Bearer {signup.json['access_token']}"})
+
+    timings, errors = [], 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def writer(h):
+        nonlocal errors
+        c = app.test_client()
+        content_id = c.post("/api/content/", json={"body": "Seed"}, headers=h).json["id"]
+        n = 0
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            if n % 2:
+                response = c.put(f"/api/content/{content_id}", json={"title": f"Edit {n}"}, headers=h)
+            else:
+                response = c.post("/api/campaigns/", json={"name": f"Campaign {n}", "channels": ["email"]}, headers=h)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if response.status_code < 300:
+                    timings.append(elapsed)
+                else:
+                    errors += 1
+            n += 1
+
+    threads = [threading.Thread(target=writer, args=(h,)) for h in headers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    timings.sort()
+    return {
+        "writes_per_s": round(len(timings) / duration, 1),
+        "errors": errors,
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shard-counts", type=int, nargs="+", default=[0, 4])
+    parser.add_argument("--tenants", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    summary = {}
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for shard_count in args.shard_counts:
+            with ctx.Pool(1) as pool:
+                summary[shard_count] = pool.apply(run, (shard_count, args.tenants, args.duration, tmp))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{args.tenants} tenants, one writer each, {args.duration}s")
+    print(f"{'shards':>7}{'writes/s':>10}{'errors':>8}{'p50 ms':>9}{'p99 ms':>9}")
+    for shard_count, r in summary.items():
+        print(f"{shard_count:>7}{r['writes_per_s']:>10}{r['errors']:>8}{r['p50_ms']:>9}{r['p99_ms']:>9}")
+
+if __name__ == "__main__":
+    main()
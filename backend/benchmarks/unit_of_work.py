@@ -0,0 +1,106 @@
+"""Unit-of-work benchmark: commits, statements and latency per request for a write-heavy mix.
+
+Runs a mix of writes (plus one read) through the test client on a scratch SQLite database
+and reports, per endpoint, the mean X-Commit-Count and X-Query-Count and the latency. Each
+SQLite commit in the default rollback-journal mode costs the journal and database fsyncs, so
+commits per request is the fsync count to compare across changes. Finishes with a bulk
+import to show commits per imported row.
+
+    python backend/benchmarks/unit_of_work.py --iterations 200 --import-rows 5000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def mix(campaign_id, content_id):
+    return [
+        ("POST", "/api/campaigns/", {"name": "Bench", "channels": ["email", "instagram"], "status": "active"}),
+        ("PUT", f"/api/campaigns/{campaign_id}", {"goal": "More sign-ups", "channels": ["email", "twitter"]}),
+        ("POST", "/api/content/", {"body": "Launch day #new", "hashtags": ["#new", "#launch"],
+                                   "status": "scheduled", "scheduled_at": "2099-01-01T09:00:00"}),
+        ("PUT", f"/api/content/{content_id}", {"title": "Edited", "hashtags": ["#edited"]}),
+        ("POST", "/api/chat/message", {"message": "How do I grow my list?"}),
+        ("POST", "/api/calendar/generate", {"month": 1, "year": 2099}),
+        ("POST", "/api/auto-reply/faqs", {"question": "Do you ship abroad?", "answer": "Yes"}),
+        ("GET", "/api/campaigns/", None),
+    ]
+
+def run(iterations, import_rows):
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    from config import Config
+    Config.RATE_LIMIT_ENABLED = False
+    app = create_app()
+    client = app.test_client()
+    signup = client.post("/api/auth/signup", json={"email": "bench@example.com", "password": "bench", "name": "B"})
+    headers = {"Authorization": f"Bearer {signup.json['access_token']}"}
+    campaign_id = client.post("/api/campaigns/", json={"name": "Seed"}, headers=headers).json["id"]
+    content_id = client.post("/api/content/", json={"body": "Seed"}, headers=headers).json["id"]
+
+    stats = {}
+    for _ in range(iterations):
+        for method, path, body in mix(campaign_id, content_id):
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=body, headers=headers)
+            elapsed = (time.perf_counter() - start) * 1000
+            s = stats.setdefault(f"{method} {path}", {"ms": [], "commits": 0, "queries": 0})
+            s["ms"].append(elapsed)
+            s["commits"] += int(response.headers.get("X-Commit-Count", 0))
+            s["queries"] += int(response.headers.get("X-Query-Count", 0))
+
+    summary = {"endpoints": {}}
+    for name, s in stats.items():
+        timings = sorted(s["ms"])
+        summary["endpoints"][name] = {
+            "commits_per_request": round(s["commits"] / len(timings), 2),
+            "queries_per_request": round(s["queries"] / len(timings), 2),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+        }
+
+    if import_rows:
+        body = "\n".join(json.dumps({"body": f"Imported {i}", "hashtags": ["#bulk"]}) for i in range(import_rows))
+        start = time.perf_counter()
+        response = client.post("/api/content/import", data=body,
+                               headers={**headers, "Content-Type": "application/x-ndjson"})
+        summary["import"] = {
+            "rows": import_rows,
+            "inserted": response.json["inserted"],
+            "commits": int(response.headers.get("X-Commit-Count", 0)),
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100, help="passes over the request mix")
+    parser.add_argument("--import-rows", type=int, default=2000, help="rows in the closing bulk import (0 = skip)")
+    parser.add_argument("--json", action="store_true", help="print raw JSON summary")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(DATABASE_PATH=os.path.join(tmp, "bench.db"), AUTO_MIGRATE="true",
+                          STATIC_BUILD_DIR=os.path.join(tmp, "static"), SERVER_TIMING="true")
+        summary = run(args.iterations, args.import_rows)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{'endpoint':<36}{'commits/req':>12}{'queries/req':>12}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, r in summary["endpoints"].items():
+        print(f"{name:<36}{r['commits_per_request']:>12}{r['queries_per_request']:>12}"
+              f"{r['p50_ms']:>9}{r['p99_ms']:>9}")
+    if "import" in summary:
+        r = summary["import"]
+        print(f"bulk import: {r['inserted']}/{r['rows']} rows, {r['commits']} commits, {r['seconds']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Compare gunicorn worker classes under concurrent load.
+
+For each worker class a gunicorn server is started on a scratch database, a user is
+signed up, and N client threads hammer the given paths for a fixed duration.
+
+    python backend/benchmarks/worker_classes.py --classes sync gthread gevent \\
+        --concurrency 32 --duration 15 --path /api/analytics/overview
+
+gevent/eventlet need those packages installed; "uvicorn" runs backend.asgi:application
+with uvicorn.workers.UvicornWorker.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _request(base, method, path, body=None, token=None, timeout=30):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base + path, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def start_server(worker_class, port, workers, threads, preload, env):
+    app_path = "backend.app:create_app()"
+    if worker_class == "uvicorn":
+        worker_class, app_path = "uvicorn.workers.UvicornWorker", "backend.asgi:application"
+    env = dict(env, PORT=str(port), GUNICORN_WORKER_CLASS=worker_class,
+               WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               GUNICORN_PRELOAD="true" if preload else "false")
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", app_path], cwd=ROOT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if _request(base, "GET", "/api/health", timeout=1)[0] == 200:
+                return proc, base
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"gunicorn ({worker_class}) did not become healthy")
+
+def run_load(base, paths, token, concurrency, duration):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(i):
+        nonlocal errors
+        n = i
+        while time.perf_counter() < stop_at:
+            path = paths[n % len(paths)]
+            n += 1
+            t0 = time.perf_counter()
+            try:
+                status, _ = _request(base, "GET", path, token=token)
+            except OSError:
+                status = 0
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--classes", nargs="+", default=["sync", "gthread"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="threads per gthread worker")
+    parser.add_argument("--preload", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--path", action="append", dest="paths")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    paths = args.paths or ["/api/analytics/overview", "/api/campaigns/", "/api/content/"]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_PATH=os.path.join(tmp, "bench.db"),
+                   STATIC_BUILD_DIR=os.path.join(tmp, "static"), AUTO_MIGRATE="true")
+        for worker_class in args.classes:
+            proc, base = start_server(worker_class, _free_port(), args.workers,
+                                      args.threads if worker_class == "gthread" else 1, args.preload, env)
+            try:
+                email = f"bench-{worker_class}-{int(time.time())}@example.com"
+                status, body = _request(base, "POST", "/api/auth/signup",
+                                        {"email": email, "password": "bench-password", "name": "Bench"})
+                token = json.loads(body)["access_token"]
+                results[worker_class] = run_load(base, paths, token, args.concurrency, args.duration)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'worker class':<14}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for worker_class, r in results.items():
+        print(f"{worker_class:<14}{r['rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}")
+
+if __name__ == "__main__":
+    main()
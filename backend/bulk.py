@@ -0,0 +1,227 @@
+import csv
+import io
+import json
+
+from flask import Response, request, stream_with_context
+
+from config import Config
+from database import get_db
+import scheduler
+import tags
+
+# Field specs: column -> (coercion, required, default). Coercions raise ValueError on bad input.
+def _text(value):
+    return None if value is None else str(value)
+
+def _number(value):
+    return float(value) if value not in (None, "") else 0
+
+def _optional_int(value):
+    return int(value) if value not in (None, "") else None
+
+def _string_list(value):
+    if isinstance(value, str):
+        value = json.loads(value) if value.lstrip().startswith("[") else [v.strip() for v in value.split("|") if v.strip()]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError("expected a list of strings")
+    return value
+
+CAMPAIGN_FIELDS = {
+    "name": (_text, True, None),
+    "description": (_text, False, ""),
+    "goal": (_text, False, ""),
+    "budget": (_number, False, 0),
+    "target_audience": (_text, False, ""),
+    "channels": (_string_list, False, []),
+    "status": (_text, False, "draft"),
+    "start_date": (_text, False, None),
+    "end_date": (_text, False, None),
+}
+
+CONTENT_FIELDS = {
+    "campaign_id": (_optional_int, False, None),
+    "channel": (_text, False, "instagram"),
+    "content_type": (_text, False, "social_post"),
+    "title": (_text, False, ""),
+    "body": (_text, True, None),
+    "tone": (_text, False, "professional"),
+    "hashtags": (_string_list, False, []),
+    "status": (_text, False, "draft"),
+    "scheduled_at": (scheduler.normalize_due, False, None),
+}
+
+# table -> (list field kept in a child table, aggregating SELECT and its alias, child row builder, bulk insert)
+LIST_FIELDS = {
+    "campaigns": ("channels", tags.campaigns_select, "c",
+                  tags.campaign_channel_rows, tags.insert_campaign_channels),
+    "content_items": ("hashtags", tags.content_select, "ci",
+                      tags.content_hashtag_rows, tags.insert_content_hashtags),
+}
+
+def request_format():
+    fmt = request.args.get("format")
+    if not fmt:
+        fmt = "csv" if request.mimetype == "text/csv" else "ndjson"
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError("format must be csv or ndjson")
+    return fmt
+
+def iter_records(stream, fmt):
+    """Yield (line_number, record_or_error) from an upload without reading it all into memory."""
+    text = io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"invalid JSON: {e}")
+            continue
+        yield line_no, record if isinstance(record, dict) else ValueError("expected a JSON object")
+
+def validate(record, fields):
+    row = {}
+    for name, (coerce, required, default) in fields.items():
+        value = record.get(name)
+        if value in (None, ""):
+            if required:
+                raise ValueError(f"{name} is required")
+            row[name] = default
+            continue
+        try:
+            row[name] = coerce(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"invalid {name}: {e}")
+    return row
+
+class BulkImport:
+    """Chunked, per-row-validated import into one table for one user (on the user's shard)."""
+
+    def __init__(self, table, fields, user_id, shard=None):
+        self.table = table
+        self.shard = shard
+        self.list_field, _, _, self.child_rows, self.insert_children = LIST_FIELDS[table]
+        self.fields = [f for f in fields if f != self.list_field]
+        self.spec = fields
+        self.user_id = user_id
+        self.columns = ["user_id", *self.fields]
+        self.sql = (f"INSERT INTO {table} ({', '.join(self.columns)}) "
+                    f"VALUES ({', '.join('?' for _ in self.columns)}) RETURNING id")
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line_no, message):
+        self.failed += 1
+        if len(self.errors) < Config.BULK_MAX_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def run(self, records):
+        db = get_db(self.shard)
+        try:
+            chunk = []
+            for line_no, record in records:
+                if isinstance(record, Exception):
+                    self.error(line_no, str(record))
+                    continue
+                try:
+                    chunk.append((line_no, validate(record, self.spec)))
+                except ValueError as e:
+                    self.error(line_no, str(e))
+                    continue
+                if len(chunk) >= Config.BULK_CHUNK_SIZE:
+                    self._flush(db, chunk)
+                    chunk = []
+            if chunk:
+                self._flush(db, chunk)
+        finally:
+            db.close()
+        return {"inserted": self.inserted, "failed": self.failed, "errors": self.errors}
+
+    def _insert(self, db, rows):
+        # Parent rows need their ids for the child table, so they go in one by one (RETURNING id);
+        # child rows for the whole batch then go in with one executemany.
+        children = []
+        for row in rows:
+            new_id = db.execute(self.sql, (self.user_id, *(row[f] for f in self.fields))).fetchone()[0]
+            children.extend(self.child_rows(self.user_id, new_id, row[self.list_field]))
+        self.insert_children(db, children)
+
+    def _flush(self, db, chunk):
+        chunk = self._check_campaign_ownership(db, chunk)
+        try:
+            with db.savepoint():
+                self._insert(db, [row for _, row in chunk])
+            inserted = len(chunk)
+        except Exception:
+            # Isolate the offending rows instead of failing the whole chunk; each row gets its
+            # own savepoint so the good ones still go out in the chunk's single commit
+            inserted = 0
+            for line_no, row in chunk:
+                try:
+                    with db.savepoint():
+                        self._insert(db, [row])
+                    inserted += 1
+                except Exception as e:
+                    self.error(line_no, str(e))
+        db.commit()
+        self.inserted += inserted
+
+    def _check_campaign_ownership(self, db, chunk):
+        if "campaign_id" not in self.fields:
+            return chunk
+        wanted = {row["campaign_id"] for _, row in chunk if row["campaign_id"] is not None}
+        if not wanted:
+            return chunk
+        marks = ", ".join("?" for _ in wanted)
+        owned = {r["id"] for r in db.execute(
+            f"SELECT id FROM campaigns WHERE user_id = ? AND id IN ({marks})", (self.user_id, *wanted)
+        ).fetchall()}
+        kept = []
+        for line_no, row in chunk:
+            if row["campaign_id"] is not None and row["campaign_id"] not in owned:
+                self.error(line_no, f"campaign {row['campaign_id']} not found")
+            else:
+                kept.append((line_no, row))
+        return kept
+
+def export_response(table, user_id, fmt, filename, shard=None):
+    list_field, select, alias, _, _ = LIST_FIELDS[table]
+
+    def generate():
+        db = get_db(shard)
+        try:
+            cursor = db.execute(f"{select()} WHERE {alias}.user_id = ? ORDER BY {alias}.id", (user_id, user_id))
+            columns = [d[0] for d in cursor.description]
+            buf = io.StringIO()
+            writer = csv.writer(buf) if fmt == "csv" else None
+            if writer:
+                writer.writerow(columns)
+            while True:
+                rows = cursor.fetchmany(Config.BULK_CHUNK_SIZE)
+                if not rows:
+                    break
+                for r in rows:
+                    item = dict(r)
+                    values = tags.split(item[list_field])
+                    if writer:
+                        item[list_field] = "|".join(values)
+                        writer.writerow(item.values())
+                    else:
+                        item[list_field] = values
+                        buf.write(json.dumps(item, default=str) + "\n")
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        finally:
+            db.close()
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}.{fmt}"'
+    })
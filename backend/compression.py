@@ -0,0 +1,68 @@
+import gzip
+
+from flask import request
+
+from config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "text/css",
+    "text/html",
+    "text/plain",
+    "image/svg+xml",
+}
+
+def available_encodings():
+    if brotli is not None:
+        return ["br", "gzip"]
+    return ["gzip"]
+
+def encode(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=Config.BROTLI_LEVEL)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=Config.GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def negotiate_encoding(offered):
+    """Pick the client's preferred encoding among those we can serve (br before gzip on ties)."""
+    accept = request.accept_encodings
+    best, best_q = None, 0
+    for encoding in offered:
+        q = accept[encoding]
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compress_response(response):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code >= 300
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if response.content_length is not None and response.content_length < Config.COMPRESS_MIN_SIZE:
+        return response
+
+    encoding = negotiate_encoding(available_encodings())
+    if not encoding:
+        return response
+
+    body = response.get_data()
+    if len(body) < Config.COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(encode(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
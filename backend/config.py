@@ -7,6 +7,18 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "ai-mcc-super-secret-key-2025-change-in-production")
     JWT_ACCESS_EXPIRY_MINUTES = int(os.getenv("JWT_ACCESS_EXPIRY_MINUTES", 15))
     JWT_REFRESH_EXPIRY_DAYS = int(os.getenv("JWT_REFRESH_EXPIRY_DAYS", 7))
+    # How stale each worker's in-memory list of revoked refresh tokens may get, and how often
+    # the scheduler deletes expired refresh_tokens rows (0 = only via `flask sweep-tokens`)
+    REFRESH_REVOCATION_SYNC_SECONDS = float(os.getenv("REFRESH_REVOCATION_SYNC_SECONDS", 5))
+    REFRESH_TOKEN_SWEEP_SECONDS = int(os.getenv("REFRESH_TOKEN_SWEEP_SECONDS", 3600))
+    REFRESH_TOKEN_SWEEP_BATCH = int(os.getenv("REFRESH_TOKEN_SWEEP_BATCH", 1000))
+
+    # Password hashing: werkzeug method string for new hashes (older ones are upgraded on login),
+    # hashing processes per web worker (0 = in the request thread), queue bound and timeout
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 4))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
     
     # Database configuration - support both local SQLite and Railway PostgreSQL
     if os.getenv("RAILWAY_ENVIRONMENT") == "production":
@@ -21,9 +33,124 @@ class Config:
         DATABASE_TYPE = "sqlite"
         DATABASE_PATH = os.getenv("DATABASE_PATH", os.path.join(os.path.dirname(__file__), "data", "marketing.db"))
     
+    # Instrumentation: /api/metrics, Server-Timing headers and the slow-request profiler
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() == "true"
+    PROFILE_SLOW_MS = int(os.getenv("PROFILE_SLOW_MS", 0))
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 1.0))
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "data", "profiles"))
+
+    # Log statements slower than this (ms, 0 = off) with their query plan
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+    # What to do when a view exceeds its @query_budget: off | log | raise (always raise when app.testing)
+    QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log")
+
+    # Bulk import/export: rows per transaction / fetch, and per-row errors reported back
+    BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+    BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", 100))
+
+    # Auto-reply FAQ matching: minimum BM25 confidence for an FAQ answer, and per-process index cache size
+    FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", 0.5))
+    FAQ_INDEX_MAX_USERS = int(os.getenv("FAQ_INDEX_MAX_USERS", 1000))
+
+    # Scheduled publishing (content_items.scheduled_at, calendar_events). SCHEDULER_ENABLED runs the
+    # loop inside every web worker; leases keep concurrent schedulers from publishing twice.
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+    SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", 5))
+    SCHEDULER_LOOKAHEAD_SECONDS = int(os.getenv("SCHEDULER_LOOKAHEAD_SECONDS", 60))
+    SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", 500))
+    SCHEDULER_HEAP_LIMIT = int(os.getenv("SCHEDULER_HEAP_LIMIT", 50000))
+    SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", 300))
+
+    # Outbound publishing: worker threads, per-channel rate limits ("twitter=1,email=100/500" as
+    # posts/second[/burst], per process), retries, and the stub connectors' simulated behaviour
+    PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", 8))
+    PUBLISH_RATE_LIMITS = os.getenv("PUBLISH_RATE_LIMITS", "")
+    PUBLISH_DEFAULT_RATE = float(os.getenv("PUBLISH_DEFAULT_RATE", 10))
+    PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", 4))
+    PUBLISH_BACKOFF_SECONDS = float(os.getenv("PUBLISH_BACKOFF_SECONDS", 0.5))
+    PUBLISH_STUB_LATENCY_MS = float(os.getenv("PUBLISH_STUB_LATENCY_MS", 0))
+    PUBLISH_STUB_FAILURE_RATE = float(os.getenv("PUBLISH_STUB_FAILURE_RATE", 0))
+
+    # Rate limits and concurrency caps per route class (0 = unlimited). The memory backend is per
+    # process; RATE_LIMIT_BACKEND=sqlite shares state between the workers on a host via RATE_LIMIT_PATH.
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH") or os.path.join(os.path.dirname(__file__), "data", "ratelimit.db")
+    RATE_LIMIT_AI_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_AI_USER_PER_MINUTE", 30))
+    RATE_LIMIT_AI_USER_BURST = int(os.getenv("RATE_LIMIT_AI_USER_BURST", 10))
+    RATE_LIMIT_AI_GLOBAL_PER_MINUTE = float(os.getenv("RATE_LIMIT_AI_GLOBAL_PER_MINUTE", 600))
+    RATE_LIMIT_AI_GLOBAL_BURST = int(os.getenv("RATE_LIMIT_AI_GLOBAL_BURST", 60))
+    RATE_LIMIT_AI_CONCURRENCY = int(os.getenv("RATE_LIMIT_AI_CONCURRENCY", 4))
+    RATE_LIMIT_BULK_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_BULK_USER_PER_MINUTE", 10))
+    RATE_LIMIT_BULK_USER_BURST = int(os.getenv("RATE_LIMIT_BULK_USER_BURST", 3))
+    RATE_LIMIT_BULK_CONCURRENCY = int(os.getenv("RATE_LIMIT_BULK_CONCURRENCY", 2))
+    RATE_LIMIT_LIVE_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_LIVE_USER_PER_MINUTE", 20))
+    RATE_LIMIT_LIVE_USER_BURST = int(os.getenv("RATE_LIMIT_LIVE_USER_BURST", 5))
+    RATE_LIMIT_LIVE_CONCURRENCY = int(os.getenv("RATE_LIMIT_LIVE_CONCURRENCY", 0))
+
+    # Per-process PostgreSQL connection pool
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+    # Idle SQLite connections kept per process (0 = open one per request), and prepared
+    # statements cached on each
+    SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", 16))
+    SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", 256))
+    # Per-tenant SQLite shards (0 = everything in DATABASE_PATH): new users are spread over
+    # SHARD_COUNT files in SHARD_DIR (default: "shards" beside DATABASE_PATH); tenants moving
+    # between shards get a 503 for the duration
+    SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0))
+    SHARD_DIR = os.getenv("SHARD_DIR")
+    SHARD_MOVE_GRACE_SECONDS = float(os.getenv("SHARD_MOVE_GRACE_SECONDS", 2))
+    # Read replicas for @read_only views: a Postgres standby, or on SQLite a snapshot of each
+    # database file refreshed every SQLITE_REPLICA_REFRESH_SECONDS (0 = no replica). A replica
+    # further behind than REPLICA_MAX_LAG_SECONDS is skipped.
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+    SQLITE_REPLICA_REFRESH_SECONDS = float(os.getenv("SQLITE_REPLICA_REFRESH_SECONDS", 0))
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 30))
+
+    # Run schema setup inside create_app (off by default; deploys run the migrate command once)
+    AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() == "true"
+
     DEBUG = os.getenv("FLASK_DEBUG", "false").lower() == "true"
     FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5000")
     PORT = int(os.getenv("PORT", 5000))
 
+    # Response compression and static asset pipeline
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+    BROTLI_LEVEL = int(os.getenv("BROTLI_LEVEL", 5))
+    STATIC_BUILD_DIR = os.getenv("STATIC_BUILD_DIR", os.path.join(os.path.dirname(__file__), "data", "static"))
+    STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", 31536000))
+
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+    # Engagement prediction for drafts (services/engagement.py): model file, how often the scheduler
+    # folds newly settled posts into it (0 = only `flask train-engagement`), hours after publishing
+    # before a post's metrics count, posts needed before the model replaces per-channel priors, and
+    # how often each process checks the file for a newer model
+    ENGAGEMENT_MODEL_PATH = os.getenv("ENGAGEMENT_MODEL_PATH") or os.path.join(os.path.dirname(__file__), "data",
+                                                                               "engagement_model.json")
+    ENGAGEMENT_RETRAIN_SECONDS = int(os.getenv("ENGAGEMENT_RETRAIN_SECONDS", 3600))
+    ENGAGEMENT_SETTLE_HOURS = float(os.getenv("ENGAGEMENT_SETTLE_HOURS", 48))
+    ENGAGEMENT_MIN_SAMPLES = int(os.getenv("ENGAGEMENT_MIN_SAMPLES", 200))
+    ENGAGEMENT_RELOAD_SECONDS = float(os.getenv("ENGAGEMENT_RELOAD_SECONDS", 60))
+    # Top-content rankings: how often the scheduler slides the 7/30/90-day windows (0 = never)
+    RANKINGS_ADVANCE_SECONDS = int(os.getenv("RANKINGS_ADVANCE_SECONDS", 3600))
+    # Live dashboard updates over SSE. LIVE_BROKER=memory reaches streams in the same process only;
+    # sqlite shares events between the workers on a host via LIVE_BROKER_PATH. Streams end after
+    # LIVE_STREAM_SECONDS and the browser reconnects. Sync workers refuse streams (the dashboard polls);
+    # a gthread/gevent/eventlet worker holds at most LIVE_MAX_STREAMS (0 = half of its threads or
+    # worker connections), always fewer than it serves, and notices a closed stream at the next keepalive
+    LIVE_BROKER = os.getenv("LIVE_BROKER", "memory")
+    LIVE_BROKER_PATH = os.getenv("LIVE_BROKER_PATH") or os.path.join(os.path.dirname(__file__), "data", "live.db")
+    LIVE_POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", 0.25))
+    LIVE_RETENTION_SECONDS = float(os.getenv("LIVE_RETENTION_SECONDS", 600))
+    LIVE_REPLAY_EVENTS = int(os.getenv("LIVE_REPLAY_EVENTS", 100))
+    LIVE_STREAM_SECONDS = float(os.getenv("LIVE_STREAM_SECONDS", 45))
+    LIVE_MAX_STREAMS = int(os.getenv("LIVE_MAX_STREAMS", 0))
+    LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", 5))
+    LIVE_RETRY_MS = int(os.getenv("LIVE_RETRY_MS", 1000))
+    # Seed for the mocked AI and analytics figures (unset = different on every run)
+    RANDOM_SEED = int(os.getenv("RANDOM_SEED")) if os.getenv("RANDOM_SEED") else None
@@ -1,38 +1,433 @@
+import datetime
 import sqlite3
+import logging
 import os
+import queue
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+import queries
 from config import Config
+from instrumentation import STATEMENT_CACHE, count_commit, count_query, span
+
+slow_query_log = logging.getLogger("database.slow_query")
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+# Names of the registered statements already prepared on each raw connection
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+class InstrumentedConnection:
+    """Wraps a DB-API connection: spans, per-request query counting and the slow query log."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._savepoints = 0
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def execute(self, sql, params=()):
+        return self._run(self._conn.execute, sql, params)
+
+    def run(self, name, params=()):
+        """Execute the statement registered under name (see queries.py)."""
+        stmt = queries.get(name)
+        raw = self._conn.raw if isinstance(self._conn, PooledConnection) else self._conn
+        with _prepared_lock:
+            prepared = _prepared.setdefault(raw, set())
+        # SQLITE_STATEMENT_CACHE=0 turns sqlite3's cache off: every run is prepared again
+        hit = name in prepared and (Config.DATABASE_TYPE == "postgresql" or Config.SQLITE_STATEMENT_CACHE > 0)
+        STATEMENT_CACHE.inc((name, "hit" if hit else "miss"))
+        if Config.DATABASE_TYPE == "postgresql":
+            result = self._run(lambda sql, p: self._execute_prepared(raw, stmt, hit, p), stmt.sql, params)
+        else:
+            # sqlite3 prepares by SQL text and keeps the statement in the connection's cache
+            result = self._run(self._conn.execute, stmt.sql, params)
+        prepared.add(name)
+        return result
+
+    def _execute_prepared(self, raw, stmt, prepared, params):
+        cursor = raw.cursor()
+        if not prepared:
+            cursor.execute(f"PREPARE {stmt.pg_name} AS {stmt.pg_sql}")
+        args = f"({', '.join(['%s'] * stmt.param_count)})" if stmt.param_count else ""
+        cursor.execute(f"EXECUTE {stmt.pg_name}{args}", params)
+        return cursor
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(self._conn.executemany, sql, seq_of_params, explain=False)
+
+    def _run(self, fn, sql, params, explain=True):
+        count_query()
+        start = time.perf_counter()
+        with span("db.query", sql=sql):
+            result = fn(sql, params)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if Config.SLOW_QUERY_MS and elapsed_ms >= Config.SLOW_QUERY_MS:
+            plan = self._explain(sql, params) if explain else "(executemany)"
+            slow_query_log.warning("slow query (%.1f ms): %s\nplan:\n%s", elapsed_ms, " ".join(sql.split()), plan)
+        return result
+
+    def _explain(self, sql, params):
+        if not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return "(not explainable)"
+        try:
+            if Config.DATABASE_TYPE == "postgresql":
+                cursor = self._conn.cursor()
+                cursor.execute("EXPLAIN " + sql.replace("?", "%s"), params)
+                return "\n".join(r[0] for r in cursor.fetchall())
+            rows = self._conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            return "\n".join(f"  {r[3]}" for r in rows) or "  (no plan steps)"
+        except Exception as e:
+            return f"(plan unavailable: {e})"
+
+    def commit(self):
+        if Config.DATABASE_TYPE != "postgresql" and not self._conn.in_transaction:
+            return      # nothing written, nothing to sync
+        count_commit()
+        with span("db.commit"):
+            return self._conn.commit()
+
+    def begin(self):
+        """Open a transaction now if none is open, instead of at the next write (or per statement on Postgres)."""
+        if Config.DATABASE_TYPE == "postgresql":
+            self._conn.begin()
+        elif not self._conn.in_transaction:
+            self._conn.execute("BEGIN")
+
+    @contextmanager
+    def savepoint(self):
+        """Run a nested block that can fail and roll back on its own without ending the transaction."""
+        self.begin()
+        self._savepoints += 1
+        name = f"sp_{self._savepoints}"
+        self.execute(f"SAVEPOINT {name}")
+        try:
+            yield self
+        except BaseException:
+            self.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            self.execute(f"RELEASE SAVEPOINT {name}")
+            raise
+        self.execute(f"RELEASE SAVEPOINT {name}")
+
+class ConnectionPool:
+    """LIFO pool. Owned by the process that created it; see reset_pools().
+
+    max_size caps connections in use (waiting up to `timeout` for one); None leaves them
+    uncapped. max_idle caps the idle connections kept for reuse (0 = no cap).
+    """
+
+    def __init__(self, connect, reset, max_size=None, timeout=None, max_idle=0):
+        self._connect = connect
+        self._reset = reset
+        self._idle = queue.LifoQueue(max_idle)
+        self._slots = threading.BoundedSemaphore(max_size) if max_size else None
+        self._timeout = timeout
+        self.pid = os.getpid()
+
+    def acquire(self):
+        if self._slots is not None and not self._slots.acquire(timeout=self._timeout):
+            raise RuntimeError("Timed out waiting for a database connection")
+        try:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+        except Exception:
+            if self._slots is not None:
+                self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if self._reset(conn):
+                self._idle.put_nowait(conn)
+        except Exception:
+            # Broken, or more idle connections than max_idle
+            try:
+                conn.close()
+            except Exception:
+                pass
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+class PooledConnection:
+    """Connection proxy whose close() hands the connection back to its pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def begin(self):
+        self._conn.autocommit = False
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
 
-def get_db():
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _connect_postgres(dsn=None):
+    import psycopg2
+    from psycopg2.extras import DictCursor
+    conn = psycopg2.connect(dsn or Config.DATABASE_URL, cursor_factory=DictCursor)
+    conn.autocommit = True
+    return conn
+
+def _reset_postgres(conn):
+    if conn.closed:
+        return False
+    conn.rollback()
+    # Undo PooledConnection.begin() for the next borrower
+    conn.autocommit = True
+    return True
+
+class _SQLiteConnection(sqlite3.Connection):
+    """Subclassed only so it can be a key in _prepared (the base type has no weakref support)."""
+
+def _connect_sqlite(path, read_only=False):
+    # A pooled connection moves between threads (one at a time), hence check_same_thread=False.
+    # cached_statements keeps every registered statement prepared on the connection.
+    conn = sqlite3.connect(f"file:{path}?mode=ro" if read_only else path, uri=read_only,
+                           check_same_thread=False, factory=_SQLiteConnection,
+                           cached_statements=Config.SQLITE_STATEMENT_CACHE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+def _reset_sqlite(conn):
+    conn.rollback()
+    return True
+
+def _get_pool(key, read_only=False):
+    """key is "postgresql", "postgresql-replica" or the path of a SQLite file (the main
+    database, a shard, or a read-only replica snapshot of either)."""
+    # A pool inherited through fork (gunicorn --preload) shares sockets and file handles with
+    # the master: abandon it without closing and build a fresh one for this process.
+    pool = _pools.get(key)
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.pid != os.getpid():
+                if key == "postgresql":
+                    pool = ConnectionPool(_connect_postgres, _reset_postgres,
+                                          Config.DB_POOL_SIZE, Config.DB_POOL_TIMEOUT)
+                elif key == "postgresql-replica":
+                    pool = ConnectionPool(lambda: _connect_postgres(Config.DATABASE_REPLICA_URL), _reset_postgres,
+                                          Config.DB_POOL_SIZE, Config.DB_POOL_TIMEOUT)
+                else:
+                    # SQLite has no server-side connection limit: only the idle set is capped
+                    pool = ConnectionPool(lambda: _connect_sqlite(key, read_only), _reset_sqlite,
+                                          max_idle=Config.SQLITE_POOL_SIZE)
+                _pools[key] = pool
+    return pool
+
+def reset_pools():
+    """Forget pooled connections; called from gunicorn's post_fork hook."""
+    global _pools, _pools_lock
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+# ─────────────────────────────────────────────
+# Tenant shards (SQLite only; see sharding.py)
+# ─────────────────────────────────────────────
+HOME = "home"   # the main database: users, refresh tokens, the shard directory
+
+def sharding_enabled():
+    return Config.SHARD_COUNT > 0 and Config.DATABASE_TYPE == "sqlite"
+
+def shard_path(shard):
+    if shard in (None, HOME) or not sharding_enabled():
+        return Config.DATABASE_PATH
+    shard_dir = Config.SHARD_DIR or os.path.join(os.path.dirname(Config.DATABASE_PATH), "shards")
+    return os.path.join(shard_dir, f"{shard}.db")
+
+def tenant_shard(user):
+    """Shard holding a user's rows; `user` is a row from the users.by_id statement."""
+    if not sharding_enabled():
+        return HOME
+    return user.get("shard") or HOME
+
+def replica_path(shard=None):
+    """The read-only snapshot of a SQLite database file (see replicas.py)."""
+    root, ext = os.path.splitext(shard_path(shard))
+    return f"{root}.replica{ext}"
+
+def get_db(shard=None, replica=False):
+    """Connection to the main database, or to a tenant shard when sharding is on.
+
+    replica=True gives a read-only connection to its replica instead: the Postgres standby, or
+    the SQLite snapshot at replica_path(shard).
+    """
+    with span("db.connect"):
+        return InstrumentedConnection(_connect(shard, replica))
+
+def raw_connection(shard=None, replica=False):
+    """An uninstrumented connection, for housekeeping that shouldn't count against a request."""
+    return _connect(shard, replica)
+
+def integrity_errors():
+    """The driver's IntegrityError classes, for `except integrity_errors():` around a write that
+    can hit a UNIQUE constraint."""
+    if Config.DATABASE_TYPE == "postgresql":
+        import psycopg2
+        return (sqlite3.IntegrityError, psycopg2.IntegrityError)
+    return (sqlite3.IntegrityError,)
+
+def _connect(shard=None, replica=False):
     if Config.DATABASE_TYPE == "postgresql":
         try:
-            import psycopg2
-            from psycopg2.extras import DictCursor
-            conn = psycopg2.connect(Config.DATABASE_URL, cursor_factory=DictCursor)
-            conn.autocommit = True
-            return conn
+            pool = _get_pool("postgresql-replica" if replica else "postgresql")
+            return PooledConnection(pool, pool.acquire())
         except ImportError:
             print("Warning: psycopg2 not installed, falling back to SQLite")
             Config.DATABASE_TYPE = "sqlite"
             Config.DATABASE_PATH = os.path.join(os.path.dirname(__file__), "data", "marketing.db")
-            conn = sqlite3.connect(Config.DATABASE_PATH)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON")
-            return conn
+    path = replica_path(shard) if replica else shard_path(shard)
+    if not Config.SQLITE_POOL_SIZE:
+        return _connect_sqlite(path, replica)
+    pool = _get_pool(path, replica)
+    return PooledConnection(pool, pool.acquire())
+
+# ─────────────────────────────────────────────
+# Request-scoped unit of work
+# ─────────────────────────────────────────────
+class UnitOfWork:
+    """One connection and one transaction for everything a request does.
+
+    Opened by the first request_db() call (usually the auth lookup), committed once after the
+    view returns and rolled back instead if the response is a 5xx or the request raised. With
+    sharding on, a request can touch the main database and its tenant's shard: each gets one
+    connection, committed shard first (there is no two-phase commit across files). Reads a
+    @read_only view sends to a replica get a connection of their own, never committed.
+    """
+
+    def __init__(self):
+        self._dbs = {}
+        self._after_commit = []
+
+    def db(self, shard, replica=False):
+        db = self._dbs.get((shard, replica))
+        if db is None:
+            db = self._dbs[shard, replica] = get_db(shard, replica)
+            if Config.DATABASE_TYPE == "postgresql":
+                db.begin()
+            # SQLite opens the transaction at the first write, so the reads before it don't
+            # hold a shared lock for the rest of the request.
+        return db
+
+    def after_commit(self, callback):
+        self._after_commit.append(callback)
+
+    def finish(self, commit):
+        if not self._dbs:
+            return
+        try:
+            for shard, replica in sorted(self._dbs, key=lambda key: key[0] == HOME):
+                if commit and not replica:
+                    self._dbs[shard, replica].commit()
+                else:
+                    self._dbs[shard, replica].rollback()
+        finally:
+            for db in self._dbs.values():
+                db.close()
+            self._dbs = {}
+        if commit:
+            for callback in self._after_commit:
+                callback()
+
+def request_db():
+    """The current request's connection. Views write through it and never commit or close it.
+
+    Once @require_auth has set request.current_user this is the user's tenant shard; before
+    that (the auth lookup itself, unauthenticated views) it is the main database. In a
+    @read_only view it may be the shard's replica (see replicas.py).
+    """
+    uow = g.get("unit_of_work")
+    if uow is None:
+        uow = g.unit_of_work = UnitOfWork()
+    user = getattr(request, "current_user", None)
+    if g.get("read_only") and "use_replica" not in g:
+        import replicas
+        g.use_replica = replicas.use_replica(user)
+    return uow.db(tenant_shard(user) if user else HOME, g.get("use_replica", False))
+
+def after_commit(callback):
+    """Run callback once the request's writes are committed (straight away outside a request)."""
+    if has_request_context() and "unit_of_work" in g:
+        g.unit_of_work.after_commit(callback)
     else:
-        conn = sqlite3.connect(Config.DATABASE_PATH)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
+        callback()
+
+def init_app(app):
+    # Register after instrumentation.init_app: after_request hooks run in reverse order, so
+    # the commit lands inside the request's timing and commit count.
+    @app.after_request
+    def _commit_unit_of_work(response):
+        uow = g.pop("unit_of_work", None)
+        if uow is not None:
+            uow.finish(commit=response.status_code < 500)
+        return response
+
+    @app.teardown_request
+    def _rollback_unit_of_work(exc):
+        uow = g.pop("unit_of_work", None)
+        if uow is not None:
+            uow.finish(commit=False)
+
+# Table and column names below always come from code, never from request data.
+def insert_returning(db, table, values, returning="*"):
+    """INSERT one row and return it as stored, in a single statement."""
+    cols = ", ".join(values)
+    marks = ", ".join("?" for _ in values)
+    return db.execute(
+        f"INSERT INTO {table} ({cols}) VALUES ({marks}) RETURNING {returning}", tuple(values.values())
+    ).fetchone()
+
+def update_returning(db, table, values, where, touch_updated_at=False, returning="*"):
+    """UPDATE rows matching `where` and return the first updated row, or None if nothing matched."""
+    assignments = [f"{col} = ?" for col in values]
+    if touch_updated_at:
+        assignments.append("updated_at = CURRENT_TIMESTAMP")
+    if not assignments:
+        assignments.append("id = id")
+    conditions = " AND ".join(f"{col} = ?" for col in where)
+    return db.execute(
+        f"UPDATE {table} SET {', '.join(assignments)} WHERE {conditions} RETURNING {returning}",
+        (*values.values(), *where.values())
+    ).fetchone()
 
 def init_db():
     if Config.DATABASE_TYPE == "postgresql":
         init_postgres_db()
     else:
         init_sqlite_db()
+        if sharding_enabled():
+            import sharding
+            sharding.migrate()
 
-def init_sqlite_db():
-    os.makedirs(os.path.dirname(Config.DATABASE_PATH), exist_ok=True)
-    conn = get_db()
+def init_sqlite_db(shard=None):
+    """Create or upgrade the schema of the main database, or of one tenant shard."""
+    if sqlite3.sqlite_version_info < (3, 35, 0):
+        raise RuntimeError(f"SQLite 3.35+ is required for RETURNING (found {sqlite3.sqlite_version})")
+    os.makedirs(os.path.dirname(shard_path(shard)), exist_ok=True)
+    conn = get_db(shard)
     cursor = conn.cursor()
 
     cursor.executescript("""
@@ -66,7 +461,6 @@ def init_sqlite_db():
             goal TEXT,
             budget REAL DEFAULT 0,
             target_audience TEXT,
-            channels TEXT DEFAULT '[]',
             status TEXT DEFAULT 'draft',
             start_date TEXT,
             end_date TEXT,
@@ -76,6 +470,16 @@ def init_sqlite_db():
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         );
 
+        CREATE TABLE IF NOT EXISTS campaign_channels (
+            campaign_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            channel TEXT NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (campaign_id, channel),
+            FOREIGN KEY (campaign_id) REFERENCES campaigns(id) ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS idx_campaign_channels_user_channel ON campaign_channels (user_id, channel);
+
         CREATE TABLE IF NOT EXISTS content_items (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -85,17 +489,31 @@ def init_sqlite_db():
             title TEXT,
             body TEXT NOT NULL,
             tone TEXT DEFAULT 'professional',
-            hashtags TEXT DEFAULT '[]',
             status TEXT DEFAULT 'draft',
             scheduled_at TEXT,
             published_at TEXT,
             engagement_score REAL DEFAULT 0,
+            external_id TEXT,
+            publish_error TEXT,
+            lease_owner TEXT,
+            lease_expires_at TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
             FOREIGN KEY (campaign_id) REFERENCES campaigns(id) ON DELETE SET NULL
         );
 
+        CREATE TABLE IF NOT EXISTS content_hashtags (
+            content_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            hashtag TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (content_id, tag),
+            FOREIGN KEY (content_id) REFERENCES content_items(id) ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS idx_content_hashtags_user_tag ON content_hashtags (user_id, tag);
+
         CREATE TABLE IF NOT EXISTS calendar_events (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -108,6 +526,8 @@ def init_sqlite_db():
             channel TEXT,
             status TEXT DEFAULT 'planned',
             color TEXT DEFAULT '#667eea',
+            lease_owner TEXT,
+            lease_expires_at TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         );
@@ -156,6 +576,7 @@ def init_sqlite_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         );
+        CREATE INDEX IF NOT EXISTS idx_faqs_user_id ON faqs (user_id);
     """)
 
     # Lightweight migrations for existing SQLite DBs
@@ -215,9 +636,244 @@ def init_sqlite_db():
             """
         )
 
+    # Move JSON list columns into campaign_channels / content_hashtags
+    cursor.execute("PRAGMA table_info(campaigns)")
+    if "channels" in {row[1] for row in cursor.fetchall()}:
+        cursor.executescript(
+            """
+            INSERT OR IGNORE INTO campaign_channels (campaign_id, user_id, channel, position)
+            SELECT c.id, c.user_id, j.value, j.key
+            FROM campaigns c, json_each(CASE WHEN json_valid(c.channels) THEN c.channels ELSE '[]' END) j
+            WHERE j.type = 'text';
+
+            ALTER TABLE campaigns DROP COLUMN channels;
+            """
+        )
+    cursor.execute("PRAGMA table_info(content_items)")
+    if "hashtags" in {row[1] for row in cursor.fetchall()}:
+        cursor.executescript(
+            """
+            INSERT OR IGNORE INTO content_hashtags (content_id, user_id, hashtag, tag, position)
+            SELECT ci.id, ci.user_id, trim(j.value), lower(ltrim(trim(j.value), '#')), j.key
+            FROM content_items ci, json_each(CASE WHEN json_valid(ci.hashtags) THEN ci.hashtags ELSE '[]' END) j
+            WHERE j.type = 'text' AND ltrim(trim(j.value), '#') <> '';
+
+            ALTER TABLE content_items DROP COLUMN hashtags;
+            """
+        )
+
+    # Scheduled publishing: lease/outcome columns, due-time normalization and partial indexes
+    added_columns = {
+        "content_items": ("external_id", "publish_error", "lease_owner", "lease_expires_at"),
+        "calendar_events": ("lease_owner", "lease_expires_at"),
+    }
+    for table, new_columns in added_columns.items():
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = {row[1] for row in cursor.fetchall()}
+        for column in new_columns:
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+    cursor.executescript("""
+        UPDATE content_items SET scheduled_at = replace(scheduled_at, ' ', 'T')
+        WHERE scheduled_at LIKE '____-__-__ %';
+
+        CREATE INDEX IF NOT EXISTS idx_content_items_due ON content_items (scheduled_at)
+            WHERE status = 'scheduled';
+        CREATE INDEX IF NOT EXISTS idx_content_items_leased ON content_items (lease_expires_at)
+            WHERE status = 'publishing';
+        CREATE INDEX IF NOT EXISTS idx_calendar_events_due
+            ON calendar_events (event_date || 'T' || coalesce(event_time, '00:00'))
+            WHERE status = 'scheduled';
+        CREATE INDEX IF NOT EXISTS idx_calendar_events_leased ON calendar_events (lease_expires_at)
+            WHERE status = 'publishing';
+    """)
+
+    # Engagement model training: settled published posts and their per-post metrics
+    cursor.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_content_items_published ON content_items (published_at)
+            WHERE status = 'published';
+        CREATE INDEX IF NOT EXISTS idx_analytics_content ON analytics (content_id, metric_type)
+            WHERE content_id IS NOT NULL;
+    """)
+
+    # Refresh tokens: expiry sweep and revocation sync
+    cursor.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires_at ON refresh_tokens (expires_at);
+        CREATE INDEX IF NOT EXISTS idx_refresh_tokens_revoked_at ON refresh_tokens (revoked_at)
+            WHERE revoked_at IS NOT NULL;
+    """)
+
+    init_sqlite_search(cursor)
+    init_sqlite_rankings(cursor)
+
     conn.commit()
     conn.close()
-    print("Database initialized successfully")
+    print(f"Database initialized successfully ({shard})" if shard else "Database initialized successfully")
+
+# Source tables indexed by search_index: kind -> (code, table, title column, body column).
+# rowid = source id * 4 + code, so a hit's kind and id come back without a join and the
+# triggers can address an entry directly.
+SEARCH_SOURCES = {
+    "content": (0, "content_items", "title", "body"),
+    "campaign": (1, "campaigns", "name", "description"),
+    "chat": (2, "chat_messages", None, "message"),
+    "faq": (3, "faqs", "question", "answer"),
+}
+# The legacy PostgreSQL schema names some of those columns differently
+POSTGRES_SEARCH_COLUMNS = {("content_items", "body"): "content"}
+
+def search_columns(table, title, body):
+    """(title, body) column names of a search source on the configured database."""
+    if Config.DATABASE_TYPE == "sqlite":
+        return title, body
+    return (POSTGRES_SEARCH_COLUMNS.get((table, title), title) if title else None,
+            POSTGRES_SEARCH_COLUMNS.get((table, body), body))
+
+def init_sqlite_search(cursor):
+    """Create the FTS5 search index and the triggers that keep it in step with its sources."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+    exists = cursor.fetchone() is not None
+    # owner ("u<id>") and kind are indexed so the per-user / per-type filter is part of the MATCH
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            owner, kind, title, body,
+            tokenize = 'porter unicode61 remove_diacritics 2'
+        )
+    """)
+    for kind, (code, table, title, body) in SEARCH_SOURCES.items():
+        def entry(ref):
+            return (f"{ref}.id * 4 + {code}, 'u' || {ref}.user_id, '{kind}', "
+                    f"{f'{ref}.{title}' if title else 'NULL'}, {ref}.{body}")
+        columns = "rowid, owner, kind, title, body"
+        cursor.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO search_index ({columns}) VALUES ({entry("new")});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table}_search_au
+            AFTER UPDATE OF {", ".join(c for c in (title, body) if c)} ON {table} BEGIN
+                DELETE FROM search_index WHERE rowid = old.id * 4 + {code};
+                INSERT INTO search_index ({columns}) VALUES ({entry("new")});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN
+                DELETE FROM search_index WHERE rowid = old.id * 4 + {code};
+            END;
+        """)
+        if not exists:
+            cursor.execute(f"INSERT INTO search_index ({columns}) SELECT {entry(table)} FROM {table}")
+    if not exists:
+        # Titles weigh double; owner/kind never contribute to the score
+        cursor.execute("INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(0.0, 0.0, 2.0, 1.0)')")
+
+# Trailing windows (days) kept ranked in content_rankings, and the analytics metrics folded into them
+RANKING_WINDOWS = (7, 30, 90)
+RANKING_METRICS = ("reach", "clicks", "conversions", "engagement_rate")
+# content_rankings totals, summed from a content item's content_metric_days rows
+RANKING_TOTALS = ("sum(reach), sum(clicks), sum(conversions), sum(engagement_sum), sum(engagement_count), "
+                  "sum(engagement_sum) / nullif(sum(engagement_count), 0)")
+
+def init_sqlite_rankings(cursor, today=None):
+    """Create the per-day metric buckets and windowed rankings behind /api/analytics/top-content.
+
+    A trigger folds every per-content analytics event into its day bucket and into the running
+    totals of each window it falls in; rankings.advance() drops days that leave a window. Built
+    from the existing analytics the first time, with the windows ending at `today` (UTC by default).
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'content_rankings'")
+    exists = cursor.fetchone() is not None
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS content_metric_days (
+            content_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            reach REAL NOT NULL DEFAULT 0,
+            clicks REAL NOT NULL DEFAULT 0,
+            conversions REAL NOT NULL DEFAULT 0,
+            engagement_sum REAL NOT NULL DEFAULT 0,
+            engagement_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (content_id, day),
+            FOREIGN KEY (content_id) REFERENCES content_items (id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_content_metric_days_day ON content_metric_days (day);
+
+        -- Days after cutoff are in the window
+        CREATE TABLE IF NOT EXISTS ranking_windows (
+            window_days INTEGER PRIMARY KEY,
+            cutoff TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS content_rankings (
+            window_days INTEGER NOT NULL,
+            content_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            reach REAL NOT NULL DEFAULT 0,
+            clicks REAL NOT NULL DEFAULT 0,
+            conversions REAL NOT NULL DEFAULT 0,
+            engagement_sum REAL NOT NULL DEFAULT 0,
+            engagement_count INTEGER NOT NULL DEFAULT 0,
+            engagement_rate REAL,
+            PRIMARY KEY (content_id, window_days),
+            FOREIGN KEY (content_id) REFERENCES content_items (id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_content_rankings_reach
+            ON content_rankings (user_id, window_days, reach DESC);
+        CREATE INDEX IF NOT EXISTS idx_content_rankings_engagement_rate
+            ON content_rankings (user_id, window_days, engagement_rate DESC);
+        CREATE INDEX IF NOT EXISTS idx_content_rankings_conversions
+            ON content_rankings (user_id, window_days, conversions DESC);
+    """)
+    values = ("CASE WHEN new.metric_type = 'reach' THEN new.metric_value ELSE 0 END, "
+              "CASE WHEN new.metric_type = 'clicks' THEN new.metric_value ELSE 0 END, "
+              "CASE WHEN new.metric_type = 'conversions' THEN new.metric_value ELSE 0 END, "
+              "CASE WHEN new.metric_type = 'engagement_rate' THEN new.metric_value ELSE 0 END, "
+              "new.metric_type = 'engagement_rate'")
+    add = ("reach = reach + excluded.reach, clicks = clicks + excluded.clicks, "
+           "conversions = conversions + excluded.conversions, "
+           "engagement_sum = engagement_sum + excluded.engagement_sum, "
+           "engagement_count = engagement_count + excluded.engagement_count")
+    metrics = ", ".join(f"'{m}'" for m in RANKING_METRICS)
+    # Events for content that doesn't exist (analytics.content_id has no foreign key) are skipped
+    cursor.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS analytics_rankings_ai AFTER INSERT ON analytics
+        WHEN new.content_id IS NOT NULL AND new.metric_type IN ({metrics}) BEGIN
+            INSERT INTO content_metric_days (content_id, day, user_id, reach, clicks, conversions,
+                                             engagement_sum, engagement_count)
+            SELECT ci.id, date(new.recorded_at), ci.user_id, {values}
+            FROM content_items ci WHERE ci.id = new.content_id
+            ON CONFLICT (content_id, day) DO UPDATE SET {add};
+            INSERT INTO content_rankings (window_days, content_id, user_id, reach, clicks, conversions,
+                                          engagement_sum, engagement_count, engagement_rate)
+            SELECT w.window_days, ci.id, ci.user_id, {values},
+                   CASE WHEN new.metric_type = 'engagement_rate' THEN new.metric_value END
+            FROM ranking_windows w, content_items ci
+            WHERE ci.id = new.content_id AND date(new.recorded_at) > w.cutoff
+            ON CONFLICT (content_id, window_days) DO UPDATE SET {add},
+                engagement_rate = (engagement_sum + excluded.engagement_sum)
+                                  / nullif(engagement_count + excluded.engagement_count, 0);
+        END;
+    """)
+    if not exists:
+        today = today or datetime.datetime.utcnow().date()
+        cursor.executemany("INSERT INTO ranking_windows (window_days, cutoff) VALUES (?, ?)",
+                           [(w, (today - datetime.timedelta(days=w)).isoformat()) for w in RANKING_WINDOWS])
+        cursor.executescript(f"""
+            INSERT INTO content_metric_days (content_id, day, user_id, reach, clicks, conversions,
+                                             engagement_sum, engagement_count)
+            SELECT ci.id, date(a.recorded_at), ci.user_id,
+                   sum(CASE WHEN a.metric_type = 'reach' THEN a.metric_value ELSE 0 END),
+                   sum(CASE WHEN a.metric_type = 'clicks' THEN a.metric_value ELSE 0 END),
+                   sum(CASE WHEN a.metric_type = 'conversions' THEN a.metric_value ELSE 0 END),
+                   sum(CASE WHEN a.metric_type = 'engagement_rate' THEN a.metric_value ELSE 0 END),
+                   sum(a.metric_type = 'engagement_rate')
+            FROM analytics a JOIN content_items ci ON ci.id = a.content_id
+            WHERE a.metric_type IN ({metrics})
+            GROUP BY ci.id, date(a.recorded_at);
+
+            INSERT INTO content_rankings (window_days, content_id, user_id, reach, clicks, conversions,
+                                          engagement_sum, engagement_count, engagement_rate)
+            SELECT w.window_days, d.content_id, d.user_id, {RANKING_TOTALS}
+            FROM ranking_windows w JOIN content_metric_days d ON d.day > w.cutoff
+            GROUP BY w.window_days, d.content_id;
+        """)
 
 def init_postgres_db():
     conn = get_db()
@@ -247,6 +903,9 @@ def init_postgres_db():
             revoked_at TIMESTAMP,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+        CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires_at ON refresh_tokens (expires_at);
+        CREATE INDEX IF NOT EXISTS idx_refresh_tokens_revoked_at ON refresh_tokens (revoked_at)
+            WHERE revoked_at IS NOT NULL;
     """)
 
     cursor.execute("""
@@ -258,7 +917,6 @@ def init_postgres_db():
             goal TEXT,
             budget REAL DEFAULT 0,
             target_audience TEXT,
-            channels TEXT DEFAULT '[]',
             status TEXT DEFAULT 'draft',
             start_date TEXT,
             end_date TEXT,
@@ -268,6 +926,29 @@ def init_postgres_db():
         );
     """)
 
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS campaign_channels (
+            campaign_id INTEGER NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL,
+            channel TEXT NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (campaign_id, channel)
+        );
+        CREATE INDEX IF NOT EXISTS idx_campaign_channels_user_channel ON campaign_channels (user_id, channel);
+    """)
+
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns WHERE table_name = 'campaigns' AND column_name = 'channels'
+    """)
+    if cursor.fetchone():
+        cursor.execute("""
+            INSERT INTO campaign_channels (campaign_id, user_id, channel, position)
+            SELECT c.id, c.user_id, j.value, j.ordinality - 1
+            FROM campaigns c, json_array_elements_text(COALESCE(NULLIF(c.channels, ''), '[]')::json) WITH ORDINALITY j
+            ON CONFLICT DO NOTHING;
+            ALTER TABLE campaigns DROP COLUMN channels;
+        """)
+
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS content_items (
             id SERIAL PRIMARY KEY,
@@ -283,6 +964,18 @@ def init_postgres_db():
         );
     """)
 
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS content_hashtags (
+            content_id INTEGER NOT NULL REFERENCES content_items(id) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL,
+            hashtag TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (content_id, tag)
+        );
+        CREATE INDEX IF NOT EXISTS idx_content_hashtags_user_tag ON content_hashtags (user_id, tag);
+    """)
+
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS calendar_events (
             id SERIAL PRIMARY KEY,
@@ -320,6 +1013,7 @@ def init_postgres_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+        CREATE INDEX IF NOT EXISTS idx_faqs_user_id ON faqs (user_id);
     """)
 
     cursor.execute("""
@@ -333,4 +1027,16 @@ def init_postgres_db():
         );
     """)
 
+    # Full-text search: a generated, weighted tsvector per source table plus a GIN index
+    for _, table, title, body in SEARCH_SOURCES.values():
+        title, body = search_columns(table, title, body)
+        vector = f"setweight(to_tsvector('english', coalesce({body}, '')), 'B')"
+        if title:
+            vector = f"setweight(to_tsvector('english', coalesce({title}, '')), 'A') || {vector}"
+        cursor.execute(f"""
+            ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS ({vector}) STORED;
+            CREATE INDEX IF NOT EXISTS idx_{table}_search ON {table} USING GIN (search_vector);
+        """)
+
     print("PostgreSQL database initialized successfully")
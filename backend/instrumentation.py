@@ -0,0 +1,305 @@
+import collections
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+from config import Config
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Clients allowed to read /api/metrics when METRICS_TOKEN is unset
+LOOPBACK = ("127.0.0.1", "::1")
+
+# ─────────────────────────────────────────────
+# Histograms (Prometheus text exposition)
+# ─────────────────────────────────────────────
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            base = ",".join(f'{k}="{_escape_label(v)}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {c}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return "\n".join(lines)
+
+class Gauge:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            base = ",".join(f'{k}="{_escape_label(v)}"' for k, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return "\n".join(lines)
+
+class Counter(Gauge):
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        return super().render().replace(f"# TYPE {self.name} gauge", f"# TYPE {self.name} counter")
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint", ("endpoint", "method", "status"))
+SPAN_DURATION = Histogram(
+    "span_duration_seconds", "Time spent in instrumented spans by endpoint", ("endpoint", "span"))
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL execution time by normalized statement", ("statement",))
+QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements issued per request", ("endpoint",),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+COMMITS_PER_REQUEST = Histogram(
+    "db_commits_per_request", "Transactions committed per request", ("endpoint",),
+    buckets=(0, 1, 2, 3, 5, 8))
+SCHEDULER_LAG = Histogram(
+    "scheduler_publish_lag_seconds", "Delay between an item's due time and its publication", ("kind",),
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800))
+SCHEDULER_DUE = Gauge(
+    "scheduler_due_items", "Items past their due time and not yet published, at the last refresh", ("kind",))
+SCHEDULER_OLDEST_DUE = Gauge(
+    "scheduler_oldest_due_seconds", "Age of the oldest unpublished due item, at the last refresh", ("kind",))
+PUBLISH_SEND_DURATION = Histogram(
+    "publish_send_duration_seconds", "Connector send_batch calls by channel", ("channel",))
+STATEMENT_CACHE = Counter(
+    "db_statement_cache_total", "Registered statement runs by whether the connection had it prepared",
+    ("statement", "result"))
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total", "Requests rejected with 429 by route class and limit", ("route_class", "limit"))
+REPLICA_ROUTING = Counter(
+    "db_read_routing_total", "Read-only requests by where their reads went and why", ("target", "reason"))
+REPLICA_AGE = Gauge(
+    "db_replica_age_seconds", "How far behind the primary each replica was when last checked", ("shard",))
+LIVE_SUBSCRIBERS = Gauge(
+    "live_subscribers", "Live update streams open in this process", ("broker",))
+LIVE_EVENTS = Counter(
+    "live_events_total", "Live updates published, delivered to streams, or dropped from a full stream", ("outcome",))
+REGISTRY = [REQUEST_DURATION, SPAN_DURATION, QUERY_DURATION, QUERIES_PER_REQUEST, COMMITS_PER_REQUEST,
+            SCHEDULER_LAG, SCHEDULER_DUE, SCHEDULER_OLDEST_DUE, PUBLISH_SEND_DURATION, STATEMENT_CACHE,
+            RATE_LIMIT_REJECTIONS, REPLICA_ROUTING, REPLICA_AGE, LIVE_SUBSCRIBERS, LIVE_EVENTS]
+
+logger = logging.getLogger(__name__)
+
+def render_metrics():
+    return "\n".join(h.render() for h in REGISTRY) + "\n"
+
+# ─────────────────────────────────────────────
+# Spans
+# ─────────────────────────────────────────────
+_WS_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+def normalize_sql(sql):
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("(...)", sql)
+    return _WS_RE.sub(" ", sql).strip()
+
+def _endpoint():
+    return request.endpoint or "unmatched"
+
+@contextmanager
+def span(name, sql=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        statement = normalize_sql(sql) if sql is not None else None
+        if statement is not None:
+            QUERY_DURATION.observe((statement,), elapsed)
+        if has_request_context():
+            SPAN_DURATION.observe((_endpoint(), name), elapsed)
+            spans = g.setdefault("spans", [])
+            spans.append((name, elapsed, statement))
+
+# ─────────────────────────────────────────────
+# Query budgets
+# ─────────────────────────────────────────────
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+def query_budget(max_queries):
+    """Declare how many SQL statements a view may issue, including the auth lookup."""
+    def decorator(f):
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+def _current_query_budget():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, "query_budget", None)
+
+def _enforce_query_budget():
+    return current_app.testing or Config.QUERY_BUDGET_MODE == "raise"
+
+def count_query():
+    if not has_request_context():
+        return
+    g.query_count = g.get("query_count", 0) + 1
+    budget = _current_query_budget()
+    if budget is not None and g.query_count > budget and _enforce_query_budget():
+        raise QueryBudgetExceeded(f"{request.endpoint} issued {g.query_count} queries; budget is {budget}")
+
+def count_commit():
+    if has_request_context():
+        g.commit_count = g.get("commit_count", 0) + 1
+
+class InstrumentedJSONProvider(DefaultJSONProvider):
+    """Times JSON encoding of responses as the "serialize" span."""
+
+    def response(self, *args, **kwargs):
+        with span("serialize"):
+            return super().response(*args, **kwargs)
+
+# ─────────────────────────────────────────────
+# Sampling profiler for slow requests
+# ─────────────────────────────────────────────
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and folds it into flamegraph.pl input.
+
+    Uses a real OS thread, so it sees nothing under gevent/eventlet workers.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+# ─────────────────────────────────────────────
+# Flask wiring
+# ─────────────────────────────────────────────
+def _server_timing(spans):
+    totals = collections.Counter()
+    for name, elapsed, _ in spans:
+        totals[name] += elapsed
+    return ", ".join(f"{name.replace('.', '-')};dur={secs * 1000:.2f}" for name, secs in totals.items())
+
+def init_app(app):
+    app.json = InstrumentedJSONProvider(app)
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_start = time.perf_counter()
+        if Config.PROFILE_SLOW_MS > 0 and random.random() < Config.PROFILE_SAMPLE_RATE:
+            g.profiler = SamplingProfiler(threading.get_ident(), Config.PROFILE_INTERVAL_MS / 1000).start()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("request_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        REQUEST_DURATION.observe((_endpoint(), request.method, str(response.status_code)), elapsed)
+        query_count = g.get("query_count", 0)
+        QUERIES_PER_REQUEST.observe((_endpoint(),), query_count)
+        commit_count = g.get("commit_count", 0)
+        COMMITS_PER_REQUEST.observe((_endpoint(),), commit_count)
+        budget = _current_query_budget()
+        if budget is not None and query_count > budget and Config.QUERY_BUDGET_MODE == "log":
+            logger.warning("%s issued %d queries; budget is %d", request.endpoint, query_count, budget)
+        if Config.SERVER_TIMING:
+            timing = _server_timing(g.get("spans", []))
+            response.headers["Server-Timing"] = f"total;dur={elapsed * 1000:.2f}" + (f", {timing}" if timing else "")
+            response.headers["X-Query-Count"] = str(query_count)
+            response.headers["X-Commit-Count"] = str(commit_count)
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            if elapsed * 1000 >= Config.PROFILE_SLOW_MS:
+                name = f"{int(time.time() * 1000)}-{_endpoint()}-{int(elapsed * 1000)}ms.folded"
+                profiler.dump(os.path.join(Config.PROFILE_DIR, name))
+        return response
+
+    @app.teardown_request
+    def _stop_profiler(exc):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+
+    @app.route("/api/metrics")
+    def metrics():
+        if Config.METRICS_TOKEN:
+            if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {Config.METRICS_TOKEN}"):
+                return jsonify({"error": "Unauthorized"}), 401
+        elif request.remote_addr not in LOOPBACK or "X-Forwarded-For" in request.headers:
+            # Without a token only a scraper on this host, not through a proxy, may read the metrics
+            return jsonify({"error": "Not found"}), 404
+        return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
@@ -0,0 +1,355 @@
+"""Live dashboard updates: per-user metric deltas pushed over Server-Sent Events.
+
+Analytics events ingested through POST /api/analytics/events are summed into one delta per
+request and published to the user's channel once the transaction commits. GET
+/api/analytics/live holds an SSE stream open and forwards every delta for the signed-in user,
+so a dashboard adds the change to what it shows instead of re-fetching every panel.
+
+The broker is in memory (per process) by default, which is enough for a single worker.
+LIVE_BROKER=sqlite appends events to a small SQLite file shared by every worker on the host
+(LIVE_BROKER_PATH); each process tails it from one thread and fans out to its own streams, so an
+event ingested by any worker reaches the streams held by all of them. If the shared store fails,
+the delta is dropped: live updates are best effort, the database stays the source of truth.
+
+Each open stream ties up a request thread (a greenlet with gevent/eventlet) for up to
+LIVE_STREAM_SECONDS, so streams are only served by servers that run several requests per worker
+(wsgi.multithread: gunicorn's gthread, gevent and eventlet workers, the development server); a
+sync worker answers 501 and the dashboard polls instead. A worker holds at most max_streams() at
+once, always fewer than it can serve, so ordinary requests keep a free thread. A stream whose
+client went away ends at its next write, within LIVE_KEEPALIVE_SECONDS.
+
+Streams end after LIVE_STREAM_SECONDS; the browser reconnects with Last-Event-ID and gets what
+it missed. A client whose id is too old to replay (or whose stream fell behind) is sent a
+"resync" event and re-fetches once.
+"""
+import collections
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from config import Config
+from instrumentation import LIVE_EVENTS, LIVE_SUBSCRIBERS
+
+logger = logging.getLogger(__name__)
+
+# Deltas buffered per stream before it is considered behind and told to resync
+SUBSCRIBER_QUEUE_SIZE = 256
+# Users whose recent events the memory broker keeps for Last-Event-ID replay
+REPLAY_MAX_USERS = 1000
+PRUNE_INTERVAL_SECONDS = 60
+# Streams per worker when the server doesn't say how many requests it serves at once
+# (the threaded development server starts a thread per request)
+DEFAULT_MAX_STREAMS = 16
+
+@dataclass(frozen=True)
+class Event:
+    id: str         # SSE id, what the browser sends back as Last-Event-ID
+    seq: int        # order within the broker
+    user_id: int
+    name: str
+    data: str       # JSON
+
+    def render(self):
+        return f"id: {self.id}\nevent: {self.name}\ndata: {self.data}\n\n"
+
+class Subscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.behind = False
+        self._queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.behind = True
+            LIVE_EVENTS.inc(("dropped",))
+
+    def get(self, timeout):
+        """The next event, or None if nothing arrived within timeout seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class _Fanout:
+    """Delivers events to the streams open in this process."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self._subscribers = {}      # user_id -> set of Subscription
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            LIVE_SUBSCRIBERS.set((self.kind,), sum(len(s) for s in self._subscribers.values()))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.user_id, None)
+            LIVE_SUBSCRIBERS.set((self.kind,), sum(len(s) for s in self._subscribers.values()))
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event.user_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+        LIVE_EVENTS.inc(("delivered",), len(subscribers))
+
+class MemoryBroker(_Fanout):
+    """Events live only in this process; ids carry a per-process epoch so another worker's
+    (or a restarted worker's) Last-Event-ID is recognised as unknown rather than misread."""
+
+    def __init__(self, replay_events):
+        super().__init__("memory")
+        self.replay_events = replay_events
+        self.epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._recent = collections.OrderedDict()   # user_id -> deque of recent events, least recent user first
+        self._evicted = {}      # user_id -> seq of the newest event that fell off that user's deque
+        self._forgotten = 0     # newest seq of any user whose deque was dropped altogether
+
+    def publish(self, user_id, name, payload):
+        with self._lock:
+            self._seq += 1
+            event = Event(f"{self.epoch}-{self._seq}", self._seq, user_id, name, json.dumps(payload))
+            recent = self._recent.pop(user_id, None) or collections.deque()
+            if len(recent) == self.replay_events:
+                self._evicted[user_id] = recent.popleft().seq
+            recent.append(event)
+            self._recent[user_id] = recent
+            if len(self._recent) > REPLAY_MAX_USERS:
+                dropped, events = self._recent.popitem(last=False)
+                self._evicted.pop(dropped, None)
+                self._forgotten = max(self._forgotten, events[-1].seq)
+        LIVE_EVENTS.inc(("published",))
+        self.dispatch(event)
+
+    def position(self):
+        return f"{self.epoch}-{self._seq}"
+
+    def replay(self, user_id, last_event_id):
+        """The user's events after last_event_id, or None if some of them can't be recovered."""
+        epoch, _, seq = (last_event_id or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        with self._lock:
+            if user_id not in self._recent:
+                return None if self._forgotten > int(seq) else []
+            if self._evicted.get(user_id, 0) > int(seq):
+                return None
+            return [e for e in self._recent[user_id] if e.seq > int(seq)]
+
+class SQLiteBroker(_Fanout):
+    """Events appended to a SQLite file shared by all processes on the host, tailed by a thread."""
+
+    def __init__(self, path, poll_seconds, retention_seconds):
+        super().__init__("sqlite")
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._next_prune = 0.0
+        self._last_seq = self._connect().execute("SELECT coalesce(max(id), 0) FROM live_events").fetchone()[0]
+        threading.Thread(target=self._tail, name="live-broker", daemon=True).start()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Events are disposable: skip fsync on every publish
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS live_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_live_events_user ON live_events (user_id, id);
+            CREATE INDEX IF NOT EXISTS idx_live_events_created_at ON live_events (created_at);
+        """)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def publish(self, user_id, name, payload):
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("INSERT INTO live_events (user_id, name, data, created_at) VALUES (?, ?, ?, ?)",
+                         (user_id, name, json.dumps(payload), now))
+            if now >= self._next_prune:
+                conn.execute("DELETE FROM live_events WHERE created_at < ?", (now - self.retention_seconds,))
+                self._next_prune = now + PRUNE_INTERVAL_SECONDS
+        except sqlite3.Error as e:
+            logger.warning("live broker unavailable, dropping update for user %s: %s", user_id, e)
+            return
+        LIVE_EVENTS.inc(("published",))
+
+    def position(self):
+        return str(self._last_seq)
+
+    def replay(self, user_id, last_event_id):
+        if not (last_event_id or "").isdigit():
+            return None
+        after = int(last_event_id)
+        try:
+            conn = self._connect()
+            oldest, newest = conn.execute("SELECT min(id), max(id) FROM live_events").fetchone()
+            if after > (newest or 0) or (oldest is not None and oldest > after + 1):
+                # Not from this file, or pruned since: can't tell what was missed
+                return None
+            rows = conn.execute("SELECT id, user_id, name, data FROM live_events WHERE user_id = ? AND id > ? "
+                                "ORDER BY id", (user_id, after)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("live broker unavailable, cannot replay: %s", e)
+            return None
+        return [Event(str(r[0]), r[0], r[1], r[2], r[3]) for r in rows]
+
+    def _tail(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                conn = self._connect()
+                if not self._subscribers:
+                    # Nobody to deliver to here: just keep up
+                    self._last_seq = conn.execute("SELECT coalesce(max(id), ?) FROM live_events",
+                                                  (self._last_seq,)).fetchone()[0]
+                    continue
+                rows = conn.execute("SELECT id, user_id, name, data FROM live_events WHERE id > ? ORDER BY id",
+                                    (self._last_seq,)).fetchall()
+            except sqlite3.Error as e:
+                logger.warning("live broker tail failed: %s", e)
+                continue
+            for r in rows:
+                self.dispatch(Event(str(r[0]), r[0], r[1], r[2], r[3]))
+                self._last_seq = r[0]
+
+_broker = None
+_broker_pid = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    # Rebuilt after fork: the tail thread does not survive it
+    global _broker, _broker_pid
+    with _broker_lock:
+        if _broker is None or _broker_pid != os.getpid():
+            if Config.LIVE_BROKER == "sqlite":
+                _broker = SQLiteBroker(Config.LIVE_BROKER_PATH, Config.LIVE_POLL_SECONDS,
+                                       Config.LIVE_RETENTION_SECONDS)
+            else:
+                _broker = MemoryBroker(Config.LIVE_REPLAY_EVENTS)
+            _broker_pid = os.getpid()
+        return _broker
+
+# ─────────────────────────────────────────────
+# Stream admission
+# ─────────────────────────────────────────────
+_worker_capacity = None     # requests this gunicorn worker serves at once, None outside gunicorn
+_open_streams = 0
+_streams_lock = threading.Lock()
+
+def configure_worker(worker):
+    """Size the stream cap to this gunicorn worker: its connections for gevent/eventlet, else its
+    threads. Called from post_fork."""
+    global _worker_capacity, _open_streams
+    from gunicorn.workers.base_async import AsyncWorker
+    _worker_capacity = worker.cfg.worker_connections if isinstance(worker, AsyncWorker) else worker.cfg.threads
+    _open_streams = 0
+
+def max_streams():
+    """Streams this worker may hold open at once: LIVE_MAX_STREAMS (default half of what the worker
+    serves at once), and never all of it."""
+    if _worker_capacity is None:
+        return Config.LIVE_MAX_STREAMS or DEFAULT_MAX_STREAMS
+    return min(Config.LIVE_MAX_STREAMS or _worker_capacity // 2, _worker_capacity - 1)
+
+def admit_stream():
+    """Take one of this worker's stream slots; False if they are all in use."""
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= max_streams():
+            return False
+        _open_streams += 1
+    return True
+
+def release_stream():
+    global _open_streams
+    with _streams_lock:
+        _open_streams = max(_open_streams - 1, 0)
+
+# ─────────────────────────────────────────────
+# Deltas and the SSE stream
+# ─────────────────────────────────────────────
+def metric_delta(events):
+    """Sum ingested analytics events into one delta: totals per metric, and per channel,
+    campaign and content item."""
+    delta = {"events": len(events), "metrics": {}, "channels": {}, "campaigns": {}, "content": {}}
+    for e in events:
+        metric, value = e["metric_type"], e["metric_value"]
+        delta["metrics"][metric] = delta["metrics"].get(metric, 0) + value
+        for key, group in (("channel", "channels"), ("campaign_id", "campaigns"), ("content_id", "content")):
+            if e.get(key) is not None:
+                bucket = delta[group].setdefault(str(e[key]), {})
+                bucket[metric] = bucket.get(metric, 0) + value
+    return delta
+
+def publish_metrics(user_id, events):
+    get_broker().publish(user_id, "metrics", metric_delta(events))
+
+def _comment(text):
+    return f": {text}\n\n"
+
+def _resync():
+    return "event: resync\ndata: {}\n\n"
+
+def stream(user_id, last_event_id=None):
+    """SSE body for one user's stream: replay after last_event_id, then live events."""
+    broker = get_broker()
+    # Subscribe before replaying so nothing published in between is lost
+    subscription = broker.subscribe(user_id)
+    try:
+        yield f"retry: {Config.LIVE_RETRY_MS}\n\n"
+        seen = 0
+        if last_event_id:
+            missed = broker.replay(user_id, last_event_id)
+            if missed is None:
+                yield _resync()
+            for event in missed or ():
+                yield event.render()
+                seen = event.seq
+        else:
+            # Gives the browser an id to resume from even if nothing happens before it reconnects
+            yield f"id: {broker.position()}\nevent: ready\ndata: {{}}\n\n"
+        deadline = time.monotonic() + Config.LIVE_STREAM_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
+            event = subscription.get(min(Config.LIVE_KEEPALIVE_SECONDS, remaining))
+            if subscription.behind:
+                subscription.behind = False
+                yield _resync()
+            if event is None:
+                yield _comment("keepalive")
+            elif event.seq > seen:
+                yield event.render()
+    finally:
+        subscription.close()
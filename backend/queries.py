@@ -0,0 +1,58 @@
+"""Named SQL statements, declared once and executed with db.run(name, params).
+
+Blueprints define their fixed statements at import time. On SQLite a registered statement is
+prepared once per pooled connection and then served from the connection's statement cache
+(sized by SQLITE_STATEMENT_CACHE); on Postgres it is PREPAREd server-side once per pooled
+connection and run with EXECUTE, so the plan is reused instead of parsed and planned per
+request. Every run counts as a hit or miss in db_statement_cache_total on /api/metrics.
+
+Statements built from request data (optional filters, column lists) still go through
+db.execute().
+"""
+import re
+from dataclasses import dataclass
+
+_REGISTRY = {}
+
+_PLACEHOLDER_RE = re.compile(r"'(?:[^']|'')*'|\?")
+
+@dataclass(frozen=True)
+class Statement:
+    name: str
+    sql: str
+    pg_name: str
+    pg_sql: str
+    param_count: int
+
+def _to_postgres(sql):
+    """Rewrite ? placeholders as $1, $2, ... (leaving string literals alone)."""
+    count = 0
+
+    def number(match):
+        nonlocal count
+        if match.group(0) != "?":
+            return match.group(0)
+        count += 1
+        return f"${count}"
+    return _PLACEHOLDER_RE.sub(number, sql), count
+
+def define(name, sql):
+    """Register sql under name; redefining a name with different SQL is an error."""
+    sql = " ".join(sql.split())
+    existing = _REGISTRY.get(name)
+    if existing is not None:
+        if existing.sql != sql:
+            raise ValueError(f"statement {name!r} is already defined with different SQL")
+        return name
+    pg_sql, param_count = _to_postgres(sql)
+    _REGISTRY[name] = Statement(name, sql, "q_" + re.sub(r"\W", "_", name), pg_sql, param_count)
+    return name
+
+def get(name):
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise KeyError(f"no statement named {name!r}; define it with queries.define()") from None
+
+def registered():
+    return dict(_REGISTRY)
@@ -0,0 +1,68 @@
+"""Per-user top content over trailing windows, kept ranked as engagement events arrive.
+
+Every analytics event tied to a content item (reach, clicks, conversions, engagement_rate) is
+folded by a trigger into that item's day bucket (content_metric_days) and into its running
+totals for each window the day falls in (content_rankings, one row per item and window). The
+rankings carry an index per sortable metric on (user_id, window_days, metric DESC), so a top-K
+read walks the first K index entries instead of scanning and sorting the tenant's content.
+
+Windows slide by whole days: advance() moves each window's cutoff up to today and recomputes
+only the items that had activity on the days that just left it. The scheduler calls it every
+RANKINGS_ADVANCE_SECONDS; until it runs, a window keeps ending at its previous cutoff. SQLite
+only: the PostgreSQL schema has no per-content analytics.
+"""
+import datetime
+import logging
+
+from config import Config
+from database import RANKING_TOTALS, RANKING_WINDOWS
+import queries
+
+logger = logging.getLogger(__name__)
+
+# Metrics a ranking can be ordered by (each has an index)
+SORTABLE = ("reach", "engagement_rate", "conversions")
+
+for _metric in SORTABLE:
+    queries.define(f"rankings.top.{_metric}", f"""
+        SELECT r.content_id, r.reach, r.clicks, r.conversions, r.engagement_rate,
+               ci.title, ci.channel, ci.content_type
+        FROM content_rankings r JOIN content_items ci ON ci.id = r.content_id
+        WHERE r.user_id = ? AND r.window_days = ?
+        ORDER BY r.{_metric} DESC LIMIT ?
+    """)
+
+def top(db, user_id, metric="reach", window_days=30, limit=5):
+    """The user's `limit` best content items by `metric` over the last `window_days` days."""
+    if Config.DATABASE_TYPE != "sqlite":
+        return []
+    return db.run(f"rankings.top.{metric}", (user_id, window_days, limit)).fetchall()
+
+def advance(db, today=None):
+    """Slide every window so it ends at `today` (UTC by default); returns how many rankings changed."""
+    today = today or datetime.datetime.utcnow().date()
+    changed = 0
+    for window_days in RANKING_WINDOWS:
+        cutoff = (today - datetime.timedelta(days=window_days)).isoformat()
+        row = db.execute("SELECT cutoff FROM ranking_windows WHERE window_days = ?", (window_days,)).fetchone()
+        if row is None or row["cutoff"] >= cutoff:
+            continue
+        # Items with activity on the days leaving the window; their totals are summed afresh
+        # from the days still inside it, so no floating-point drift builds up
+        expired = "SELECT DISTINCT content_id FROM content_metric_days WHERE day > ? AND day <= ?"
+        cursor = db.execute(f"DELETE FROM content_rankings WHERE window_days = ? AND content_id IN ({expired})",
+                            (window_days, row["cutoff"], cutoff))
+        changed += cursor.rowcount
+        db.execute(f"""
+            INSERT INTO content_rankings (window_days, content_id, user_id, reach, clicks, conversions,
+                                          engagement_sum, engagement_count, engagement_rate)
+            SELECT ?, content_id, user_id, {RANKING_TOTALS}
+            FROM content_metric_days
+            WHERE day > ? AND content_id IN ({expired})
+            GROUP BY content_id
+        """, (window_days, cutoff, row["cutoff"], cutoff))
+        db.execute("UPDATE ranking_windows SET cutoff = ? WHERE window_days = ?", (cutoff, window_days))
+        db.commit()
+    if changed:
+        logger.info("advanced content rankings to %s (%d items re-ranked)", today, changed)
+    return changed
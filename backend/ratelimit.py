@@ -0,0 +1,282 @@
+"""Rate limiting and concurrency admission control for expensive routes.
+
+Views are grouped into route classes (see ROUTE_CLASSES). Each class can have a per-user and a
+global token bucket, and a cap on requests in flight. A request over any limit is rejected
+straight away with 429 and Retry-After instead of queueing behind the worker, so a tenant
+hammering AI generation can't take every worker away from ordinary CRUD traffic.
+
+State lives in memory (per process) by default. RATE_LIMIT_BACKEND=sqlite keeps it in a small
+SQLite file shared by every worker on the host, which is what makes the concurrency caps hold
+across sync gunicorn workers. If the shared store fails the request is let through.
+"""
+import functools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from flask import jsonify, make_response, request
+
+from config import Config
+from instrumentation import RATE_LIMIT_REJECTIONS, span
+
+logger = logging.getLogger(__name__)
+
+# Slots are leased so a worker killed mid-request can't hold one forever
+SLOT_LEASE_SECONDS = 300
+PRUNE_INTERVAL_SECONDS = 60
+
+@dataclass(frozen=True)
+class RouteLimits:
+    """Requests/minute and burst per user and across all users, and requests in flight (0 = no limit)."""
+    user_per_minute: float = 0
+    user_burst: int = 0
+    global_per_minute: float = 0
+    global_burst: int = 0
+    concurrency: int = 0
+
+ROUTE_CLASSES = {
+    # Calls into AIService: chat, content generation, strategies, calendars, tips
+    "ai": RouteLimits(Config.RATE_LIMIT_AI_USER_PER_MINUTE, Config.RATE_LIMIT_AI_USER_BURST,
+                      Config.RATE_LIMIT_AI_GLOBAL_PER_MINUTE, Config.RATE_LIMIT_AI_GLOBAL_BURST,
+                      Config.RATE_LIMIT_AI_CONCURRENCY),
+    # Streaming imports and exports, which hold a worker for the whole transfer
+    "bulk": RouteLimits(Config.RATE_LIMIT_BULK_USER_PER_MINUTE, Config.RATE_LIMIT_BULK_USER_BURST,
+                        concurrency=Config.RATE_LIMIT_BULK_CONCURRENCY),
+    # Live update streams, which hold a connection open for LIVE_STREAM_SECONDS
+    "live": RouteLimits(Config.RATE_LIMIT_LIVE_USER_PER_MINUTE, Config.RATE_LIMIT_LIVE_USER_BURST,
+                        concurrency=Config.RATE_LIMIT_LIVE_CONCURRENCY),
+}
+
+def _refill(tokens, updated, rate, capacity, now):
+    return min(capacity, tokens + max(now - updated, 0) * rate)
+
+# ─────────────────────────────────────────────
+# Backends
+# ─────────────────────────────────────────────
+class MemoryBackend:
+    def __init__(self):
+        self._buckets = {}      # key -> (tokens, updated, full_at)
+        self._slots = {}        # key -> {token: expires_at}
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+
+    def take(self, buckets, cost=1):
+        """Take `cost` tokens from every (key, rate/s, capacity) bucket, or from none of them.
+
+        Returns None when admitted, else (key, seconds until that bucket has enough tokens).
+        """
+        now = time.time()
+        with self._lock:
+            levels, denied = [], None
+            for key, rate, capacity in buckets:
+                tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+                tokens = _refill(tokens, updated, rate, capacity, now)
+                levels.append((key, rate, capacity, tokens))
+                if tokens < cost:
+                    wait = (cost - tokens) / rate
+                    if denied is None or wait > denied[1]:
+                        denied = (key, wait)
+            if denied is not None:
+                return denied
+            for key, rate, capacity, tokens in levels:
+                self._buckets[key] = (tokens - cost, now, now + (capacity - tokens + cost) / rate)
+            if now >= self._next_prune:
+                # A bucket that has refilled completely is the same as a missing one
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+                self._next_prune = now + PRUNE_INTERVAL_SECONDS
+        return None
+
+    def acquire_slot(self, key, limit):
+        now = time.time()
+        with self._lock:
+            holders = self._slots.setdefault(key, {})
+            for token, expires_at in list(holders.items()):
+                if expires_at <= now:
+                    del holders[token]
+            if len(holders) >= limit:
+                return None
+            token = uuid.uuid4().hex
+            holders[token] = now + SLOT_LEASE_SECONDS
+            return token
+
+    def release_slot(self, key, token):
+        with self._lock:
+            self._slots.get(key, {}).pop(token, None)
+
+class SQLiteBackend:
+    """Buckets and slots in a SQLite file shared by all processes on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._next_prune = 0.0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Limiter state is disposable: skip fsync on every admission
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                full_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS rate_slots (
+                key TEXT NOT NULL,
+                token TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (key, token)
+            ) WITHOUT ROWID;
+        """)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, buckets, cost=1):
+        conn = self._connect()
+        keys = [key for key, _, _ in buckets]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            stored = {row[0]: row[1:] for row in conn.execute(
+                f"SELECT key, tokens, updated FROM rate_buckets WHERE key IN ({', '.join('?' for _ in keys)})", keys)}
+            levels, denied = [], None
+            for key, rate, capacity in buckets:
+                tokens, updated = stored.get(key, (capacity, now))
+                tokens = _refill(tokens, updated, rate, capacity, now)
+                levels.append((key, tokens - cost, now, now + (capacity - tokens + cost) / rate))
+                if tokens < cost:
+                    wait = (cost - tokens) / rate
+                    if denied is None or wait > denied[1]:
+                        denied = (key, wait)
+            if denied is None:
+                conn.executemany(
+                    "INSERT INTO rate_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, "
+                    "full_at = excluded.full_at", levels)
+                if now >= self._next_prune:
+                    conn.execute("DELETE FROM rate_buckets WHERE full_at <= ?", (now,))
+                    conn.execute("DELETE FROM rate_slots WHERE expires_at <= ?", (now,))
+                    self._next_prune = now + PRUNE_INTERVAL_SECONDS
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return denied
+
+    def acquire_slot(self, key, limit):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            conn.execute("DELETE FROM rate_slots WHERE key = ? AND expires_at <= ?", (key, now))
+            in_use = conn.execute("SELECT count(*) FROM rate_slots WHERE key = ?", (key,)).fetchone()[0]
+            token = None
+            if in_use < limit:
+                token = uuid.uuid4().hex
+                conn.execute("INSERT INTO rate_slots (key, token, expires_at) VALUES (?, ?, ?)",
+                             (key, token, now + SLOT_LEASE_SECONDS))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return token
+
+    def release_slot(self, key, token):
+        self._connect().execute("DELETE FROM rate_slots WHERE key = ? AND token = ?", (key, token))
+
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if Config.RATE_LIMIT_BACKEND == "sqlite":
+            _backend = SQLiteBackend(Config.RATE_LIMIT_PATH)
+        else:
+            _backend = MemoryBackend()
+    return _backend
+
+# ─────────────────────────────────────────────
+# Admission
+# ─────────────────────────────────────────────
+def _buckets(route_class, limits, user_id):
+    buckets = []
+    if limits.user_per_minute:
+        buckets.append((f"{route_class}:user:{user_id}", limits.user_per_minute / 60,
+                        max(limits.user_burst, 1)))
+    if limits.global_per_minute:
+        buckets.append((f"{route_class}:global", limits.global_per_minute / 60,
+                        max(limits.global_burst, 1)))
+    return buckets
+
+def _reject(route_class, limit, retry_after):
+    RATE_LIMIT_REJECTIONS.inc((route_class, limit))
+    retry_after = max(math.ceil(retry_after), 1)
+    response = jsonify({"error": f"Too many requests, retry in {retry_after}s", "retry_after": retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+def _release(backend, key, token):
+    try:
+        backend.release_slot(key, token)
+    except sqlite3.Error as e:
+        # The lease expires on its own
+        logger.warning("could not release rate limit slot %s: %s", key, e)
+
+def rate_limit(route_class):
+    """Apply the route class's limits to the current user; goes below @require_auth."""
+    def decorator(f):
+        @functools.wraps(f)
+        def limited(*args, **kwargs):
+            limits = ROUTE_CLASSES[route_class]
+            if not Config.RATE_LIMIT_ENABLED:
+                return f(*args, **kwargs)
+            backend = get_backend()
+            slot_key, token = f"{route_class}:inflight", None
+            try:
+                with span("ratelimit"):
+                    # Slot first, so a request turned away while the class is saturated doesn't
+                    # also spend the user's tokens
+                    if limits.concurrency:
+                        token = backend.acquire_slot(slot_key, limits.concurrency)
+                        if token is None:
+                            return _reject(route_class, "concurrency", 1)
+                    buckets = _buckets(route_class, limits, request.current_user["id"])
+                    denied = backend.take(buckets) if buckets else None
+                    if denied is not None:
+                        if token is not None:
+                            _release(backend, slot_key, token)
+                        key, wait = denied
+                        return _reject(route_class, "global" if key.endswith(":global") else "user", wait)
+            except sqlite3.Error as e:
+                logger.warning("rate limiter unavailable, admitting request: %s", e)
+                if token is not None:
+                    _release(backend, slot_key, token)
+                token = None
+
+            if token is None:
+                return f(*args, **kwargs)
+            streamed = False
+            try:
+                response = make_response(f(*args, **kwargs))
+                if response.is_streamed:
+                    # Streamed responses keep their slot until the body has been sent
+                    response.call_on_close(lambda: _release(backend, slot_key, token))
+                    streamed = True
+                return response
+            finally:
+                if not streamed:
+                    _release(backend, slot_key, token)
+        return limited
+    return decorator
@@ -0,0 +1,136 @@
+"""Refresh token storage: issue, rotate and revoke on the caller's connection, and sweep.
+
+Tokens are stored as SHA-256 hashes. Rotation is one conditional UPDATE ... RETURNING, so a
+token can be exchanged at most once even when two refreshes race. Each process also keeps the
+hashes of revoked, unexpired tokens in memory (synced from the table every
+REFRESH_REVOCATION_SYNC_SECONDS) so a logged-out or replayed token is turned away without a
+database round-trip; the database stays the source of truth for everything else.
+"""
+import datetime
+import hashlib
+import logging
+import secrets
+import threading
+import time
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Re-read revocations this far behind the newest one seen, in case an older revoke committed late
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+
+def token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _timestamp(dt):
+    # Same text form sqlite3 used for the datetime objects stored before, so rows compare as text
+    return dt.isoformat(sep=" ")
+
+def _utcnow():
+    return datetime.datetime.utcnow()
+
+class RevocationList:
+    """Hashes of revoked refresh tokens that have not expired yet, for this process."""
+
+    def __init__(self, sync_seconds):
+        self.sync_seconds = sync_seconds
+        self._expires = {}          # token hash -> expires_at
+        self._watermark = None      # newest revoked_at seen
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def __contains__(self, token_hash):
+        return token_hash in self._expires
+
+    def __len__(self):
+        return len(self._expires)
+
+    def add(self, token_hash, expires_at):
+        with self._lock:
+            self._expires[token_hash] = str(expires_at)
+
+    def sync(self, db):
+        """Pick up revocations made by other processes; a no-op until the sync interval has passed."""
+        if time.monotonic() < self._next_sync:
+            return
+        now = _timestamp(_utcnow())
+        if self._watermark is None:
+            rows = db.execute(
+                "SELECT token_hash, expires_at, revoked_at FROM refresh_tokens "
+                "WHERE revoked_at IS NOT NULL AND expires_at > ?", (now,)
+            ).fetchall()
+        else:
+            since = datetime.datetime.fromisoformat(self._watermark) - SYNC_OVERLAP
+            rows = db.execute(
+                "SELECT token_hash, expires_at, revoked_at FROM refresh_tokens WHERE revoked_at >= ?",
+                (_timestamp(since),)
+            ).fetchall()
+        with self._lock:
+            for row in rows:
+                self._expires[row["token_hash"]] = str(row["expires_at"])
+                revoked_at = str(row["revoked_at"])
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+            self._expires = {h: exp for h, exp in self._expires.items() if exp > now}
+            if self._watermark is None:
+                self._watermark = now
+        self._next_sync = time.monotonic() + self.sync_seconds
+
+REVOKED = RevocationList(Config.REFRESH_REVOCATION_SYNC_SECONDS)
+
+def issue(db, user_id):
+    """Insert a new refresh token for user_id and return it; the caller commits."""
+    token = secrets.token_hex(32)
+    expires_at = _utcnow() + datetime.timedelta(days=Config.JWT_REFRESH_EXPIRY_DAYS)
+    db.execute(
+        "INSERT INTO refresh_tokens (user_id, token_hash, expires_at) VALUES (?, ?, ?)",
+        (user_id, token_hash(token), _timestamp(expires_at))
+    )
+    return token
+
+def rotate(db, token):
+    """Revoke a valid refresh token and return its user_id, or None if it can't be used.
+
+    The caller issues the replacement on the same connection and commits both together.
+    """
+    hashed = token_hash(token)
+    REVOKED.sync(db)
+    if hashed in REVOKED:
+        return None
+    row = db.execute(
+        "UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP "
+        "WHERE token_hash = ? AND revoked_at IS NULL AND expires_at > ? RETURNING user_id, expires_at",
+        (hashed, _timestamp(_utcnow()))
+    ).fetchone()
+    if row is None:
+        return None
+    REVOKED.add(hashed, row["expires_at"])
+    return row["user_id"]
+
+def revoke(db, token):
+    hashed = token_hash(token)
+    row = db.execute(
+        "UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP "
+        "WHERE token_hash = ? AND revoked_at IS NULL RETURNING expires_at", (hashed,)
+    ).fetchone()
+    if row is not None:
+        REVOKED.add(hashed, row["expires_at"])
+
+def sweep(db, batch_size=None):
+    """Delete expired refresh tokens in batches; returns the number of rows removed."""
+    batch_size = batch_size or Config.REFRESH_TOKEN_SWEEP_BATCH
+    now = _timestamp(_utcnow())
+    removed = 0
+    while True:
+        cursor = db.execute(
+            "DELETE FROM refresh_tokens WHERE id IN "
+            "(SELECT id FROM refresh_tokens WHERE expires_at <= ? LIMIT ?)", (now, batch_size)
+        )
+        db.commit()
+        removed += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            break
+    if removed:
+        logger.info("swept %d expired refresh tokens", removed)
+    return removed
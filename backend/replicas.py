@@ -0,0 +1,187 @@
+"""Read replicas for read-only views, with read-your-writes.
+
+Views marked @read_only (list views, calendar, chat history, analytics) run their queries on a
+replica when one is configured: the Postgres standby at DATABASE_REPLICA_URL, or on SQLite a
+snapshot of each database file (the main one and every shard) taken with the online backup API
+every SQLITE_REPLICA_REFRESH_SECONDS by the scheduler loop. Snapshots are kept in WAL mode and
+refreshed in place, so their readers never wait for a refresh or see a half-copied file, and
+readers of the primary no longer queue behind its writers for these views.
+
+Each replica has a watermark: the time up to which it holds every commit. A user's writes (any
+successful non-GET request) are remembered in this process and in a short-lived cookie, and
+their reads stay on the primary until the replica's watermark passes their last write. A
+replica whose watermark is more than REPLICA_MAX_LAG_SECONDS old is not used at all.
+"""
+import fcntl
+import functools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import g, request
+
+from config import Config
+from database import raw_connection, replica_path, shard_path, tenant_shard
+from instrumentation import REPLICA_AGE, REPLICA_ROUTING
+import sharding
+
+logger = logging.getLogger(__name__)
+
+WRITE_COOKIE = "last_write"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# How long a Postgres standby's watermark is reused before asking it again
+POSTGRES_CHECK_SECONDS = 1.0
+
+_last_writes = {}       # user id -> time of the user's last write through this process
+_lock = threading.Lock()
+_postgres_mark = (0.0, None)
+
+def enabled():
+    if Config.DATABASE_TYPE == "postgresql":
+        return bool(Config.DATABASE_REPLICA_URL)
+    return Config.SQLITE_REPLICA_REFRESH_SECONDS > 0
+
+def read_only(f):
+    """Let a view's request_db() reads go to a replica that has caught up with the user."""
+    @functools.wraps(f)
+    def decorated(*args, **kwargs):
+        g.read_only = enabled()
+        return f(*args, **kwargs)
+    return decorated
+
+def use_replica(user):
+    """Route this read-only request to the replica? Asked once, at its first request_db()."""
+    shard = tenant_shard(user)
+    mark = watermark(shard)
+    if mark is None or mark < time.time() - Config.REPLICA_MAX_LAG_SECONDS:
+        REPLICA_ROUTING.inc(("primary", "replica_behind"))
+        return False
+    if last_write(user["id"]) > mark:
+        REPLICA_ROUTING.inc(("primary", "recent_write"))
+        return False
+    REPLICA_ROUTING.inc(("replica", "caught_up"))
+    return True
+
+def last_write(user_id):
+    try:
+        cookie = float(request.cookies.get(WRITE_COOKIE, 0))
+    except ValueError:
+        cookie = 0.0
+    return max(_last_writes.get(user_id, 0.0), cookie)
+
+def watermark(shard=None):
+    """Time up to which the replica holds every commit, or None if there is no replica yet."""
+    if Config.DATABASE_TYPE == "postgresql":
+        return _postgres_watermark()
+    try:
+        mark = os.stat(_stamp_path(shard)).st_mtime
+    except FileNotFoundError:
+        return None
+    REPLICA_AGE.set((shard or "home",), round(time.time() - mark, 3))
+    return mark
+
+def _stamp_path(shard):
+    # The snapshot's mtime can't be used: in WAL mode its file changes only at checkpoints
+    return replica_path(shard) + ".stamp"
+
+def _postgres_watermark():
+    global _postgres_mark
+    checked, mark = _postgres_mark
+    if time.monotonic() - checked < POSTGRES_CHECK_SECONDS:
+        return mark
+    conn = raw_connection(replica=True)
+    try:
+        cursor = conn.cursor()
+        # A standby that has replayed all it received is as current as the primary has told it
+        cursor.execute("SELECT extract(epoch FROM CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+                       "THEN now() ELSE pg_last_xact_replay_timestamp() END)")
+        row = cursor.fetchone()
+        mark = float(row[0]) if row and row[0] is not None else None
+    except Exception:
+        logger.exception("could not read the replica's replay position")
+        mark = None
+    finally:
+        conn.close()
+    _postgres_mark = (time.monotonic(), mark)
+    if mark is not None:
+        REPLICA_AGE.set(("home",), round(time.time() - mark, 3))
+    return mark
+
+def init_app(app):
+    # Register before database.init_app: after_request hooks run in reverse order, so the
+    # write is recorded only once it is committed.
+    @app.after_request
+    def _record_write(response):
+        user = getattr(request, "current_user", None)
+        if (not enabled() or user is None or request.method in SAFE_METHODS
+                or response.status_code >= 400):
+            return response
+        now = time.time()
+        with _lock:
+            _last_writes[user["id"]] = now
+            if len(_last_writes) > 10000:
+                _forget_old_writes(now)
+        # Once the cookie expires any replica that is used at all has this write
+        response.set_cookie(WRITE_COOKIE, f"{now:.3f}", max_age=math.ceil(Config.REPLICA_MAX_LAG_SECONDS),
+                            httponly=True, secure=request.is_secure, samesite="Lax")
+        return response
+
+def _forget_old_writes(now):
+    cutoff = now - Config.REPLICA_MAX_LAG_SECONDS
+    for user_id in [u for u, t in _last_writes.items() if t < cutoff]:
+        del _last_writes[user_id]
+
+# ─────────────────────────────────────────────
+# SQLite snapshots
+# ─────────────────────────────────────────────
+def refresh(shard=None):
+    """Copy a database file into its snapshot; returns the new watermark, or None if another
+    process is refreshing it right now."""
+    target = replica_path(shard)
+    with open(target + ".lock", "a") as lock:
+        # One refresher at a time, so the stamp is always written by the copy it describes
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        started = time.time()
+        source = sqlite3.connect(shard_path(shard), timeout=30)
+        dest = sqlite3.connect(target, timeout=30)
+        try:
+            dest.execute("PRAGMA journal_mode = WAL")
+            # One step: the copy is a consistent image of the source as of its start
+            source.backup(dest)
+            dest.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        finally:
+            dest.close()
+            source.close()
+        # Swap the stamp in with its time already set: readers never see a newer watermark
+        stamp = _stamp_path(shard)
+        open(stamp + ".tmp", "w").close()
+        os.utime(stamp + ".tmp", (started, started))
+        os.replace(stamp + ".tmp", stamp)
+    return started
+
+def refresh_due():
+    """Refresh every snapshot older than SQLITE_REPLICA_REFRESH_SECONDS; returns how many were.
+
+    Safe to run from several schedulers at once: a snapshot another process is refreshing or
+    has just refreshed is skipped.
+    """
+    refreshed = 0
+    for shard in sharding.shards():
+        mark = watermark(shard)
+        if mark is not None and time.time() - mark < Config.SQLITE_REPLICA_REFRESH_SECONDS:
+            continue
+        try:
+            start = time.perf_counter()
+            if refresh(shard) is None:
+                continue
+            refreshed += 1
+            logger.debug("refreshed replica of %s in %.1f ms", shard, (time.perf_counter() - start) * 1000)
+        except sqlite3.Error:
+            logger.exception("refreshing the replica of %s failed", shard)
+    return refreshed
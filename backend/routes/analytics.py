@@ -1,60 +1,170 @@
-from flask import Blueprint, request, jsonify
+import datetime
+import math
+
+from flask import Blueprint, Response, request, jsonify
+from config import Config
+from database import RANKING_WINDOWS, after_commit, request_db
 from routes.auth import require_auth
-from services.analytics_service import AnalyticsService
+from replicas import read_only
+from instrumentation import query_budget
+from ratelimit import rate_limit
+from services import get_ai_service, get_analytics_service
+import live
+import rankings
 
 analytics_bp = Blueprint("analytics", __name__)
-analytics_svc = AnalyticsService()
+
+MAX_INGEST_EVENTS = 1000
 
 @analytics_bp.route("/overview", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(1)
 def overview():
     user = request.current_user
-    data = analytics_svc.get_overview(user["id"])
+    data = get_analytics_service().get_overview(user["id"])
     return jsonify(data)
 
 @analytics_bp.route("/engagement", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(1)
 def engagement():
     days = int(request.args.get("days", 30))
-    data = analytics_svc.get_engagement_timeline(days)
+    data = get_analytics_service().get_engagement_timeline(days)
     return jsonify(data)
 
 @analytics_bp.route("/channels", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(1)
 def channels():
-    data = analytics_svc.get_channel_breakdown()
+    data = get_analytics_service().get_channel_breakdown()
     return jsonify(data)
 
 @analytics_bp.route("/top-content", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(2)
 def top_content():
-    limit = int(request.args.get("limit", 5))
-    data = analytics_svc.get_top_content(limit)
+    user = request.current_user
+    metric = request.args.get("metric", "reach")
+    if metric not in rankings.SORTABLE:
+        return jsonify({"error": f"metric must be one of: {', '.join(rankings.SORTABLE)}"}), 400
+    try:
+        days = int(request.args.get("days", 30))
+        limit = min(max(int(request.args.get("limit", 5)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "days and limit must be integers"}), 400
+    if days not in RANKING_WINDOWS:
+        return jsonify({"error": f"days must be one of: {', '.join(map(str, RANKING_WINDOWS))}"}), 400
+    data = get_analytics_service().get_top_content(request_db(), user["id"], metric, days, limit)
     return jsonify(data)
 
 @analytics_bp.route("/funnel", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(1)
 def funnel():
-    data = analytics_svc.get_funnel_data()
+    data = get_analytics_service().get_funnel_data()
     return jsonify(data)
 
 @analytics_bp.route("/demographics", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(1)
 def demographics():
-    data = analytics_svc.get_audience_demographics()
+    data = get_analytics_service().get_audience_demographics()
     return jsonify(data)
 
 @analytics_bp.route("/heatmap", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(1)
 def heatmap():
-    data = analytics_svc.get_heatmap_data()
+    data = get_analytics_service().get_heatmap_data()
     return jsonify(data)
 
+def _owned_ids(db, table, user_id, ids):
+    ids = sorted(set(ids))
+    if not ids:
+        return set()
+    rows = db.execute(f"SELECT id FROM {table} WHERE user_id = ? AND id IN ({', '.join('?' for _ in ids)})",
+                      (user_id, *ids)).fetchall()
+    return {r["id"] for r in rows}
+
+@analytics_bp.route("/events", methods=["POST"])
+@require_auth
+@query_budget(4)
+def ingest_events():
+    user = request.current_user
+    if Config.DATABASE_TYPE != "sqlite":
+        # The PostgreSQL schema has no analytics table
+        return jsonify({"error": "Event ingestion is not available on this database"}), 501
+    data = request.get_json()
+    events = data.get("events") if isinstance(data, dict) else None
+    if not isinstance(events, list) or not events or not all(isinstance(e, dict) for e in events):
+        return jsonify({"error": "events must be a non-empty list of objects"}), 400
+    if len(events) > MAX_INGEST_EVENTS:
+        return jsonify({"error": f"At most {MAX_INGEST_EVENTS} events per request"}), 400
+    rows = []
+    for i, e in enumerate(events):
+        metric, value = e.get("metric_type"), e.get("metric_value")
+        if not isinstance(metric, str) or not metric.strip() or len(metric) > 50:
+            return jsonify({"error": f"events[{i}].metric_type is required"}), 400
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return jsonify({"error": f"events[{i}].metric_value must be a number"}), 400
+        for key in ("content_id", "campaign_id"):
+            if e.get(key) is not None and (isinstance(e[key], bool) or not isinstance(e[key], int)):
+                return jsonify({"error": f"events[{i}].{key} must be an integer"}), 400
+        recorded_at = None
+        if e.get("recorded_at"):
+            try:
+                recorded_at = datetime.datetime.fromisoformat(str(e["recorded_at"])).isoformat(sep=" ")
+            except ValueError:
+                return jsonify({"error": f"events[{i}].recorded_at must be an ISO 8601 date/time"}), 400
+        rows.append({"metric_type": metric.strip(), "metric_value": value, "content_id": e.get("content_id"),
+                     "campaign_id": e.get("campaign_id"), "channel": e.get("channel"),
+                     "recorded_at": recorded_at or datetime.datetime.utcnow().isoformat(sep=" ", timespec="seconds")})
+
+    db = request_db()
+    for key, table in (("content_id", "content_items"), ("campaign_id", "campaigns")):
+        wanted = {r[key] for r in rows if r[key] is not None}
+        unknown = wanted - _owned_ids(db, table, user["id"], wanted)
+        if unknown:
+            return jsonify({"error": f"Unknown {key}: {', '.join(map(str, sorted(unknown)))}"}), 404
+    db.executemany(
+        "INSERT INTO analytics (user_id, campaign_id, content_id, metric_type, metric_value, channel, recorded_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(user["id"], r["campaign_id"], r["content_id"], r["metric_type"], r["metric_value"], r["channel"],
+          r["recorded_at"]) for r in rows])
+    after_commit(lambda: live.publish_metrics(user["id"], rows))
+    return jsonify({"ingested": len(rows)}), 201
+
+@analytics_bp.route("/live", methods=["GET"])
+@require_auth
+@rate_limit("live")
+@query_budget(1)
+def live_updates():
+    user = request.current_user
+    if not request.environ.get("wsgi.multithread") or not live.max_streams():
+        # One request at a time per worker (gunicorn's sync worker): a stream would block it
+        return jsonify({"error": "Live updates need gthread workers with several threads, "
+                                 "or gevent/eventlet workers"}), 501
+    if not live.admit_stream():
+        response = jsonify({"error": "Too many live streams open, please retry later"})
+        response.headers["Retry-After"] = str(max(1, round(Config.LIVE_STREAM_SECONDS)))
+        return response, 503
+    response = Response(live.stream(user["id"], request.headers.get("Last-Event-ID")), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(live.release_stream)
+    return response
+
 @analytics_bp.route("/optimisation-tips", methods=["POST"])
 @require_auth
+@rate_limit("ai")
+@query_budget(1)
 def optimisation_tips():
-    from services.ai_service import AIService
-    ai = AIService()
     channel_data = request.get_json() or {}
     if not channel_data:
         channel_data = {
@@ -63,5 +173,5 @@ def optimisation_tips():
             "email": {"engagement_rate": 6.8},
             "linkedin": {"engagement_rate": 3.5}
         }
-    tips = ai.generate_optimisation_tips(channel_data)
+    tips = get_ai_service().generate_optimisation_tips(channel_data)
     return jsonify(tips)
@@ -1,22 +1,47 @@
 from flask import Blueprint, request, jsonify
 import jwt
 import datetime
-import hashlib
 import secrets
-from werkzeug.security import generate_password_hash, check_password_hash
-from database import get_db
+from database import get_db, insert_returning, integrity_errors, request_db, sharding_enabled
 from config import Config
+from instrumentation import query_budget, span
+from services import get_password_hasher
+from services.passwords import HasherBusy
+import queries
+import refresh_tokens
+import sharding
 
 auth_bp = Blueprint("auth", __name__)
 
+if sharding_enabled():
+    # The directory row comes with the user, so routing the request to its shard costs no query
+    queries.define("users.by_id", "SELECT u.*, ts.shard, ts.moving_since FROM users u "
+                                  "LEFT JOIN tenant_shards ts ON ts.user_id = u.id WHERE u.id = ?")
+else:
+    queries.define("users.by_id", "SELECT * FROM users WHERE id = ?")
+queries.define("users.by_email", "SELECT * FROM users WHERE email = ?")
+queries.define("users.id_by_email", "SELECT id FROM users WHERE email = ?")
+queries.define("users.email_by_id", "SELECT email FROM users WHERE id = ?")
+# A non-null password hash replaces one made with an older PASSWORD_HASH_METHOD
+queries.define("users.record_login", "UPDATE users SET last_login = CURRENT_TIMESTAMP, "
+                                     "password_hash = coalesce(?, password_hash) WHERE id = ?")
+
 def hash_password(password, salt=None):
     if not salt:
         salt = secrets.token_hex(16)
-    hashed = generate_password_hash(password + salt)
+    with span("auth.password_hash"):
+        hashed = get_password_hasher().hash(password + salt)
     return hashed, salt
 
 def verify_password(password, hashed, salt):
-    return check_password_hash(hashed, password + salt)
+    """Return (matches, new hash to store if the stored one uses an outdated method or cost)."""
+    with span("auth.password_hash"):
+        return get_password_hasher().verify(password + salt, hashed)
+
+def _hasher_busy():
+    response = jsonify({"error": "Too many sign-ins right now, please retry in a moment"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
 
 def generate_access_token(user_id, email):
     payload = {
@@ -28,43 +53,10 @@ def generate_access_token(user_id, email):
     }
     return jwt.encode(payload, Config.SECRET_KEY, algorithm="HS256")
 
-def generate_refresh_token(user_id):
-    token = secrets.token_hex(32)
-    expires_at = datetime.datetime.utcnow() + datetime.timedelta(days=Config.JWT_REFRESH_EXPIRY_DAYS)
-    token_hash = hashlib.sha256(token.encode()).hexdigest()
-
-    db = get_db()
-    cursor = db.execute(
-        "INSERT INTO refresh_tokens (user_id, token_hash, expires_at) VALUES (?, ?, ?)",
-        (user_id, token_hash, expires_at)
-    )
-    db.commit()
-    db.close()
-
-    return token
-
-def verify_refresh_token(token):
-    token_hash = hashlib.sha256(token.encode()).hexdigest()
-    db = get_db()
-    row = db.execute(
-        "SELECT user_id, expires_at FROM refresh_tokens WHERE token_hash = ? AND revoked_at IS NULL",
-        (token_hash,)
-    ).fetchone()
-    db.close()
-    if not row or datetime.datetime.utcnow() > datetime.datetime.fromisoformat(row["expires_at"]):
-        return None
-    return row["user_id"]
-
-def revoke_refresh_token(token):
-    token_hash = hashlib.sha256(token.encode()).hexdigest()
-    db = get_db()
-    db.execute("UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP WHERE token_hash = ?", (token_hash,))
-    db.commit()
-    db.close()
-
 def verify_access_token(token):
     try:
-        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
+        with span("auth.jwt_decode"):
+            payload = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
         if payload.get("type") != "access":
             return None
         return payload
@@ -81,9 +73,8 @@ def get_current_user():
     payload = verify_access_token(token)
     if not payload:
         return None
-    db = get_db()
-    user = db.execute("SELECT * FROM users WHERE id = ?", (payload["user_id"],)).fetchone()
-    db.close()
+    db = request_db()
+    user = db.run("users.by_id", (payload["user_id"],)).fetchone()
     if user:
         return dict(user)
     return None
@@ -95,6 +86,10 @@ def require_auth(f):
         user = get_current_user()
         if not user:
             return jsonify({"error": "Unauthorized", "message": "Valid authentication token required"}), 401
+        if user.get("moving_since"):
+            response = jsonify({"error": "Your workspace is being moved, please retry in a moment"})
+            response.headers["Retry-After"] = str(max(1, round(Config.SHARD_MOVE_GRACE_SECONDS)))
+            return response, 503
         request.current_user = user
         return f(*args, **kwargs)
     return decorated
@@ -111,6 +106,7 @@ def _set_refresh_cookie(response, refresh_token):
     return response
 
 @auth_bp.route("/signup", methods=["POST"])
+@query_budget(5)
 def signup():
     data = request.get_json()
     if not data or not data.get("email") or not data.get("password") or not data.get("name"):
@@ -121,22 +117,34 @@ def signup():
     name = data["name"].strip()
 
     db = get_db()
-    existing = db.execute("SELECT id FROM users WHERE email = ?", (email,)).fetchone()
-    if existing:
+    try:
+        existing = db.run("users.id_by_email", (email,)).fetchone()
+    finally:
         db.close()
+    if existing:
         return jsonify({"error": "User with this email already exists"}), 409
 
-    hashed, salt = hash_password(password)
-    cursor = db.execute(
-        "INSERT INTO users (email, name, password_hash, salt) VALUES (?, ?, ?, ?)",
-        (email, name, hashed, salt)
-    )
-    user_id = cursor.lastrowid
-    db.commit()
-    db.close()
+    # Hash without holding a connection
+    try:
+        hashed, salt = hash_password(password)
+    except HasherBusy:
+        return _hasher_busy()
+    db = get_db()
+    try:
+        user_id = insert_returning(db, "users", {
+            "email": email, "name": name, "password_hash": hashed, "salt": salt
+        })["id"]
+        if sharding_enabled():
+            sharding.place_new_user(db, user_id, email, name)
+        refresh_token = refresh_tokens.issue(db, user_id)
+        db.commit()
+    except integrity_errors():
+        # Another signup with this email got in while the password was hashing
+        return jsonify({"error": "User with this email already exists"}), 409
+    finally:
+        db.close()
 
     access_token = generate_access_token(user_id, email)
-    refresh_token = generate_refresh_token(user_id)
 
     response = jsonify({
         "access_token": access_token,
@@ -146,6 +154,7 @@ def signup():
     return response, 201
 
 @auth_bp.route("/login", methods=["POST"])
+@query_budget(3)
 def login():
     data = request.get_json()
     if not data or not data.get("email") or not data.get("password"):
@@ -155,8 +164,10 @@ def login():
     password = data["password"]
 
     db = get_db()
-    user = db.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
-    db.close()
+    try:
+        user = db.run("users.by_email", (email,)).fetchone()
+    finally:
+        db.close()
     if not user:
         return jsonify({"error": "Invalid email or password"}), 401
 
@@ -164,17 +175,23 @@ def login():
     if not user["password_hash"] or not user["salt"]:
         return jsonify({"error": "Invalid email or password"}), 401
 
-    if not verify_password(password, user["password_hash"], user["salt"]):
+    try:
+        matches, new_hash = verify_password(password, user["password_hash"], user["salt"])
+    except HasherBusy:
+        return _hasher_busy()
+    if not matches:
         return jsonify({"error": "Invalid email or password"}), 401
 
     user_id = user["id"]
     db = get_db()
-    db.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?", (user_id,))
-    db.commit()
-    db.close()
+    try:
+        db.run("users.record_login", (new_hash, user_id))
+        refresh_token = refresh_tokens.issue(db, user_id)
+        db.commit()
+    finally:
+        db.close()
 
     access_token = generate_access_token(user_id, email)
-    refresh_token = generate_refresh_token(user_id)
 
     response = jsonify({
         "access_token": access_token,
@@ -184,34 +201,42 @@ def login():
     return response
 
 @auth_bp.route("/refresh", methods=["POST"])
+@query_budget(4)
 def refresh():
     refresh_token = request.cookies.get("refresh_token")
     if not refresh_token:
         return jsonify({"error": "Refresh token required"}), 401
 
-    user_id = verify_refresh_token(refresh_token)
-    if not user_id:
-        return jsonify({"error": "Invalid or expired refresh token"}), 401
-
+    # Verify, revoke, look up the user and issue the replacement in one transaction
     db = get_db()
-    user = db.execute("SELECT email FROM users WHERE id = ?", (user_id,)).fetchone()
-    db.close()
-    if not user:
-        return jsonify({"error": "User not found"}), 401
+    try:
+        user_id = refresh_tokens.rotate(db, refresh_token)
+        if not user_id:
+            db.rollback()
+            return jsonify({"error": "Invalid or expired refresh token"}), 401
+
+        user = db.run("users.email_by_id", (user_id,)).fetchone()
+        if not user:
+            db.rollback()
+            return jsonify({"error": "User not found"}), 401
 
+        new_refresh_token = refresh_tokens.issue(db, user_id)
+        db.commit()
+    finally:
+        db.close()
     access_token = generate_access_token(user_id, user["email"])
-    new_refresh_token = generate_refresh_token(user_id)
-    revoke_refresh_token(refresh_token)
 
     response = jsonify({"access_token": access_token})
     _set_refresh_cookie(response, new_refresh_token)
     return response
 
 @auth_bp.route("/logout", methods=["POST"])
+@query_budget(1)
 def logout():
     refresh_token = request.cookies.get("refresh_token")
     if refresh_token:
-        revoke_refresh_token(refresh_token)
+        db = request_db()
+        refresh_tokens.revoke(db, refresh_token)
 
     response = jsonify({"message": "Logged out successfully"})
     response.set_cookie(
@@ -226,6 +251,7 @@ def logout():
 
 @auth_bp.route("/me", methods=["GET"])
 @require_auth
+@query_budget(1)
 def get_me():
     user = request.current_user
     return jsonify({
@@ -1,90 +1,81 @@
 from flask import Blueprint, request, jsonify
-from database import get_db
+from database import after_commit, insert_returning, request_db, update_returning
 from routes.auth import require_auth
-from services.ai_service import AIService
-import json
+from instrumentation import query_budget
+from services import get_ai_service, get_faq_indexes
+import queries
 
 auto_reply_bp = Blueprint("auto_reply", __name__)
-ai = AIService()
+
+queries.define("auto_reply.rules", "SELECT * FROM auto_reply_rules WHERE user_id = ? ORDER BY created_at DESC")
+queries.define("auto_reply.active_rules", "SELECT * FROM auto_reply_rules WHERE user_id = ? AND is_active = 1")
+queries.define("auto_reply.delete_rule", "DELETE FROM auto_reply_rules WHERE id = ? AND user_id = ?")
+queries.define("auto_reply.count_match", "UPDATE auto_reply_rules SET match_count = match_count + 1 WHERE id = ?")
+queries.define("auto_reply.faqs", "SELECT * FROM faqs WHERE user_id = ? ORDER BY usage_count DESC")
+queries.define("auto_reply.delete_faq", "DELETE FROM faqs WHERE id = ? AND user_id = ?")
 
 @auto_reply_bp.route("/rules", methods=["GET"])
 @require_auth
+@query_budget(2)
 def list_rules():
     user = request.current_user
-    db = get_db()
-    rows = db.execute("SELECT * FROM auto_reply_rules WHERE user_id = ? ORDER BY created_at DESC", (user["id"],)).fetchall()
-    db.close()
+    db = request_db()
+    rows = db.run("auto_reply.rules", (user["id"],)).fetchall()
     return jsonify([dict(r) for r in rows])
 
 @auto_reply_bp.route("/rules", methods=["POST"])
 @require_auth
+@query_budget(2)
 def create_rule():
     user = request.current_user
     data = request.get_json()
     if not data or not data.get("trigger_keyword") or not data.get("reply_text"):
         return jsonify({"error": "trigger_keyword and reply_text required"}), 400
-    db = get_db()
-    cursor = db.execute(
-        "INSERT INTO auto_reply_rules (user_id, trigger_keyword, reply_text, channel, is_active) VALUES (?,?,?,?,?)",
-        (user["id"], data["trigger_keyword"], data["reply_text"], data.get("channel","all"), 1)
-    )
-    db.commit()
-    row = db.execute("SELECT * FROM auto_reply_rules WHERE id = ?", (cursor.lastrowid,)).fetchone()
-    db.close()
+    db = request_db()
+    row = insert_returning(db, "auto_reply_rules", {
+        "user_id": user["id"], "trigger_keyword": data["trigger_keyword"],
+        "reply_text": data["reply_text"], "channel": data.get("channel","all"), "is_active": 1
+    })
     return jsonify(dict(row)), 201
 
 @auto_reply_bp.route("/rules/<int:rule_id>", methods=["PUT"])
 @require_auth
+@query_budget(2)
 def update_rule(rule_id):
     user = request.current_user
-    data = request.get_json()
-    db = get_db()
-    row = db.execute("SELECT * FROM auto_reply_rules WHERE id = ? AND user_id = ?", (rule_id, user["id"])).fetchone()
-    if not row:
-        db.close()
+    data = request.get_json() or {}
+    values = {k: data[k] for k in ("trigger_keyword", "reply_text", "channel", "is_active") if k in data}
+    db = request_db()
+    updated = update_returning(db, "auto_reply_rules", values, {"id": rule_id, "user_id": user["id"]})
+    if not updated:
         return jsonify({"error": "Rule not found"}), 404
-    db.execute(
-        "UPDATE auto_reply_rules SET trigger_keyword=?, reply_text=?, channel=?, is_active=? WHERE id=? AND user_id=?",
-        (data.get("trigger_keyword", row["trigger_keyword"]), data.get("reply_text", row["reply_text"]),
-         data.get("channel", row["channel"]), data.get("is_active", row["is_active"]), rule_id, user["id"])
-    )
-    db.commit()
-    updated = db.execute("SELECT * FROM auto_reply_rules WHERE id = ?", (rule_id,)).fetchone()
-    db.close()
     return jsonify(dict(updated))
 
 @auto_reply_bp.route("/rules/<int:rule_id>", methods=["DELETE"])
 @require_auth
+@query_budget(2)
 def delete_rule(rule_id):
     user = request.current_user
-    db = get_db()
-    db.execute("DELETE FROM auto_reply_rules WHERE id = ? AND user_id = ?", (rule_id, user["id"]))
-    db.commit()
-    db.close()
+    db = request_db()
+    db.run("auto_reply.delete_rule", (rule_id, user["id"]))
     return jsonify({"message": "Rule deleted"})
 
 @auto_reply_bp.route("/simulate", methods=["POST"])
 @require_auth
+@query_budget(4)
 def simulate_reply():
     user = request.current_user
     data = request.get_json()
     if not data or not data.get("message"):
         return jsonify({"error": "message required"}), 400
     incoming = data["message"]
-    db = get_db()
-    faqs = [dict(r) for r in db.execute("SELECT * FROM faqs WHERE user_id = ?", (user["id"],)).fetchall()]
-    rules = [dict(r) for r in db.execute(
-        "SELECT * FROM auto_reply_rules WHERE user_id = ? AND is_active = 1", (user["id"],)
-    ).fetchall()]
-    db.close()
+    db = request_db()
+    rules = [dict(r) for r in db.run("auto_reply.active_rules", (user["id"],)).fetchall()]
 
     # Check custom rules first
     for rule in rules:
         if rule["trigger_keyword"].lower() in incoming.lower():
-            db = get_db()
-            db.execute("UPDATE auto_reply_rules SET match_count = match_count + 1 WHERE id = ?", (rule["id"],))
-            db.commit()
-            db.close()
+            db.run("auto_reply.count_match", (rule["id"],))
             return jsonify({
                 "reply": rule["reply_text"],
                 "source": "custom_rule",
@@ -93,41 +84,42 @@ def simulate_reply():
                 "escalate": False
             })
 
-    result = ai.generate_auto_reply(incoming, faqs)
+    faq_index = get_faq_indexes().get(db, user["id"])
+    result = get_ai_service().generate_auto_reply(incoming, faq_index)
     return jsonify(result)
 
 @auto_reply_bp.route("/faqs", methods=["GET"])
 @require_auth
+@query_budget(2)
 def list_faqs():
     user = request.current_user
-    db = get_db()
-    rows = db.execute("SELECT * FROM faqs WHERE user_id = ? ORDER BY usage_count DESC", (user["id"],)).fetchall()
-    db.close()
+    db = request_db()
+    rows = db.run("auto_reply.faqs", (user["id"],)).fetchall()
     return jsonify([dict(r) for r in rows])
 
 @auto_reply_bp.route("/faqs", methods=["POST"])
 @require_auth
+@query_budget(2)
 def create_faq():
     user = request.current_user
     data = request.get_json()
     if not data or not data.get("question") or not data.get("answer"):
         return jsonify({"error": "question and answer required"}), 400
-    db = get_db()
-    cursor = db.execute(
-        "INSERT INTO faqs (user_id, question, answer, category) VALUES (?,?,?,?)",
-        (user["id"], data["question"], data["answer"], data.get("category","general"))
-    )
-    db.commit()
-    row = db.execute("SELECT * FROM faqs WHERE id = ?", (cursor.lastrowid,)).fetchone()
-    db.close()
+    db = request_db()
+    row = insert_returning(db, "faqs", {
+        "user_id": user["id"], "question": data["question"], "answer": data["answer"],
+        "category": data.get("category","general")
+    })
+    after_commit(lambda: get_faq_indexes().added(user["id"], row))
     return jsonify(dict(row)), 201
 
 @auto_reply_bp.route("/faqs/<int:faq_id>", methods=["DELETE"])
 @require_auth
+@query_budget(2)
 def delete_faq(faq_id):
     user = request.current_user
-    db = get_db()
-    db.execute("DELETE FROM faqs WHERE id = ? AND user_id = ?", (faq_id, user["id"]))
-    db.commit()
-    db.close()
+    db = request_db()
+    deleted = db.run("auto_reply.delete_faq", (faq_id, user["id"])).rowcount
+    if deleted:
+        after_commit(lambda: get_faq_indexes().removed(user["id"], faq_id))
     return jsonify({"message": "FAQ deleted"})
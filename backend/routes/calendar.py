@@ -1,108 +1,116 @@
 from flask import Blueprint, request, jsonify
-from database import get_db
+from database import after_commit, insert_returning, request_db, update_returning
 from routes.auth import require_auth
-from services.ai_service import AIService
-import json
+from replicas import read_only
+from instrumentation import query_budget
+from ratelimit import rate_limit
+from services import get_ai_service
+import queries
+import scheduler
 
 calendar_bp = Blueprint("calendar", __name__)
-ai = AIService()
+
+queries.define("calendar.month", "SELECT * FROM calendar_events WHERE user_id = ? "
+               "AND strftime('%m', event_date) = ? AND strftime('%Y', event_date) = ? "
+               "ORDER BY event_date, event_time")
+queries.define("calendar.planning_campaigns", "SELECT * FROM campaigns WHERE user_id = ? AND status IN ('active','scheduled')")
+queries.define("calendar.clear_month", "DELETE FROM calendar_events WHERE user_id = ? "
+               "AND strftime('%m', event_date) = ? AND strftime('%Y', event_date) = ?")
+queries.define("calendar.delete", "DELETE FROM calendar_events WHERE id = ? AND user_id = ?")
+
+EVENT_SLOT_ERROR = "event_date must be an ISO 8601 date (YYYY-MM-DD) and event_time a local time (HH:MM)"
 
 @calendar_bp.route("/", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(2)
 def get_events():
     user = request.current_user
     month = int(request.args.get("month", __import__("datetime").datetime.now().month))
     year = int(request.args.get("year", __import__("datetime").datetime.now().year))
-    db = get_db()
-    rows = db.execute(
-        """SELECT * FROM calendar_events WHERE user_id = ?
-           AND strftime('%m', event_date) = ? AND strftime('%Y', event_date) = ?
-           ORDER BY event_date, event_time""",
-        (user["id"], f"{month:02d}", str(year))
-    ).fetchall()
-    db.close()
+    db = request_db()
+    rows = db.run("calendar.month", (user["id"], f"{month:02d}", str(year))).fetchall()
     return jsonify([dict(r) for r in rows])
 
 @calendar_bp.route("/generate", methods=["POST"])
 @require_auth
+@rate_limit("ai")
+@query_budget(5)
 def generate_calendar():
     user = request.current_user
     data = request.get_json() or {}
     month = data.get("month", __import__("datetime").datetime.now().month)
     year = data.get("year", __import__("datetime").datetime.now().year)
-    db = get_db()
-    campaigns = db.execute(
-        "SELECT * FROM campaigns WHERE user_id = ? AND status IN ('active','scheduled')",
-        (user["id"],)
-    ).fetchall()
-    calendar_data = ai.generate_calendar(user["id"], int(month), int(year), campaigns)
+    db = request_db()
+    campaigns = db.run("calendar.planning_campaigns", (user["id"],)).fetchall()
+    calendar_data = get_ai_service().generate_calendar(user["id"], int(month), int(year), campaigns)
     # Save to DB
-    db.execute(
-        "DELETE FROM calendar_events WHERE user_id = ? AND strftime('%m', event_date) = ? AND strftime('%Y', event_date) = ?",
-        (user["id"], f"{int(month):02d}", str(int(year)))
+    db.run("calendar.clear_month", (user["id"], f"{int(month):02d}", str(int(year))))
+    db.executemany(
+        """INSERT INTO calendar_events (user_id, title, description, event_date, event_time, channel, status, color)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        [(user["id"], evt["title"], evt["description"], evt["event_date"],
+          evt["event_time"], evt["channel"], evt["status"], evt["color"])
+         for evt in calendar_data["events"]]
     )
-    for evt in calendar_data["events"]:
-        db.execute(
-            """INSERT INTO calendar_events (user_id, title, description, event_date, event_time, channel, status, color)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (user["id"], evt["title"], evt["description"], evt["event_date"],
-             evt["event_time"], evt["channel"], evt["status"], evt["color"])
-        )
-    db.commit()
     rows = db.execute(
         "SELECT * FROM calendar_events WHERE user_id = ? AND strftime('%m', event_date) = ? ORDER BY event_date",
         (user["id"], f"{int(month):02d}")
     ).fetchall()
-    db.close()
     return jsonify({"events": [dict(r) for r in rows], "month": month, "year": year})
 
 @calendar_bp.route("/", methods=["POST"])
 @require_auth
+@query_budget(2)
 def create_event():
     user = request.current_user
     data = request.get_json()
     if not data or not data.get("title") or not data.get("event_date"):
         return jsonify({"error": "title and event_date required"}), 400
-    db = get_db()
-    cursor = db.execute(
-        "INSERT INTO calendar_events (user_id, title, description, event_date, event_time, channel, status, color) VALUES (?,?,?,?,?,?,?,?)",
-        (user["id"], data["title"], data.get("description",""), data["event_date"],
-         data.get("event_time","12:00"), data.get("channel","instagram"),
-         data.get("status","planned"), data.get("color","#667eea"))
-    )
-    db.commit()
-    row = db.execute("SELECT * FROM calendar_events WHERE id = ?", (cursor.lastrowid,)).fetchone()
-    db.close()
+    try:
+        event_date = scheduler.normalize_event_date(data["event_date"])
+        event_time = scheduler.normalize_event_time(data.get("event_time", "12:00"))
+    except ValueError:
+        return jsonify({"error": EVENT_SLOT_ERROR}), 400
+    db = request_db()
+    row = insert_returning(db, "calendar_events", {
+        "user_id": user["id"], "title": data["title"], "description": data.get("description",""),
+        "event_date": event_date, "event_time": event_time,
+        "channel": data.get("channel","instagram"), "status": data.get("status","planned"),
+        "color": data.get("color","#667eea")
+    })
+    if row["status"] == "scheduled":
+        after_commit(scheduler.notify)
     return jsonify(dict(row)), 201
 
 @calendar_bp.route("/<int:event_id>", methods=["PUT"])
 @require_auth
+@query_budget(2)
 def update_event(event_id):
     user = request.current_user
-    data = request.get_json()
-    db = get_db()
-    row = db.execute("SELECT * FROM calendar_events WHERE id = ? AND user_id = ?", (event_id, user["id"])).fetchone()
-    if not row:
-        db.close()
+    data = request.get_json() or {}
+    fields = ("title", "description", "event_date", "event_time", "channel", "status", "color")
+    values = {k: data[k] for k in fields if k in data}
+    try:
+        if "event_date" in values:
+            values["event_date"] = scheduler.normalize_event_date(values["event_date"])
+        if "event_time" in values:
+            values["event_time"] = scheduler.normalize_event_time(values["event_time"])
+    except ValueError:
+        return jsonify({"error": EVENT_SLOT_ERROR}), 400
+    db = request_db()
+    updated = update_returning(db, "calendar_events", values, {"id": event_id, "user_id": user["id"]})
+    if not updated:
         return jsonify({"error": "Event not found"}), 404
-    db.execute(
-        "UPDATE calendar_events SET title=?,description=?,event_date=?,event_time=?,channel=?,status=?,color=? WHERE id=?",
-        (data.get("title", row["title"]), data.get("description", row["description"]),
-         data.get("event_date", row["event_date"]), data.get("event_time", row["event_time"]),
-         data.get("channel", row["channel"]), data.get("status", row["status"]),
-         data.get("color", row["color"]), event_id)
-    )
-    db.commit()
-    updated = db.execute("SELECT * FROM calendar_events WHERE id = ?", (event_id,)).fetchone()
-    db.close()
+    if updated["status"] == "scheduled":
+        after_commit(scheduler.notify)
     return jsonify(dict(updated))
 
 @calendar_bp.route("/<int:event_id>", methods=["DELETE"])
 @require_auth
+@query_budget(2)
 def delete_event(event_id):
     user = request.current_user
-    db = get_db()
-    db.execute("DELETE FROM calendar_events WHERE id = ? AND user_id = ?", (event_id, user["id"]))
-    db.commit()
-    db.close()
+    db = request_db()
+    db.run("calendar.delete", (event_id, user["id"]))
     return jsonify({"message": "Event deleted"})
@@ -1,65 +1,79 @@
 from flask import Blueprint, request, jsonify
-from database import get_db
+from database import insert_returning, request_db, tenant_shard, update_returning
 from routes.auth import require_auth
-from services.ai_service import AIService
+from replicas import read_only
+from instrumentation import query_budget
+from ratelimit import rate_limit
+from services import get_ai_service
+import bulk
+import queries
+import tags
 import json
 
 campaigns_bp = Blueprint("campaigns", __name__)
-ai = AIService()
+
+queries.define("campaigns.list", tags.campaigns_select() + " WHERE c.user_id = ? ORDER BY c.created_at DESC")
+queries.define("campaigns.list_by_channel", tags.campaigns_select() + " WHERE c.user_id = ? AND c.id IN "
+               "(SELECT campaign_id FROM campaign_channels WHERE user_id = ? AND channel = ?) "
+               "ORDER BY c.created_at DESC")
+queries.define("campaigns.get", tags.campaigns_select() + " WHERE c.id = ? AND c.user_id = ?")
+queries.define("campaigns.delete", "DELETE FROM campaigns WHERE id = ? AND user_id = ?")
+queries.define("campaigns.set_strategy", "UPDATE campaigns SET strategy = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?")
+queries.define("campaigns.status_counts", "SELECT status, COUNT(*) as cnt FROM campaigns WHERE user_id = ? GROUP BY status")
 
 @campaigns_bp.route("/", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(2)
 def list_campaigns():
     user = request.current_user
-    db = get_db()
-    rows = db.execute(
-        "SELECT * FROM campaigns WHERE user_id = ? ORDER BY created_at DESC",
-        (user["id"],)
-    ).fetchall()
-    db.close()
+    channel = request.args.get("channel")
+    db = request_db()
+    if channel:
+        rows = db.run("campaigns.list_by_channel", (user["id"], user["id"], user["id"], channel)).fetchall()
+    else:
+        rows = db.run("campaigns.list", (user["id"], user["id"])).fetchall()
     campaigns = []
     for r in rows:
         c = dict(r)
-        c["channels"] = json.loads(c.get("channels") or "[]")
+        c["channels"] = tags.split(c["channels"])
         campaigns.append(c)
     return jsonify(campaigns)
 
 @campaigns_bp.route("/", methods=["POST"])
 @require_auth
+@query_budget(3)
 def create_campaign():
     user = request.current_user
     data = request.get_json()
     if not data or not data.get("name"):
         return jsonify({"error": "Campaign name is required"}), 400
 
-    channels = json.dumps(data.get("channels", []))
-    db = get_db()
-    cursor = db.execute(
-        """INSERT INTO campaigns (user_id, name, description, goal, budget, target_audience, channels, status, start_date, end_date)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (user["id"], data["name"], data.get("description", ""), data.get("goal", ""),
-         data.get("budget", 0), data.get("target_audience", ""), channels,
-         data.get("status", "draft"), data.get("start_date"), data.get("end_date"))
-    )
-    db.commit()
-    new_id = cursor.lastrowid
-    row = db.execute("SELECT * FROM campaigns WHERE id = ?", (new_id,)).fetchone()
-    db.close()
+    db = request_db()
+    row = insert_returning(db, "campaigns", {
+        "user_id": user["id"], "name": data["name"], "description": data.get("description", ""),
+        "goal": data.get("goal", ""), "budget": data.get("budget", 0),
+        "target_audience": data.get("target_audience", ""),
+        "status": data.get("status", "draft"), "start_date": data.get("start_date"),
+        "end_date": data.get("end_date")
+    })
+    channel_rows = tags.campaign_channel_rows(user["id"], row["id"], data.get("channels", []))
+    tags.insert_campaign_channels(db, channel_rows)
     campaign = dict(row)
-    campaign["channels"] = json.loads(campaign.get("channels") or "[]")
+    campaign["channels"] = [r[2] for r in channel_rows]
     return jsonify(campaign), 201
 
 @campaigns_bp.route("/<int:campaign_id>", methods=["GET"])
 @require_auth
+@query_budget(2)
 def get_campaign(campaign_id):
     user = request.current_user
-    db = get_db()
-    row = db.execute("SELECT * FROM campaigns WHERE id = ? AND user_id = ?", (campaign_id, user["id"])).fetchone()
-    db.close()
+    db = request_db()
+    row = db.run("campaigns.get", (user["id"], campaign_id, user["id"])).fetchone()
     if not row:
         return jsonify({"error": "Campaign not found"}), 404
     c = dict(row)
-    c["channels"] = json.loads(c.get("channels") or "[]")
+    c["channels"] = tags.split(c["channels"])
     if c.get("strategy"):
         try:
             c["strategy"] = json.loads(c["strategy"])
@@ -67,81 +81,95 @@ def get_campaign(campaign_id):
             pass
     return jsonify(c)
 
+UPDATABLE_FIELDS = ("name", "description", "goal", "budget", "target_audience",
+                    "status", "start_date", "end_date")
+
 @campaigns_bp.route("/<int:campaign_id>", methods=["PUT"])
 @require_auth
+@query_budget(4)
 def update_campaign(campaign_id):
     user = request.current_user
-    data = request.get_json()
-    db = get_db()
-    row = db.execute("SELECT * FROM campaigns WHERE id = ? AND user_id = ?", (campaign_id, user["id"])).fetchone()
-    if not row:
-        db.close()
+    data = request.get_json() or {}
+    values = {k: data[k] for k in UPDATABLE_FIELDS if k in data}
+    db = request_db()
+    updated = update_returning(db, "campaigns", values, {"id": campaign_id, "user_id": user["id"]},
+                               touch_updated_at=True, returning=tags.channels_returning())
+    if not updated:
         return jsonify({"error": "Campaign not found"}), 404
-
-    channels = json.dumps(data.get("channels", json.loads(row["channels"] or "[]")))
-    db.execute(
-        """UPDATE campaigns SET name=?, description=?, goal=?, budget=?, target_audience=?,
-           channels=?, status=?, start_date=?, end_date=?, updated_at=CURRENT_TIMESTAMP
-           WHERE id = ? AND user_id = ?""",
-        (data.get("name", row["name"]), data.get("description", row["description"]),
-         data.get("goal", row["goal"]), data.get("budget", row["budget"]),
-         data.get("target_audience", row["target_audience"]), channels,
-         data.get("status", row["status"]), data.get("start_date", row["start_date"]),
-         data.get("end_date", row["end_date"]), campaign_id, user["id"])
-    )
-    db.commit()
-    updated = db.execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
-    db.close()
     c = dict(updated)
-    c["channels"] = json.loads(c.get("channels") or "[]")
+    if "channels" in data:
+        c["channels"] = tags.replace_campaign_channels(db, user["id"], campaign_id, data["channels"])
+    else:
+        c["channels"] = tags.split(c["channels"])
     return jsonify(c)
 
 @campaigns_bp.route("/<int:campaign_id>", methods=["DELETE"])
 @require_auth
+@query_budget(2)
 def delete_campaign(campaign_id):
     user = request.current_user
-    db = get_db()
-    row = db.execute("SELECT id FROM campaigns WHERE id = ? AND user_id = ?", (campaign_id, user["id"])).fetchone()
-    if not row:
-        db.close()
+    db = request_db()
+    cursor = db.run("campaigns.delete", (campaign_id, user["id"]))
+    if cursor.rowcount == 0:
         return jsonify({"error": "Campaign not found"}), 404
-    db.execute("DELETE FROM campaigns WHERE id = ? AND user_id = ?", (campaign_id, user["id"]))
-    db.commit()
-    db.close()
     return jsonify({"message": "Campaign deleted"})
 
 @campaigns_bp.route("/<int:campaign_id>/generate-strategy", methods=["POST"])
 @require_auth
+@rate_limit("ai")
+@query_budget(3)
 def generate_strategy(campaign_id):
     user = request.current_user
-    db = get_db()
-    row = db.execute("SELECT * FROM campaigns WHERE id = ? AND user_id = ?", (campaign_id, user["id"])).fetchone()
+    db = request_db()
+    row = db.run("campaigns.get", (user["id"], campaign_id, user["id"])).fetchone()
     if not row:
-        db.close()
         return jsonify({"error": "Campaign not found"}), 404
     c = dict(row)
-    channels = json.loads(c.get("channels") or "[]")
-    strategy = ai.generate_campaign_strategy(
+    channels = tags.split(c["channels"])
+    strategy = get_ai_service().generate_campaign_strategy(
         c["name"], c.get("goal", "Increase brand awareness"),
         c.get("target_audience", "General audience"),
         float(c.get("budget") or 0), channels,
         c.get("start_date", ""), c.get("end_date", "")
     )
     strategy_json = json.dumps(strategy)
-    db.execute("UPDATE campaigns SET strategy = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-               (strategy_json, campaign_id))
-    db.commit()
-    db.close()
+    db.run("campaigns.set_strategy", (strategy_json, campaign_id))
     return jsonify({"strategy": strategy, "campaign_id": campaign_id})
 
 @campaigns_bp.route("/stats", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(2)
 def campaign_stats():
     user = request.current_user
-    db = get_db()
-    total = db.execute("SELECT COUNT(*) as cnt FROM campaigns WHERE user_id = ?", (user["id"],)).fetchone()["cnt"]
-    active = db.execute("SELECT COUNT(*) as cnt FROM campaigns WHERE user_id = ? AND status = 'active'", (user["id"],)).fetchone()["cnt"]
-    draft = db.execute("SELECT COUNT(*) as cnt FROM campaigns WHERE user_id = ? AND status = 'draft'", (user["id"],)).fetchone()["cnt"]
-    scheduled = db.execute("SELECT COUNT(*) as cnt FROM campaigns WHERE user_id = ? AND status = 'scheduled'", (user["id"],)).fetchone()["cnt"]
-    db.close()
-    return jsonify({"total": total, "active": active, "draft": draft, "scheduled": scheduled})
+    db = request_db()
+    rows = db.run("campaigns.status_counts", (user["id"],)).fetchall()
+    counts = {r["status"]: r["cnt"] for r in rows}
+    return jsonify({
+        "total": sum(counts.values()), "active": counts.get("active", 0),
+        "draft": counts.get("draft", 0), "scheduled": counts.get("scheduled", 0)
+    })
+
+@campaigns_bp.route("/import", methods=["POST"])
+@require_auth
+@rate_limit("bulk")
+def import_campaigns():
+    user = request.current_user
+    try:
+        fmt = bulk.request_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result = bulk.BulkImport("campaigns", bulk.CAMPAIGN_FIELDS, user["id"], tenant_shard(user)).run(
+        bulk.iter_records(request.stream, fmt))
+    return jsonify(result), 201 if result["inserted"] else 400
+
+@campaigns_bp.route("/export", methods=["GET"])
+@require_auth
+@rate_limit("bulk")
+def export_campaigns():
+    user = request.current_user
+    try:
+        fmt = bulk.request_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return bulk.export_response("campaigns", user["id"], fmt, "campaigns", tenant_shard(user))
@@ -1,14 +1,25 @@
 from flask import Blueprint, request, jsonify
-from database import get_db
+from database import request_db
 from routes.auth import require_auth
-from services.ai_service import AIService
+from replicas import read_only
+from instrumentation import query_budget
+from ratelimit import rate_limit
+from services import get_ai_service
 import json
+import queries
 
 chat_bp = Blueprint("chat", __name__)
-ai = AIService()
+
+queries.define("chat.add_message", "INSERT INTO chat_messages (user_id, role, message, context) VALUES (?, ?, ?, ?)")
+queries.define("chat.recent", "SELECT role, message FROM chat_messages WHERE user_id = ? "
+                              "ORDER BY created_at DESC LIMIT 6")
+queries.define("chat.history", "SELECT * FROM chat_messages WHERE user_id = ? ORDER BY created_at ASC LIMIT ?")
+queries.define("chat.clear", "DELETE FROM chat_messages WHERE user_id = ?")
 
 @chat_bp.route("/message", methods=["POST"])
 @require_auth
+@rate_limit("ai")
+@query_budget(4)
 def send_message():
     user = request.current_user
     data = request.get_json()
@@ -18,30 +29,19 @@ def send_message():
     message = data["message"].strip()
     context = data.get("context", "")
 
-    db = get_db()
+    db = request_db()
     # Save user message
-    db.execute(
-        "INSERT INTO chat_messages (user_id, role, message, context) VALUES (?, ?, ?, ?)",
-        (user["id"], "user", message, context)
-    )
+    db.run("chat.add_message", (user["id"], "user", message, context))
 
     # Get recent history (last 6 messages)
-    history = db.execute(
-        "SELECT role, message FROM chat_messages WHERE user_id = ? ORDER BY created_at DESC LIMIT 6",
-        (user["id"],)
-    ).fetchall()
+    history = db.run("chat.recent", (user["id"],)).fetchall()
     history = [dict(h) for h in reversed(history)]
 
     # Generate AI response
-    ai_reply = ai.chat_response(message, history)
+    ai_reply = get_ai_service().chat_response(message, history)
 
     # Save AI reply
-    db.execute(
-        "INSERT INTO chat_messages (user_id, role, message) VALUES (?, ?, ?)",
-        (user["id"], "assistant", ai_reply)
-    )
-    db.commit()
-    db.close()
+    db.run("chat.add_message", (user["id"], "assistant", ai_reply, None))
 
     return jsonify({
         "reply": ai_reply,
@@ -51,23 +51,20 @@ def send_message():
 
 @chat_bp.route("/history", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(2)
 def get_history():
     user = request.current_user
     limit = int(request.args.get("limit", 50))
-    db = get_db()
-    rows = db.execute(
-        "SELECT * FROM chat_messages WHERE user_id = ? ORDER BY created_at ASC LIMIT ?",
-        (user["id"], limit)
-    ).fetchall()
-    db.close()
+    db = request_db()
+    rows = db.run("chat.history", (user["id"], limit)).fetchall()
     return jsonify([dict(r) for r in rows])
 
 @chat_bp.route("/clear", methods=["DELETE"])
 @require_auth
+@query_budget(2)
 def clear_history():
     user = request.current_user
-    db = get_db()
-    db.execute("DELETE FROM chat_messages WHERE user_id = ?", (user["id"],))
-    db.commit()
-    db.close()
+    db = request_db()
+    db.run("chat.clear", (user["id"],))
     return jsonify({"message": "Chat history cleared"})
@@ -1,14 +1,35 @@
+import os
+import uuid
+
 from flask import Blueprint, request, jsonify
-from database import get_db
+from config import Config
+from database import after_commit, get_db, insert_returning, request_db, tenant_shard, update_returning
 from routes.auth import require_auth
-from services.ai_service import AIService
-import json
+from replicas import read_only
+from instrumentation import query_budget
+from ratelimit import rate_limit
+from services import get_ai_service, get_engagement_model, publishing
+from services.engagement import score_drafts
+import bulk
+import queries
+import scheduler
+import tags
 
 content_bp = Blueprint("content", __name__)
-ai = AIService()
+
+# Range scan on (user_id, tag) rather than LIKE so the index serves the prefix match
+queries.define("content.hashtag_prefix", "SELECT tag, MIN(hashtag) as hashtag, COUNT(*) as count "
+               "FROM content_hashtags WHERE user_id = ? AND tag >= ? AND tag < ? "
+               "GROUP BY tag ORDER BY count DESC, tag LIMIT ?")
+queries.define("content.delete", "DELETE FROM content_items WHERE id = ? AND user_id = ?")
+queries.define("content.status", "SELECT status FROM content_items WHERE id = ? AND user_id = ?")
+
+MAX_PREDICT_DRAFTS = 500
 
 @content_bp.route("/generate", methods=["POST"])
 @require_auth
+@rate_limit("ai")
+@query_budget(1)
 def generate_content():
     data = request.get_json()
     if not data:
@@ -19,121 +40,191 @@ def generate_content():
     tone = data.get("tone", "professional")
     brand_name = data.get("brand_name", "Your Brand")
     keywords = data.get("keywords", [])
-    result = ai.generate_content(channel, content_type, topic, tone, brand_name, keywords)
+    result = get_ai_service().generate_content(channel, content_type, topic, tone, brand_name, keywords)
     return jsonify(result)
 
 @content_bp.route("/", methods=["GET"])
 @require_auth
+@read_only
+@query_budget(2)
 def list_content():
     user = request.current_user
     channel = request.args.get("channel")
     status = request.args.get("status")
     campaign_id = request.args.get("campaign_id")
-    query = "SELECT * FROM content_items WHERE user_id = ?"
-    params = [user["id"]]
+    hashtag = request.args.get("hashtag")
+    query = tags.content_select() + " WHERE ci.user_id = ?"
+    params = [user["id"], user["id"]]
     if channel:
-        query += " AND channel = ?"
+        query += " AND ci.channel = ?"
         params.append(channel)
     if status:
-        query += " AND status = ?"
+        query += " AND ci.status = ?"
         params.append(status)
     if campaign_id:
-        query += " AND campaign_id = ?"
+        query += " AND ci.campaign_id = ?"
         params.append(campaign_id)
-    query += " ORDER BY created_at DESC"
-    db = get_db()
+    if hashtag:
+        query += " AND ci.id IN (SELECT content_id FROM content_hashtags WHERE user_id = ? AND tag = ?)"
+        params += [user["id"], tags.normalize_tag(hashtag)]
+    query += " ORDER BY ci.created_at DESC"
+    db = request_db()
     rows = db.execute(query, params).fetchall()
-    db.close()
     items = []
     for r in rows:
         item = dict(r)
-        item["hashtags"] = json.loads(item.get("hashtags") or "[]")
+        item["hashtags"] = tags.split(item["hashtags"])
         items.append(item)
     return jsonify(items)
 
+@content_bp.route("/hashtags", methods=["GET"])
+@require_auth
+@query_budget(2)
+def search_hashtags():
+    user = request.current_user
+    prefix = tags.normalize_tag(request.args.get("q", ""))
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    db = request_db()
+    rows = db.run("content.hashtag_prefix", (user["id"], prefix, prefix + "\U0010ffff", limit)).fetchall()
+    return jsonify([dict(r) for r in rows])
+
 @content_bp.route("/", methods=["POST"])
 @require_auth
+@query_budget(3)
 def save_content():
     user = request.current_user
     data = request.get_json()
     if not data or not data.get("body"):
         return jsonify({"error": "Content body is required"}), 400
-    hashtags = json.dumps(data.get("hashtags", []))
-    db = get_db()
-    cursor = db.execute(
-        """INSERT INTO content_items (user_id, campaign_id, channel, content_type, title, body, tone, hashtags, status, scheduled_at)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (user["id"], data.get("campaign_id"), data.get("channel", "instagram"),
-         data.get("content_type", "social_post"), data.get("title", ""),
-         data["body"], data.get("tone", "professional"), hashtags,
-         data.get("status", "draft"), data.get("scheduled_at"))
-    )
-    db.commit()
-    new_id = cursor.lastrowid
-    row = db.execute("SELECT * FROM content_items WHERE id = ?", (new_id,)).fetchone()
-    db.close()
+    try:
+        scheduled_at = scheduler.normalize_due(data.get("scheduled_at"))
+    except ValueError:
+        return jsonify({"error": "scheduled_at must be an ISO 8601 date/time"}), 400
+    db = request_db()
+    row = insert_returning(db, "content_items", {
+        "user_id": user["id"], "campaign_id": data.get("campaign_id"),
+        "channel": data.get("channel", "instagram"), "content_type": data.get("content_type", "social_post"),
+        "title": data.get("title", ""), "body": data["body"], "tone": data.get("tone", "professional"),
+        "status": data.get("status", "draft"), "scheduled_at": scheduled_at
+    })
+    hashtag_rows = tags.content_hashtag_rows(user["id"], row["id"], data.get("hashtags", []))
+    tags.insert_content_hashtags(db, hashtag_rows)
+    if row["status"] == "scheduled":
+        after_commit(scheduler.notify)
     item = dict(row)
-    item["hashtags"] = json.loads(item.get("hashtags") or "[]")
+    item["hashtags"] = [r[2] for r in hashtag_rows]
     return jsonify(item), 201
 
+UPDATABLE_FIELDS = ("title", "body", "tone", "status", "scheduled_at")
+
 @content_bp.route("/<int:content_id>", methods=["PUT"])
 @require_auth
+@query_budget(4)
 def update_content(content_id):
     user = request.current_user
-    data = request.get_json()
-    db = get_db()
-    row = db.execute("SELECT * FROM content_items WHERE id = ? AND user_id = ?", (content_id, user["id"])).fetchone()
-    if not row:
-        db.close()
+    data = request.get_json() or {}
+    values = {k: data[k] for k in UPDATABLE_FIELDS if k in data}
+    if "scheduled_at" in values:
+        try:
+            values["scheduled_at"] = scheduler.normalize_due(values["scheduled_at"])
+        except ValueError:
+            return jsonify({"error": "scheduled_at must be an ISO 8601 date/time"}), 400
+    db = request_db()
+    updated = update_returning(db, "content_items", values, {"id": content_id, "user_id": user["id"]},
+                               touch_updated_at=True, returning=tags.hashtags_returning())
+    if not updated:
         return jsonify({"error": "Content not found"}), 404
-    hashtags = json.dumps(data.get("hashtags", json.loads(row["hashtags"] or "[]")))
-    db.execute(
-        """UPDATE content_items SET title=?, body=?, tone=?, hashtags=?, status=?, scheduled_at=?, updated_at=CURRENT_TIMESTAMP
-           WHERE id = ? AND user_id = ?""",
-        (data.get("title", row["title"]), data.get("body", row["body"]),
-         data.get("tone", row["tone"]), hashtags, data.get("status", row["status"]),
-         data.get("scheduled_at", row["scheduled_at"]), content_id, user["id"])
-    )
-    db.commit()
-    updated = db.execute("SELECT * FROM content_items WHERE id = ?", (content_id,)).fetchone()
-    db.close()
     item = dict(updated)
-    item["hashtags"] = json.loads(item.get("hashtags") or "[]")
+    if "hashtags" in data:
+        item["hashtags"] = tags.replace_content_hashtags(db, user["id"], content_id, data["hashtags"])
+    else:
+        item["hashtags"] = tags.split(item["hashtags"])
+    if item["status"] == "scheduled":
+        after_commit(scheduler.notify)
     return jsonify(item)
 
 @content_bp.route("/<int:content_id>", methods=["DELETE"])
 @require_auth
+@query_budget(2)
 def delete_content(content_id):
     user = request.current_user
-    db = get_db()
-    row = db.execute("SELECT id FROM content_items WHERE id = ? AND user_id = ?", (content_id, user["id"])).fetchone()
-    if not row:
-        db.close()
+    db = request_db()
+    cursor = db.run("content.delete", (content_id, user["id"]))
+    if cursor.rowcount == 0:
         return jsonify({"error": "Content not found"}), 404
-    db.execute("DELETE FROM content_items WHERE id = ? AND user_id = ?", (content_id, user["id"]))
-    db.commit()
-    db.close()
     return jsonify({"message": "Content deleted"})
 
 @content_bp.route("/<int:content_id>/publish", methods=["POST"])
 @require_auth
+@query_budget(3)
 def publish_content(content_id):
-    import datetime, time
     user = request.current_user
-    db = get_db()
-    row = db.execute("SELECT * FROM content_items WHERE id = ? AND user_id = ?", (content_id, user["id"])).fetchone()
-    if not row:
+    owner = f"api:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    db = get_db(tenant_shard(user))
+    try:
+        claimed = publishing.claim_content(db, owner, Config.SCHEDULER_LEASE_SECONDS,
+                                           "id = ? AND user_id = ? AND status NOT IN ('published', 'publishing')",
+                                           (content_id, user["id"]))
+        db.commit()
+        if not claimed:
+            row = db.run("content.status", (content_id, user["id"])).fetchone()
+            if row is None:
+                return jsonify({"error": "Content not found"}), 404
+            if row["status"] == "published":
+                return jsonify({"error": "Content is already published"}), 409
+            return jsonify({"error": "Content is already being published"}), 409
+        result = publishing.deliver_content(db, owner, claimed)[content_id]
+    finally:
         db.close()
-        return jsonify({"error": "Content not found"}), 404
-    published_at = datetime.datetime.now().isoformat()
-    db.execute("UPDATE content_items SET status='published', published_at=? WHERE id = ?",
-               (published_at, content_id))
-    db.commit()
-    db.close()
-    return jsonify({"message": "Content published successfully", "published_at": published_at, "status": "published"})
+    if not result.ok:
+        return jsonify({"error": f"Publishing failed: {result.error}", "status": "failed"}), 502
+    return jsonify({"message": "Content published successfully", "published_at": result.published_at,
+                    "status": "published", "external_id": result.external_id})
+
+def _draft_error(draft):
+    """What is wrong with a draft's fields for scoring, or None."""
+    for field in ("channel", "tone", "content_type", "body"):
+        if draft.get(field) is not None and not isinstance(draft[field], str):
+            return f"{field} must be a string"
+    length = draft.get("body_length")
+    if length is not None and (not isinstance(length, int) or isinstance(length, bool) or length < 0):
+        return "body_length must be a non-negative integer"
+    hashtags = draft.get("hashtags")
+    if hashtags is not None and not (
+            isinstance(hashtags, list) and all(isinstance(h, str) for h in hashtags)
+            or isinstance(hashtags, int) and not isinstance(hashtags, bool) and hashtags >= 0):
+        return "hashtags must be a list of strings or a non-negative count"
+    return None
+
+@content_bp.route("/predict", methods=["POST"])
+@require_auth
+@query_budget(1)
+def predict_engagement():
+    data = request.get_json()
+    drafts = data.get("drafts") if isinstance(data, dict) else None
+    if not isinstance(drafts, list) or not drafts or not all(isinstance(d, dict) for d in drafts):
+        return jsonify({"error": "drafts must be a non-empty list of objects"}), 400
+    if len(drafts) > MAX_PREDICT_DRAFTS:
+        return jsonify({"error": f"At most {MAX_PREDICT_DRAFTS} drafts per request"}), 400
+    checked = []
+    for i, draft in enumerate(drafts):
+        error = _draft_error(draft)
+        if error:
+            return jsonify({"error": f"drafts[{i}].{error}"}), 400
+        try:
+            checked.append({**draft, "scheduled_at": scheduler.normalize_due(draft.get("scheduled_at"))})
+        except ValueError:
+            return jsonify({"error": f"drafts[{i}].scheduled_at must be an ISO 8601 date/time"}), 400
+    predictions = score_drafts(checked, get_engagement_model().model)
+    return jsonify({"predictions": predictions})
 
 @content_bp.route("/variations", methods=["POST"])
 @require_auth
+@rate_limit("ai")
+@query_budget(1)
 def generate_variations():
     data = request.get_json()
     if not data or not data.get("topic"):
@@ -144,6 +235,30 @@ def generate_variations():
     brand = data.get("brand_name", "Your Brand")
     variations = []
     for tone in tones[:3]:
-        result = ai.generate_content(channel, "social_post", topic, tone, brand)
+        result = get_ai_service().generate_content(channel, "social_post", topic, tone, brand)
         variations.append({"tone": tone, **result})
     return jsonify({"variations": variations})
+
+@content_bp.route("/import", methods=["POST"])
+@require_auth
+@rate_limit("bulk")
+def import_content():
+    user = request.current_user
+    try:
+        fmt = bulk.request_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result = bulk.BulkImport("content_items", bulk.CONTENT_FIELDS, user["id"], tenant_shard(user)).run(
+        bulk.iter_records(request.stream, fmt))
+    return jsonify(result), 201 if result["inserted"] else 400
+
+@content_bp.route("/export", methods=["GET"])
+@require_auth
+@rate_limit("bulk")
+def export_content():
+    user = request.current_user
+    try:
+        fmt = bulk.request_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return bulk.export_response("content_items", user["id"], fmt, "content", tenant_shard(user))
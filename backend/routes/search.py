@@ -0,0 +1,33 @@
+from flask import Blueprint, request, jsonify
+from database import request_db, SEARCH_SOURCES
+from routes.auth import require_auth
+from instrumentation import query_budget
+import search
+
+search_bp = Blueprint("search", __name__)
+
+@search_bp.route("/", methods=["GET"])
+@require_auth
+@query_budget(2)
+def search_all():
+    user = request.current_user
+    text = request.args.get("q", "").strip()
+    if not search.terms(text):
+        return jsonify({"error": "q is required"}), 400
+    kinds = [k for k in request.args.get("type", "").split(",") if k]
+    unknown = sorted(set(kinds) - set(SEARCH_SOURCES))
+    if unknown:
+        return jsonify({"error": f"Unknown type: {', '.join(unknown)}"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+
+    db = request_db()
+    results, has_more = search.search(db, user["id"], text, kinds, limit, offset)
+    return jsonify({
+        "query": text,
+        "results": results,
+        "next_offset": offset + len(results) if has_more else None,
+    })
@@ -0,0 +1,285 @@
+"""Scheduled publishing for content_items.scheduled_at and calendar_events.
+
+A scheduler keeps every item due within the lookahead window in a heap ordered by due time
+(filled from partial indexes on the due columns) and sleeps until the earliest one. Due items
+are claimed in batches by moving them from 'scheduled' to 'publishing' under a lease, so any
+number of schedulers (one per gunicorn worker, or a dedicated `flask scheduler` process) can run
+against one database without publishing anything twice. Leases left by a scheduler that died
+mid-batch expire and the items go back to 'scheduled'. Content is sent through the channel
+connectors in services.publishing and ends up 'published' or 'failed'. With tenant sharding on,
+every shard is polled and each batch is claimed on the shard its items came from. The loop also
+sweeps expired refresh tokens every REFRESH_TOKEN_SWEEP_SECONDS, refreshes the SQLite read
+replicas every SQLITE_REPLICA_REFRESH_SECONDS, slides the top-content ranking windows every
+RANKINGS_ADVANCE_SECONDS and retrains the engagement model every ENGAGEMENT_RETRAIN_SECONDS
+(on a thread of its own, so publishing never waits for it).
+"""
+import datetime
+import heapq
+import logging
+import math
+import os
+import socket
+import threading
+import time
+
+from config import Config
+from database import get_db
+from instrumentation import SCHEDULER_DUE, SCHEDULER_LAG, SCHEDULER_OLDEST_DUE
+from services import engagement
+from services.publishing import claim_content, deliver_content
+import rankings
+import refresh_tokens
+import replicas
+import sharding
+
+logger = logging.getLogger(__name__)
+
+# kind -> (table, due-time expression matching its partial index)
+SOURCES = {
+    "content": ("content_items", "scheduled_at"),
+    "calendar": ("calendar_events", "event_date || 'T' || coalesce(event_time, '00:00')"),
+}
+
+def _now():
+    return datetime.datetime.now().replace(microsecond=0)
+
+def _format(dt):
+    return dt.isoformat(timespec="seconds")
+
+def normalize_due(value):
+    """Due times are stored as local 'YYYY-MM-DDTHH:MM:SS' so they order correctly as text."""
+    if value in (None, ""):
+        return None
+    dt = datetime.datetime.fromisoformat(str(value).strip())
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return _format(dt)
+
+def normalize_event_date(value):
+    """Calendar event dates are stored as 'YYYY-MM-DD' (see SOURCES["calendar"])."""
+    return datetime.date.fromisoformat(str(value).strip()).isoformat()
+
+def normalize_event_time(value):
+    """Calendar event times are stored as local 'HH:MM', or NULL for midnight."""
+    if value in (None, ""):
+        return None
+    at = datetime.time.fromisoformat(str(value).strip())
+    if at.tzinfo is not None:
+        raise ValueError("event_time must be a local time")
+    return at.isoformat(timespec="minutes")
+
+def _parse_due(value):
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+class Scheduler:
+    def __init__(self, owner=None):
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.heap = []          # (due_at, kind, shard, id)
+        self.queued = set()     # same tuples, so a rescheduled item is queued again at its new time
+        self._next_refresh = 0.0
+        self._next_sweep = 0.0
+        # SQLite snapshots only: a Postgres standby keeps itself current
+        self._next_replica_refresh = 0.0 if Config.DATABASE_TYPE == "sqlite" and replicas.enabled() else math.inf
+        self._next_rankings = 0.0 if Config.DATABASE_TYPE == "sqlite" and Config.RANKINGS_ADVANCE_SECONDS else math.inf
+        self._next_retrain = 0.0 if Config.ENGAGEMENT_RETRAIN_SECONDS else math.inf
+        self._retraining = None
+        self._saturated = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def notify(self):
+        """Something was (re)scheduled in this process: refresh now rather than at the next poll."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        logger.info("scheduler %s started", self.owner)
+        while not self._stop.is_set():
+            try:
+                timeout = self.tick()
+            except Exception:
+                logger.exception("scheduler tick failed")
+                timeout = Config.SCHEDULER_POLL_SECONDS
+            if self._wake.wait(timeout):
+                self._wake.clear()
+                self._next_refresh = 0.0
+
+    def tick(self):
+        """Refresh the heap if it is time, publish everything due; return seconds until next work."""
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        self.publish_due()
+        if Config.REFRESH_TOKEN_SWEEP_SECONDS and time.monotonic() >= self._next_sweep:
+            # Housekeeping that needs one periodic runner rides along with the scheduler
+            db = get_db()
+            try:
+                refresh_tokens.sweep(db)
+            finally:
+                db.close()
+            self._next_sweep = time.monotonic() + Config.REFRESH_TOKEN_SWEEP_SECONDS
+        if time.monotonic() >= self._next_replica_refresh:
+            replicas.refresh_due()
+            self._next_replica_refresh = time.monotonic() + Config.SQLITE_REPLICA_REFRESH_SECONDS
+        if time.monotonic() >= self._next_rankings:
+            for shard in sharding.shards():
+                db = get_db(shard)
+                try:
+                    rankings.advance(db)
+                finally:
+                    db.close()
+            self._next_rankings = time.monotonic() + Config.RANKINGS_ADVANCE_SECONDS
+        if time.monotonic() >= self._next_retrain:
+            if self._retraining is None or not self._retraining.is_alive():
+                self._retraining = threading.Thread(target=self._retrain, name="engagement-retrain", daemon=True)
+                self._retraining.start()
+            self._next_retrain = time.monotonic() + Config.ENGAGEMENT_RETRAIN_SECONDS
+        if self._saturated and not self.heap:
+            # The last refresh hit SCHEDULER_HEAP_LIMIT and has been drained: fetch the rest now
+            self._next_refresh = 0.0
+            return 0
+        until_refresh = max(min(self._next_refresh, self._next_replica_refresh, self._next_rankings,
+                                self._next_retrain) - time.monotonic(), 0)
+        if not self.heap:
+            return until_refresh
+        next_due = datetime.datetime.fromisoformat(self.heap[0][0])
+        return max(min((next_due - datetime.datetime.now()).total_seconds(), until_refresh), 0)
+
+    def _retrain(self):
+        try:
+            engagement.retrain()
+        except Exception:
+            logger.exception("retraining the engagement model failed")
+
+    def refresh(self):
+        current = _now()
+        horizon = _format(current + datetime.timedelta(seconds=Config.SCHEDULER_LOOKAHEAD_SECONDS))
+        self._saturated = False
+        overdue = {kind: [] for kind in SOURCES}
+        for shard in sharding.shards():
+            db = get_db(shard)
+            try:
+                for kind, (table, due) in SOURCES.items():
+                    db.execute(
+                        f"UPDATE {table} SET status = 'scheduled', lease_owner = NULL, lease_expires_at = NULL "
+                        f"WHERE status = 'publishing' AND lease_expires_at < ?", (_format(current),)
+                    )
+                    rows = db.execute(
+                        f"SELECT id, {due} AS due_at FROM {table} WHERE status = 'scheduled' AND {due} <= ? "
+                        f"ORDER BY {due} LIMIT ?", (horizon, Config.SCHEDULER_HEAP_LIMIT)
+                    ).fetchall()
+                    self._saturated |= len(rows) >= Config.SCHEDULER_HEAP_LIMIT
+                    rows = self._drop_unparseable(db, kind, rows)
+                    overdue[kind] += [r["due_at"] for r in rows if r["due_at"] <= _format(current)]
+                    for r in rows:
+                        entry = (r["due_at"], kind, shard, r["id"])
+                        if entry not in self.queued:
+                            self.queued.add(entry)
+                            heapq.heappush(self.heap, entry)
+                db.commit()
+            finally:
+                db.close()
+        for kind, due_times in overdue.items():
+            SCHEDULER_DUE.set((kind,), len(due_times))
+            oldest = (current - datetime.datetime.fromisoformat(min(due_times))).total_seconds() if due_times else 0
+            SCHEDULER_OLDEST_DUE.set((kind,), oldest)
+        self._next_refresh = time.monotonic() + Config.SCHEDULER_POLL_SECONDS
+
+    def _drop_unparseable(self, db, kind, rows):
+        """Fail the rows whose due time isn't a date/time (written before it was validated), so
+        they can't stop the rest of the schedule; returns the others."""
+        bad = [r["id"] for r in rows if _parse_due(r["due_at"]) is None]
+        if not bad:
+            return rows
+        table, _ = SOURCES[kind]
+        for r in rows:
+            if r["id"] in bad:
+                logger.error("%s %s has an invalid due time %r; marking it failed", table, r["id"], r["due_at"])
+        error = ", publish_error = 'invalid scheduled time'" if kind == "content" else ""
+        db.execute(f"UPDATE {table} SET status = 'failed'{error} WHERE status = 'scheduled' "
+                   f"AND id IN ({', '.join('?' for _ in bad)})", bad)
+        return [r for r in rows if r["id"] not in bad]
+
+    def publish_due(self):
+        published = 0
+        cutoff = _format(_now())
+        while self.heap and self.heap[0][0] <= cutoff:
+            batch = {}
+            for _ in range(Config.SCHEDULER_BATCH_SIZE):
+                if not self.heap or self.heap[0][0] > cutoff:
+                    break
+                entry = heapq.heappop(self.heap)
+                self.queued.discard(entry)
+                batch.setdefault((entry[2], entry[1]), []).append(entry[3])
+            for (shard, kind), ids in batch.items():
+                db = get_db(shard)
+                try:
+                    published += self._publish_batch(db, kind, ids)
+                finally:
+                    db.close()
+        return published
+
+    def _publish_batch(self, db, kind, ids):
+        table, due = SOURCES[kind]
+        cutoff = _format(_now())
+        marks = ", ".join("?" for _ in ids)
+        # Items rescheduled, unscheduled or claimed elsewhere since they were queued drop out here
+        where = f"status = 'scheduled' AND {due} <= ? AND id IN ({marks})"
+        if kind == "content":
+            claimed = claim_content(db, self.owner, Config.SCHEDULER_LEASE_SECONDS, where, (cutoff, *ids))
+            db.commit()
+            deliver_content(db, self.owner, claimed)
+            due_times = [r["scheduled_at"] for r in claimed]
+        else:
+            lease_expires_at = _now() + datetime.timedelta(seconds=Config.SCHEDULER_LEASE_SECONDS)
+            claimed = db.execute(
+                f"UPDATE calendar_events SET status = 'publishing', lease_owner = ?, lease_expires_at = ? "
+                f"WHERE {where} RETURNING id, content_id, {due} AS due_at",
+                (self.owner, _format(lease_expires_at), cutoff, *ids)
+            ).fetchall()
+            db.commit()
+            if not claimed:
+                return 0
+            # Content attached to a calendar slot goes out with it unless it is already on its way
+            linked = [r["content_id"] for r in claimed if r["content_id"] is not None]
+            if linked:
+                rows = claim_content(db, self.owner, Config.SCHEDULER_LEASE_SECONDS,
+                                     f"status NOT IN ('published', 'publishing') "
+                                     f"AND id IN ({', '.join('?' for _ in linked)})", linked)
+                db.commit()
+                deliver_content(db, self.owner, rows)
+            claimed_ids = [r["id"] for r in claimed]
+            db.execute(
+                f"UPDATE calendar_events SET status = 'published', lease_owner = NULL, lease_expires_at = NULL "
+                f"WHERE lease_owner = ? AND id IN ({', '.join('?' for _ in claimed_ids)})",
+                (self.owner, *claimed_ids)
+            )
+            db.commit()
+            due_times = [r["due_at"] for r in claimed]
+
+        finished = datetime.datetime.now()
+        for due_at in filter(None, map(_parse_due, due_times)):
+            SCHEDULER_LAG.observe((kind,), max((finished - due_at).total_seconds(), 0))
+        return len(claimed)
+
+_runner = None  # (pid, scheduler, thread) for the background scheduler of this process
+
+def start_background():
+    """Run a scheduler thread in this process. Idempotent, and safe to call again after fork."""
+    global _runner
+    if _runner is not None and _runner[0] == os.getpid() and _runner[2].is_alive():
+        return _runner[1]
+    scheduler = Scheduler()
+    thread = threading.Thread(target=scheduler.run, name="scheduler", daemon=True)
+    thread.start()
+    _runner = (os.getpid(), scheduler, thread)
+    return scheduler
+
+def notify():
+    if _runner is not None and _runner[0] == os.getpid():
+        _runner[1].notify()
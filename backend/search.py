@@ -0,0 +1,90 @@
+"""Full-text search over content, campaigns, chat history and FAQs.
+
+SQLite uses the FTS5 `search_index` table kept current by triggers; Postgres uses the generated
+`search_vector` column on each source table. Both rank with title hits weighted above body hits
+and treat the last query term as a prefix, so results update while the user types.
+"""
+import html
+import re
+
+from config import Config
+from database import SEARCH_SOURCES, search_columns
+
+TERM_RE = re.compile(r"\w+")
+MAX_TERMS = 16
+SNIPPET_TOKENS = 24
+# Private-use markers pass through highlight()/ts_headline() untouched and become <mark> after escaping
+MARK_START, MARK_END = "\ue000", "\ue001"
+
+KIND_BY_CODE = {code: kind for kind, (code, *_) in SEARCH_SOURCES.items()}
+
+def terms(text):
+    return TERM_RE.findall(text.lower())[:MAX_TERMS]
+
+def _render(fragment):
+    return html.escape(fragment or "").replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+def match_expression(user_id, words, kinds):
+    """FTS5 MATCH string; terms are \\w+ only, so quoting them is all the escaping needed."""
+    query = " ".join(f'"{w}"' for w in words) + "*"
+    expression = f'owner:"u{user_id}" AND {{title body}}: ({query})'
+    if kinds:
+        expression += f" AND kind:({' OR '.join(kinds)})"
+    return expression
+
+def search(db, user_id, text, kinds=(), limit=20, offset=0):
+    """Return (results, has_more) for one page of ranked hits."""
+    words = terms(text)
+    if not words:
+        return [], False
+    if Config.DATABASE_TYPE == "postgresql":
+        rows = _search_postgres(db, user_id, words, kinds, limit + 1, offset)
+    else:
+        rows = _search_sqlite(db, user_id, words, kinds, limit + 1, offset)
+    results = [{
+        "type": r["type"],
+        "id": r["id"],
+        "title": _render(r["title"]),
+        "snippet": _render(r["snippet"]),
+        "score": round(r["score"], 6),
+    } for r in rows[:limit]]
+    return results, len(rows) > limit
+
+def _search_sqlite(db, user_id, words, kinds, limit, offset):
+    rows = db.execute(
+        "SELECT rowid, highlight(search_index, 2, ?, ?) AS title, "
+        "snippet(search_index, 3, ?, ?, '…', ?) AS snippet, rank "
+        "FROM search_index WHERE search_index MATCH ? ORDER BY rank LIMIT ? OFFSET ?",
+        (MARK_START, MARK_END, MARK_START, MARK_END, SNIPPET_TOKENS,
+         match_expression(user_id, words, kinds), limit, offset)
+    ).fetchall()
+    return [{
+        "type": KIND_BY_CODE[r["rowid"] % 4],
+        "id": r["rowid"] // 4,
+        "title": r["title"],
+        "snippet": r["snippet"],
+        "score": -r["rank"],
+    } for r in rows]
+
+def _search_postgres(db, user_id, words, kinds, limit, offset):
+    tsquery = " & ".join(words) + ":*"
+    selects, params = [], []
+    for kind, (_, table, title, body) in SEARCH_SOURCES.items():
+        if kinds and kind not in kinds:
+            continue
+        title, body = search_columns(table, title, body)
+        selects.append(
+            f"SELECT '{kind}' AS type, id, {title or 'NULL'} AS title, {body} AS body, "
+            f"ts_rank(search_vector, to_tsquery('english', ?)) AS score "
+            f"FROM {table} WHERE user_id = ? AND search_vector @@ to_tsquery('english', ?)"
+        )
+        params += [tsquery, user_id, tsquery]
+    # Headlines are expensive, so they are built for the requested page only
+    options = f"StartSel={MARK_START}, StopSel={MARK_END}"
+    return db.execute(
+        f"SELECT type, id, ts_headline('english', coalesce(title, ''), q, '{options}, HighlightAll=true') AS title, "
+        f"ts_headline('english', body, q, '{options}, MaxFragments=1, MaxWords={SNIPPET_TOKENS}') AS snippet, score "
+        f"FROM ({' UNION ALL '.join(selects)} ORDER BY score DESC LIMIT ? OFFSET ?) hits, "
+        f"to_tsquery('english', ?) q ORDER BY score DESC",
+        (*params, limit, offset, tsquery)
+    ).fetchall()
@@ -0,0 +1,57 @@
+import os
+
+_ai_service = None
+_analytics_service = None
+_faq_indexes = None
+_publisher = None
+_password_hasher = None
+_engagement_model = None
+
+def get_ai_service():
+    global _ai_service
+    if _ai_service is None:
+        from config import Config
+        from services.ai_service import AIService
+        _ai_service = AIService(Config.RANDOM_SEED)
+    return _ai_service
+
+def get_analytics_service():
+    global _analytics_service
+    if _analytics_service is None:
+        from config import Config
+        from services.analytics_service import AnalyticsService
+        _analytics_service = AnalyticsService(Config.RANDOM_SEED)
+    return _analytics_service
+
+def get_faq_indexes():
+    global _faq_indexes
+    if _faq_indexes is None:
+        from config import Config
+        from services.faq_index import FAQIndexRegistry
+        _faq_indexes = FAQIndexRegistry(Config.FAQ_INDEX_MAX_USERS)
+    return _faq_indexes
+
+def get_publisher():
+    global _publisher
+    # The publisher's thread pool does not survive fork, so each process builds its own
+    if _publisher is None or _publisher.pid != os.getpid():
+        from services.publishing import create_publisher
+        _publisher = create_publisher()
+    return _publisher
+
+def get_password_hasher():
+    global _password_hasher
+    # Same for the hashing process pool
+    if _password_hasher is None or _password_hasher.pid != os.getpid():
+        from services.passwords import create_password_hasher
+        _password_hasher = create_password_hasher()
+    return _password_hasher
+
+def get_engagement_model():
+    global _engagement_model
+    # The holder's reload thread does not survive fork either
+    if _engagement_model is None or _engagement_model.pid != os.getpid():
+        from config import Config
+        from services.engagement import ModelHolder
+        _engagement_model = ModelHolder(Config.ENGAGEMENT_MODEL_PATH, Config.ENGAGEMENT_RELOAD_SECONDS)
+    return _engagement_model
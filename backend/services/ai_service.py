@@ -3,12 +3,17 @@ import random
 import datetime
 
 import os
-import requests
 
 from config import Config
+from instrumentation import span
+from services import get_engagement_model
+from services.engagement import score_drafts
 
 class AIService:
-    """Mocked AI service — replace inner methods with real LLM API calls."""
+    """Mocked AI service — replace inner methods with real LLM API calls.
+
+    The mocked numbers and picks come from self.random; pass a seed to make them repeatable.
+    """
 
     TONES = {
         "professional": "authoritative, data-driven, and polished",
@@ -27,6 +32,9 @@ class AIService:
         "sms": 160
     }
 
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
     # ─────────────────────────────────────────────
     # Campaign Strategy
     # ─────────────────────────────────────────────
@@ -104,7 +112,7 @@ class AIService:
                 "Budget depletion before Phase 3 if not paced",
                 "Low organic reach — supplement with paid media"
             ],
-            "ai_confidence_score": round(random.uniform(82, 97), 1)
+            "ai_confidence_score": round(self.random.uniform(82, 97), 1)
         }
 
     # ─────────────────────────────────────────────
@@ -126,21 +134,26 @@ class AIService:
 
         content = templates.get(channel, templates["instagram"])
         limit = self.CHANNEL_LIMITS.get(channel, 2200)
+        body = content["body"][:limit]
+        hashtags = content.get("hashtags", [])
+        # Estimates for the best slot of the week, from the model trained on published posts
+        best = score_drafts([{"channel": channel, "tone": tone, "content_type": content_type, "body": body,
+                              "hashtags": hashtags}], get_engagement_model().model)[0]["best_time"]
 
         return {
             "channel": channel,
             "content_type": content_type,
             "title": content.get("title", ""),
-            "body": content["body"][:limit],
-            "hashtags": content.get("hashtags", []),
+            "body": body,
+            "hashtags": hashtags,
             "cta": content.get("cta", "Learn more →"),
             "emoji_suggestions": content.get("emojis", ["🚀", "💡", "✨"]),
-            "estimated_reach": f"{random.randint(1200, 45000):,}",
-            "engagement_prediction": f"{round(random.uniform(3.2, 8.9), 1)}%",
+            "estimated_reach": f"{best['estimated_reach']:,}",
+            "engagement_prediction": f"{best['engagement_rate']}%",
             "ai_tips": [
-                f"Post on {random.choice(['Tuesday', 'Wednesday', 'Thursday'])} for best engagement",
+                f"Post on {best['weekday']} around {best['hour']}:00 for best engagement",
                 "Add a strong call-to-action in the first sentence",
-                f"Use {random.randint(3,6)} relevant hashtags for maximum reach",
+                f"Use {self.random.randint(3,6)} relevant hashtags for maximum reach",
                 "Pair with a high-contrast visual for 2× more impressions"
             ]
         }
@@ -159,19 +172,19 @@ class AIService:
         days_in_month = calendar.monthrange(year, month)[1]
 
         for day in range(1, days_in_month + 1):
-            if random.random() > 0.4:
-                num_posts = random.randint(1, 3)
+            if self.random.random() > 0.4:
+                num_posts = self.random.randint(1, 3)
                 for _ in range(num_posts):
-                    ch = random.choice(channels)
-                    idea = random.choice(content_ideas)
-                    hour = random.choice([8, 9, 12, 13, 17, 19])
+                    ch = self.random.choice(channels)
+                    idea = self.random.choice(content_ideas)
+                    hour = self.random.choice([8, 9, 12, 13, 17, 19])
                     events.append({
                         "id": len(events) + 1,
                         "title": f"{idea} — {ch.capitalize()}",
                         "event_date": f"{year}-{month:02d}-{day:02d}",
                         "event_time": f"{hour:02d}:00",
                         "channel": ch,
-                        "status": random.choice(["planned", "scheduled", "published"]),
+                        "status": self.random.choice(["planned", "scheduled", "published"]),
                         "color": colors[channels.index(ch)],
                         "description": f"AI-recommended {ch} post for {idea.lower()}"
                     })
@@ -237,7 +250,9 @@ class AIService:
         }
 
         try:
-            resp = requests.post(url, params=params, json=payload, timeout=20)
+            import requests
+            with span("llm.call"):
+                resp = requests.post(url, params=params, json=payload, timeout=20)
             resp.raise_for_status()
             data = resp.json()
 
@@ -255,14 +270,14 @@ class AIService:
         except Exception:
             return None
 
-    def generate_auto_reply(self, incoming_message, faqs=None):
+    def generate_auto_reply(self, incoming_message, faq_index=None):
         msg_lower = incoming_message.lower()
-        faqs = faqs or []
 
         # Check FAQs first
-        for faq in faqs:
-            if any(word in msg_lower for word in faq["question"].lower().split()):
-                return {"reply": faq["answer"], "source": "faq", "confidence": 0.95}
+        match = faq_index.best_match(incoming_message) if faq_index is not None else None
+        if match and match[1] >= Config.FAQ_MATCH_THRESHOLD:
+            faq, confidence = match
+            return {"reply": faq["answer"], "source": "faq", "faq_id": faq["id"], "confidence": round(confidence, 2)}
 
         if any(w in msg_lower for w in ["price", "cost", "how much", "pricing"]):
             reply = "Thanks for reaching out! Our pricing starts at $29/month. Visit our pricing page for full details, or I can connect you with our sales team. 😊"
@@ -280,7 +295,7 @@ class AIService:
         else:
             reply = f"Thanks for your message! Our team has received it and will respond shortly. In the meantime, check our Help Center at help.brand.com for instant answers. 🙏"
 
-        return {"reply": reply, "source": "ai", "confidence": round(random.uniform(0.78, 0.94), 2)}
+        return {"reply": reply, "source": "ai", "confidence": round(self.random.uniform(0.78, 0.94), 2)}
 
     # ─────────────────────────────────────────────
     # Analytics Insights
@@ -377,7 +392,7 @@ Ready to level up? Comment "GUIDE" below and we'll send it to your DMs. ⬇️
             f"Hot take: Most brands fail at {topic} because they're copying competitors instead of studying their customers.\n\nBe the brand that listens. — {brand} 🎯",
             f"If your {topic} strategy isn't generating leads, it's costing you money.\n\nFix it in 3 steps:\n1. Audit what you're posting\n2. Identify what drives clicks\n3. Rebuild around data\n\nDM for a free audit 👇"
         ]
-        return {"body": random.choice(posts), "hashtags": ["#Marketing", f"#{topic.replace(' ','')}"], "emojis": ["🧵", "🎯"]}
+        return {"body": self.random.choice(posts), "hashtags": ["#Marketing", f"#{topic.replace(' ','')}"], "emojis": ["🧵", "🎯"]}
 
     def _linkedin_post(self, topic, tone, brand, kw):
         body = f"""I spent 90 days analysing {topic} across 200+ brand campaigns. Here's what I found:
@@ -472,7 +487,7 @@ The {brand} Team
             f"🔥 {brand}: Your {topic} results are waiting. Log in now → bit.ly/dashboard. Reply STOP to opt out.",
             f"{brand} Alert: New {topic} feature is LIVE. Try it free for 7 days: bit.ly/try-now. Reply STOP to opt out."
         ]
-        return {"body": random.choice(msgs)[:160], "hashtags": [], "emojis": ["🔥"]}
+        return {"body": self.random.choice(msgs)[:160], "hashtags": [], "emojis": ["🔥"]}
 
     def _campaign_advice(self, msg):
         return f"""Great question about campaigns! Here's my strategic take:
@@ -632,7 +647,7 @@ Key principles:
 
 Is there a specific campaign or channel you're looking to improve? Give me more context and I'll give you a highly specific action plan! 🎯"""
         ]
-        return random.choice(responses)
+        return self.random.choice(responses)
 
     def _week_count(self, start_date, end_date):
         try:
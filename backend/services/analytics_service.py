@@ -1,6 +1,8 @@
 import random
 import datetime
 
+import rankings
+
 class AnalyticsService:
     CHANNELS = ["instagram", "facebook", "twitter", "linkedin", "email", "sms"]
     COLORS = {
@@ -12,92 +14,97 @@ class AnalyticsService:
         "sms": "#25D366"
     }
 
+    def __init__(self, seed=None):
+        # Seeded for repeatable figures (Config.RANDOM_SEED, benchmarks)
+        self.random = random.Random(seed)
+
     def get_overview(self, user_id):
         now = datetime.datetime.now()
         return {
-            "total_campaigns": random.randint(8, 24),
-            "active_campaigns": random.randint(3, 8),
-            "total_reach": random.randint(45000, 320000),
-            "total_impressions": random.randint(180000, 950000),
-            "total_clicks": random.randint(8000, 42000),
-            "total_conversions": random.randint(450, 3200),
-            "avg_engagement_rate": round(random.uniform(3.8, 7.2), 2),
-            "total_revenue_attributed": round(random.uniform(8500, 85000), 2),
-            "roi": round(random.uniform(180, 620), 1),
-            "content_pieces_published": random.randint(38, 140),
-            "auto_replies_sent": random.randint(120, 680),
+            "total_campaigns": self.random.randint(8, 24),
+            "active_campaigns": self.random.randint(3, 8),
+            "total_reach": self.random.randint(45000, 320000),
+            "total_impressions": self.random.randint(180000, 950000),
+            "total_clicks": self.random.randint(8000, 42000),
+            "total_conversions": self.random.randint(450, 3200),
+            "avg_engagement_rate": round(self.random.uniform(3.8, 7.2), 2),
+            "total_revenue_attributed": round(self.random.uniform(8500, 85000), 2),
+            "roi": round(self.random.uniform(180, 620), 1),
+            "content_pieces_published": self.random.randint(38, 140),
+            "auto_replies_sent": self.random.randint(120, 680),
             "growth_vs_last_month": {
-                "reach": round(random.uniform(8.2, 34.5), 1),
-                "engagement": round(random.uniform(-2.1, 18.7), 1),
-                "conversions": round(random.uniform(5.4, 42.3), 1),
-                "revenue": round(random.uniform(12.1, 55.8), 1)
+                "reach": round(self.random.uniform(8.2, 34.5), 1),
+                "engagement": round(self.random.uniform(-2.1, 18.7), 1),
+                "conversions": round(self.random.uniform(5.4, 42.3), 1),
+                "revenue": round(self.random.uniform(12.1, 55.8), 1)
             }
         }
 
     def get_engagement_timeline(self, days=30):
         data = []
         base_date = datetime.datetime.now() - datetime.timedelta(days=days)
-        base_val = random.randint(800, 2000)
+        base_val = self.random.randint(800, 2000)
         for i in range(days):
             date = base_date + datetime.timedelta(days=i)
             # Simulate realistic trend with weekday spikes
             weekday_factor = 1.3 if date.weekday() < 5 else 0.7
-            val = int(base_val * weekday_factor * random.uniform(0.85, 1.25))
-            base_val = int(base_val * random.uniform(0.97, 1.04))  # slight growth
+            val = int(base_val * weekday_factor * self.random.uniform(0.85, 1.25))
+            base_val = int(base_val * self.random.uniform(0.97, 1.04))  # slight growth
             data.append({
                 "date": date.strftime("%Y-%m-%d"),
                 "engagement": val,
-                "reach": val * random.randint(8, 15),
-                "clicks": int(val * random.uniform(0.12, 0.28)),
-                "conversions": int(val * random.uniform(0.008, 0.025))
+                "reach": val * self.random.randint(8, 15),
+                "clicks": int(val * self.random.uniform(0.12, 0.28)),
+                "conversions": int(val * self.random.uniform(0.008, 0.025))
             })
         return data
 
     def get_channel_breakdown(self):
         result = []
         for ch in self.CHANNELS:
-            eng = round(random.uniform(1.8, 9.4), 2)
-            reach = random.randint(5000, 85000)
+            eng = round(self.random.uniform(1.8, 9.4), 2)
+            reach = self.random.randint(5000, 85000)
             result.append({
                 "channel": ch,
                 "color": self.COLORS[ch],
                 "reach": reach,
-                "impressions": int(reach * random.uniform(2.5, 5.2)),
-                "clicks": int(reach * random.uniform(0.04, 0.15)),
+                "impressions": int(reach * self.random.uniform(2.5, 5.2)),
+                "clicks": int(reach * self.random.uniform(0.04, 0.15)),
                 "engagement_rate": eng,
-                "conversion_rate": round(random.uniform(0.8, 4.2), 2),
-                "posts_published": random.randint(5, 42),
-                "growth": round(random.uniform(-5.2, 28.4), 1)
+                "conversion_rate": round(self.random.uniform(0.8, 4.2), 2),
+                "posts_published": self.random.randint(5, 42),
+                "growth": round(self.random.uniform(-5.2, 28.4), 1)
             })
         return result
 
-    def get_top_content(self, limit=5):
-        types = ["Carousel Post", "Video Reel", "Story Ad", "Email Newsletter", "LinkedIn Article", "Twitter Thread", "SMS Blast"]
-        channels = self.CHANNELS
+    def get_top_content(self, db, user_id, metric="reach", window_days=30, limit=5):
+        """The user's best content over a trailing window, from the maintained rankings."""
+        rows = rankings.top(db, user_id, metric, window_days, limit)
+        leader = (rows[0][metric] or 0) if rows else 0
         items = []
-        for i in range(limit):
-            ch = random.choice(channels)
+        for i, r in enumerate(rows):
             items.append({
                 "rank": i + 1,
-                "type": random.choice(types),
-                "channel": ch,
-                "color": self.COLORS[ch],
-                "title": f"{random.choice(['Summer Sale', 'Product Launch', 'Customer Story', 'Brand Reveal', 'How-To Guide', 'Weekly Tip'])} — {ch.capitalize()}",
-                "reach": random.randint(8000, 92000),
-                "engagement_rate": round(random.uniform(4.2, 12.8), 1),
-                "clicks": random.randint(320, 4800),
-                "conversions": random.randint(18, 380),
-                "score": random.randint(72, 99)
+                "id": r["content_id"],
+                "type": (r["content_type"] or "post").replace("_", " ").title(),
+                "channel": r["channel"],
+                "color": self.COLORS.get(r["channel"], "#667eea"),
+                "title": r["title"],
+                "reach": int(r["reach"]),
+                "engagement_rate": round(r["engagement_rate"] or 0, 1),
+                "clicks": int(r["clicks"]),
+                "conversions": int(r["conversions"]),
+                # Relative to the leader on the ranking metric
+                "score": round((r[metric] or 0) / leader * 100) if leader else 0
             })
-        items.sort(key=lambda x: x["score"], reverse=True)
         return items
 
     def get_funnel_data(self):
-        awareness = random.randint(80000, 250000)
-        interest = int(awareness * random.uniform(0.25, 0.45))
-        consideration = int(interest * random.uniform(0.30, 0.55))
-        intent = int(consideration * random.uniform(0.35, 0.60))
-        conversion = int(intent * random.uniform(0.25, 0.50))
+        awareness = self.random.randint(80000, 250000)
+        interest = int(awareness * self.random.uniform(0.25, 0.45))
+        consideration = int(interest * self.random.uniform(0.30, 0.55))
+        intent = int(consideration * self.random.uniform(0.35, 0.60))
+        conversion = int(intent * self.random.uniform(0.25, 0.50))
         return [
             {"stage": "Awareness", "value": awareness, "color": "#667eea", "percent": 100},
             {"stage": "Interest", "value": interest, "color": "#764ba2", "percent": round(interest/awareness*100, 1)},
@@ -109,28 +116,28 @@ class AnalyticsService:
     def get_audience_demographics(self):
         return {
             "age_groups": [
-                {"label": "18–24", "value": random.randint(12, 22)},
-                {"label": "25–34", "value": random.randint(28, 42)},
-                {"label": "35–44", "value": random.randint(18, 28)},
-                {"label": "45–54", "value": random.randint(10, 18)},
-                {"label": "55+", "value": random.randint(5, 12)}
+                {"label": "18–24", "value": self.random.randint(12, 22)},
+                {"label": "25–34", "value": self.random.randint(28, 42)},
+                {"label": "35–44", "value": self.random.randint(18, 28)},
+                {"label": "45–54", "value": self.random.randint(10, 18)},
+                {"label": "55+", "value": self.random.randint(5, 12)}
             ],
             "gender": [
-                {"label": "Female", "value": random.randint(44, 62)},
-                {"label": "Male", "value": random.randint(35, 52)},
-                {"label": "Other", "value": random.randint(2, 6)}
+                {"label": "Female", "value": self.random.randint(44, 62)},
+                {"label": "Male", "value": self.random.randint(35, 52)},
+                {"label": "Other", "value": self.random.randint(2, 6)}
             ],
             "top_locations": [
-                {"city": "New York", "value": random.randint(12, 22)},
-                {"city": "Los Angeles", "value": random.randint(10, 18)},
-                {"city": "London", "value": random.randint(8, 15)},
-                {"city": "Toronto", "value": random.randint(6, 12)},
-                {"city": "Sydney", "value": random.randint(4, 10)}
+                {"city": "New York", "value": self.random.randint(12, 22)},
+                {"city": "Los Angeles", "value": self.random.randint(10, 18)},
+                {"city": "London", "value": self.random.randint(8, 15)},
+                {"city": "Toronto", "value": self.random.randint(6, 12)},
+                {"city": "Sydney", "value": self.random.randint(4, 10)}
             ],
             "device_split": [
-                {"label": "Mobile", "value": random.randint(58, 72)},
-                {"label": "Desktop", "value": random.randint(22, 34)},
-                {"label": "Tablet", "value": random.randint(4, 10)}
+                {"label": "Mobile", "value": self.random.randint(58, 72)},
+                {"label": "Desktop", "value": self.random.randint(22, 34)},
+                {"label": "Tablet", "value": self.random.randint(4, 10)}
             ]
         }
 
@@ -142,10 +149,10 @@ class AnalyticsService:
             for hour in hours:
                 is_weekday = day_idx < 5
                 is_peak_hour = hour in [8, 9, 12, 13, 17, 18, 19, 20]
-                base = random.randint(20, 100)
+                base = self.random.randint(20, 100)
                 if is_weekday and is_peak_hour:
-                    base = random.randint(70, 100)
+                    base = self.random.randint(70, 100)
                 elif not is_weekday:
-                    base = random.randint(10, 50)
+                    base = self.random.randint(10, 50)
                 heatmap.append({"day": day, "hour": hour, "value": base})
         return heatmap
@@ -0,0 +1,154 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+    a about an and are as at be but by can could did do does for from has have how i if in
+    is it its me my of on or our so that the their them there they this to us was we were
+    what when where which who why will with would you your
+""".split())
+
+def tokenize(text):
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        # Fold plain plurals so "prices" finds "price"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+class FAQIndex:
+    """BM25 inverted index over one user's FAQ questions, updated in place."""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}      # term -> {faq_id: term frequency}
+        self.docs = {}          # faq_id -> (faq, length, term frequencies)
+        self.total_length = 0
+        self.max_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def fingerprint(self):
+        """(count, max id) of the indexed FAQs; ids only grow, so any create or delete changes it."""
+        return len(self.docs), self.max_id
+
+    def add(self, faq):
+        tf = Counter(tokenize(faq["question"]))
+        length = sum(tf.values())
+        with self._lock:
+            self._remove(faq["id"])
+            self.docs[faq["id"]] = (faq, length, tf)
+            self.total_length += length
+            self.max_id = max(self.max_id, faq["id"])
+            for term, count in tf.items():
+                self.postings.setdefault(term, {})[faq["id"]] = count
+
+    def remove(self, faq_id):
+        with self._lock:
+            self._remove(faq_id)
+
+    def _remove(self, faq_id):
+        entry = self.docs.pop(faq_id, None)
+        if entry is None:
+            return
+        _, length, tf = entry
+        self.total_length -= length
+        for term in tf:
+            posting = self.postings[term]
+            del posting[faq_id]
+            if not posting:
+                del self.postings[term]
+        if faq_id == self.max_id:
+            self.max_id = max(self.docs, default=0)
+
+    def _idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def _term_score(self, idf, tf, length, avg_length):
+        return idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+
+    def best_match(self, text):
+        """Return (faq, confidence) for the highest-scoring FAQ, or None if no question term occurs.
+
+        Confidence is the match score as a fraction of the FAQ's score against its own question,
+        i.e. how much of the (IDF-weighted) question the message covers, in [0, 1].
+        """
+        terms = set(tokenize(text))
+        with self._lock:
+            if not self.docs or not terms:
+                return None
+            avg_length = self.total_length / len(self.docs) or 1
+            # MaxScore: take rare terms first; once no unseen FAQ could overtake the best
+            # candidate, common terms only update existing candidates instead of walking
+            # their whole posting list.
+            weighted = sorted(((self._idf(t), t) for t in terms if t in self.postings), reverse=True)
+            remaining = sum(idf for idf, _ in weighted) * (self.k1 + 1)
+            scores, best = {}, 0.0
+            for idf, term in weighted:
+                posting = self.postings[term]
+                if best < remaining:
+                    pairs = posting.items()
+                else:
+                    pairs = [(faq_id, posting[faq_id]) for faq_id in scores if faq_id in posting]
+                for faq_id, tf in pairs:
+                    score = scores.get(faq_id, 0.0) + self._term_score(idf, tf, self.docs[faq_id][1], avg_length)
+                    scores[faq_id] = score
+                    if score > best:
+                        best = score
+                remaining -= idf * (self.k1 + 1)
+            if not scores:
+                return None
+            best_id = max(scores, key=scores.get)
+            faq, length, tf = self.docs[best_id]
+            ceiling = sum(self._term_score(self._idf(t), c, length, avg_length) for t, c in tf.items())
+            return faq, min(scores[best_id] / ceiling, 1.0) if ceiling else 0.0
+
+class FAQIndexRegistry:
+    """Per-user FAQ indexes for this process, least recently used evicted first.
+
+    Each lookup compares the index fingerprint with the database so FAQs written by
+    other workers trigger a rebuild instead of stale answers.
+    """
+
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db, user_id):
+        count, max_id = db.execute(
+            "SELECT count(*), coalesce(max(id), 0) FROM faqs WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+        if index is not None and index.fingerprint == (count, max_id):
+            return index
+        index = FAQIndex()
+        if count:
+            for row in db.execute("SELECT id, question, answer FROM faqs WHERE user_id = ?", (user_id,)):
+                index.add(dict(row))
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def added(self, user_id, faq):
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.add({"id": faq["id"], "question": faq["question"], "answer": faq["answer"]})
+
+    def removed(self, user_id, faq_id):
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.remove(faq_id)
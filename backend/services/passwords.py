@@ -0,0 +1,96 @@
+"""Password hashing off the request thread.
+
+Hashes keep werkzeug's "method$salt$hash" format (scrypt through hashlib.scrypt, or pbkdf2), so
+every stored hash keeps verifying. PASSWORD_HASH_METHOD sets the algorithm and cost of new
+hashes; verifying a hash made with any other method also returns a replacement, which login
+stores, so users move to the current cost as they sign in.
+
+The work runs on a bounded process pool (PASSWORD_HASH_WORKERS per web worker, 0 = inline) so
+a login storm can't take more than that many cores, and once PASSWORD_HASH_MAX_PENDING hashes
+are waiting further logins fail fast with HasherBusy instead of queueing.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+class HasherBusy(Exception):
+    """Too many hashes queued (or one took longer than PASSWORD_HASH_TIMEOUT)."""
+
+def _full_method(method):
+    """werkzeug's method string with its defaults filled in, as it writes it into a hash."""
+    name, *args = method.split(":")
+    if name == "scrypt":
+        defaults = [str(2**15), "8", "1"]
+    elif name == "pbkdf2":
+        defaults = ["sha256", str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ":".join([name, *args, *defaults[len(args):]])
+
+def needs_rehash(hashed, method):
+    return _full_method(hashed.split("$", 1)[0]) != _full_method(method)
+
+# Module-level so the pool's worker processes can unpickle them
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+def _verify(password, hashed, method):
+    if not check_password_hash(hashed, password):
+        return False, None
+    return True, _hash(password, method) if needs_rehash(hashed, method) else None
+
+class PasswordHasher:
+    def __init__(self, method, workers, max_pending, timeout):
+        self.pid = os.getpid()
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self):
+        if not self.workers:
+            return None
+        # spawn, not fork: web workers run background threads that a forked child would inherit mid-state
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _run(self, fn, *args):
+        if self._pool is None:
+            return fn(*args)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HasherBusy(f"{self._pending} password hashes already queued")
+            self._pending += 1
+        try:
+            try:
+                return self._pool.submit(fn, *args).result(timeout=self.timeout)
+            except BrokenProcessPool:
+                logger.warning("password hashing pool died; starting a new one")
+                self._pool = self._new_pool()
+                return self._pool.submit(fn, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy(f"password hash took longer than {self.timeout}s") from None
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password, hashed):
+        """Return (matches, replacement hash or None if the stored one already uses self.method)."""
+        return self._run(_verify, password, hashed, self.method)
+
+def create_password_hasher():
+    from config import Config
+    return PasswordHasher(Config.PASSWORD_HASH_METHOD, Config.PASSWORD_HASH_WORKERS,
+                          Config.PASSWORD_HASH_MAX_PENDING, Config.PASSWORD_HASH_TIMEOUT)
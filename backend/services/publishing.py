@@ -0,0 +1,257 @@
+"""Outbound publishing: channel connectors, per-channel rate limits, retries and a worker pool.
+
+A connector sends a batch of posts to one channel and reports a PublishResult per post. The
+Publisher splits work into batches of at most `connector.max_batch`, takes tokens from the
+channel's bucket before every send, retries retryable failures with exponential backoff and
+runs batches for different channels concurrently on a thread pool. Every channel in
+AIService.CHANNEL_LIMITS starts with a StubConnector; register real ones with
+register_connector(). Rate limits are per process.
+"""
+import datetime
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from config import Config
+from instrumentation import PUBLISH_SEND_DURATION
+from services.ai_service import AIService
+import tags
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PublishResult:
+    ok: bool
+    external_id: str = None
+    error: str = None
+    retryable: bool = False
+    published_at: str = None
+
+class TransientError(Exception):
+    """The whole batch failed but may succeed later (timeouts, 5xx, throttling)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class PermanentError(Exception):
+    """The whole batch was rejected and retrying will not help (bad credentials, invalid payload)."""
+
+# ─────────────────────────────────────────────
+# Connectors
+# ─────────────────────────────────────────────
+class Connector:
+    channel = None
+    max_batch = 1
+
+    def send_batch(self, posts):
+        """Send posts (dicts with id, user_id, channel, title, body, hashtags); one PublishResult each."""
+        raise NotImplementedError
+
+class StubConnector(Connector):
+    """Accepts everything locally, optionally with simulated latency and transient failures."""
+
+    def __init__(self, channel, max_batch=1, latency=0.0, failure_rate=0.0, seed=None):
+        self.channel = channel
+        self.max_batch = max_batch
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = deque(maxlen=1000)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send_batch(self, posts):
+        if self.latency:
+            time.sleep(self.latency)
+        results = []
+        with self._lock:
+            for post in posts:
+                if self._random.random() < self.failure_rate:
+                    results.append(PublishResult(False, error="simulated failure", retryable=True))
+                    continue
+                self.sent.append(post)
+                results.append(PublishResult(True, external_id=f"stub-{self.channel}-{uuid.uuid4().hex[:12]}"))
+        return results
+
+# Email and SMS providers take bulk sends; social networks post one at a time
+STUB_BATCH_SIZES = {"email": 100, "sms": 50}
+
+def _stub_connectors():
+    return {
+        channel: StubConnector(channel, max_batch=STUB_BATCH_SIZES.get(channel, 1),
+                               latency=Config.PUBLISH_STUB_LATENCY_MS / 1000,
+                               failure_rate=Config.PUBLISH_STUB_FAILURE_RATE)
+        for channel in AIService.CHANNEL_LIMITS
+    }
+
+# channel -> Connector; channels without a registered connector get a StubConnector
+CONNECTORS = {}
+
+def register_connector(connector):
+    CONNECTORS[connector.channel] = connector
+
+# ─────────────────────────────────────────────
+# Rate limiting
+# ─────────────────────────────────────────────
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` (at most `capacity`) are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+def parse_rate_limits(spec):
+    """"twitter=1,email=100/500" -> {"twitter": (1.0, None), "email": (100.0, 500)} (posts/s, burst)."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        channel, _, value = item.partition("=")
+        rate, _, burst = value.partition("/")
+        limits[channel.strip()] = (float(rate), int(burst) if burst else None)
+    return limits
+
+# ─────────────────────────────────────────────
+# Publisher
+# ─────────────────────────────────────────────
+class Publisher:
+    def __init__(self, workers, rate_limits, default_rate, max_attempts, backoff):
+        self.pid = os.getpid()
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.rate_limits = rate_limits
+        self.default_rate = default_rate
+        self.buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="publish")
+
+    def _bucket(self, channel, batch_size):
+        with self._buckets_lock:
+            bucket = self.buckets.get(channel)
+            if bucket is None:
+                rate, burst = self.rate_limits.get(channel, (self.default_rate, None))
+                bucket = self.buckets[channel] = TokenBucket(rate, max(burst or rate, batch_size, 1))
+            return bucket
+
+    def publish(self, posts):
+        """Send posts and block until each has a final PublishResult; returns {post id: result}."""
+        results, batches = {}, {}
+        for post in posts:
+            connector = CONNECTORS.get(post["channel"])
+            limit = AIService.CHANNEL_LIMITS.get(post["channel"])
+            if connector is None:
+                results[post["id"]] = PublishResult(False, error=f"no connector for channel {post['channel']!r}")
+            elif limit is not None and len(post["body"]) > limit:
+                results[post["id"]] = PublishResult(
+                    False, error=f"body is {len(post['body'])} characters; {post['channel']} allows {limit}")
+            else:
+                batches.setdefault(post["channel"], []).append(post)
+
+        # Interleave channels so a slow or throttled channel doesn't hold up the others
+        jobs = []
+        per_channel = []
+        for channel, items in batches.items():
+            size = max(1, CONNECTORS[channel].max_batch)
+            per_channel.append([(channel, items[i:i + size]) for i in range(0, len(items), size)])
+        for batch in itertools.chain.from_iterable(itertools.zip_longest(*per_channel)):
+            if batch is not None:
+                jobs.append(self._executor.submit(self._send, *batch))
+        for job in jobs:
+            results.update(job.result())
+        return results
+
+    def _send(self, channel, posts):
+        connector = CONNECTORS[channel]
+        bucket = self._bucket(channel, max(1, connector.max_batch))
+        results, pending = {}, posts
+        for attempt in range(1, self.max_attempts + 1):
+            bucket.acquire(len(pending))
+            retry_after = None
+            start = time.perf_counter()
+            try:
+                outcomes = connector.send_batch(pending)
+            except PermanentError as e:
+                outcomes = [PublishResult(False, error=str(e)) for _ in pending]
+            except Exception as e:
+                retry_after = getattr(e, "retry_after", None)
+                outcomes = [PublishResult(False, error=str(e) or type(e).__name__, retryable=True) for _ in pending]
+            PUBLISH_SEND_DURATION.observe((channel,), time.perf_counter() - start)
+
+            retry = []
+            for post, outcome in zip(pending, outcomes):
+                if outcome.ok or not outcome.retryable or attempt == self.max_attempts:
+                    results[post["id"]] = outcome
+                else:
+                    retry.append(post)
+            if not retry:
+                break
+            pending = retry
+            delay = retry_after or min(self.backoff * 2 ** (attempt - 1), 30)
+            time.sleep(delay * random.uniform(0.8, 1.2))
+        for post_id, outcome in results.items():
+            if not outcome.ok:
+                logger.warning("publishing %s to %s failed: %s", post_id, channel, outcome.error)
+        return results
+
+def create_publisher():
+    for channel, connector in _stub_connectors().items():
+        CONNECTORS.setdefault(channel, connector)
+    return Publisher(Config.PUBLISH_WORKERS, parse_rate_limits(Config.PUBLISH_RATE_LIMITS),
+                     Config.PUBLISH_DEFAULT_RATE, Config.PUBLISH_MAX_ATTEMPTS, Config.PUBLISH_BACKOFF_SECONDS)
+
+# ─────────────────────────────────────────────
+# content_items claim / deliver
+# ─────────────────────────────────────────────
+def claim_content(db, owner, lease_seconds, where, params):
+    """Move matching content_items to 'publishing' under a lease; returns the claimed rows."""
+    lease_expires_at = datetime.datetime.now() + datetime.timedelta(seconds=lease_seconds)
+    return db.execute(
+        f"UPDATE content_items SET status = 'publishing', lease_owner = ?, lease_expires_at = ? "
+        f"WHERE {where} RETURNING {tags.hashtags_returning()}",
+        (owner, lease_expires_at.isoformat(timespec="seconds"), *params)
+    ).fetchall()
+
+def deliver_content(db, owner, rows):
+    """Publish claimed rows and record each outcome ('published' or 'failed'); returns {id: result}."""
+    if not rows:
+        return {}
+    from services import get_publisher
+    results = get_publisher().publish([{
+        "id": r["id"], "user_id": r["user_id"], "channel": r["channel"],
+        "title": r["title"], "body": r["body"], "hashtags": tags.split(r["hashtags"]),
+    } for r in rows])
+    published_at = datetime.datetime.now().isoformat()
+    for res in results.values():
+        if res.ok:
+            res.published_at = published_at
+    done = [(published_at, res.external_id, post_id, owner) for post_id, res in results.items() if res.ok]
+    failed = [(res.error, post_id, owner) for post_id, res in results.items() if not res.ok]
+    if done:
+        db.executemany(
+            "UPDATE content_items SET status = 'published', published_at = ?, external_id = ?, publish_error = NULL, "
+            "lease_owner = NULL, lease_expires_at = NULL WHERE id = ? AND lease_owner = ?", done)
+    if failed:
+        db.executemany(
+            "UPDATE content_items SET status = 'failed', publish_error = ?, "
+            "lease_owner = NULL, lease_expires_at = NULL WHERE id = ? AND lease_owner = ?", failed)
+    db.commit()
+    return results
@@ -0,0 +1,233 @@
+"""Optional per-tenant SQLite shards (SHARD_COUNT > 0).
+
+The main database (DATABASE_PATH, the "home" shard) keeps users, refresh tokens and the shard
+directory; each tenant's own rows (campaigns, content, calendar, analytics, chat, auto-reply)
+live in one shard file under SHARD_DIR, so tenants on different shards never queue behind each
+other's write lock. New users are placed on one of SHARD_COUNT hashed groups (g0, g1, ...);
+users that existed before sharding was turned on stay on "home" until moved.
+
+`flask shards move USER_ID SHARD` moves a tenant online: only that tenant is turned away (503
+with Retry-After) while its rows are copied, everyone else keeps working. A new shard name
+creates the shard, so a busy agency can get a file of its own. Each shard keeps a stub users
+row per tenant so its foreign keys still hold.
+
+Every shard allocates ids from its own range (shard number << ID_RANGE_BITS), so a tenant keeps
+its ids when it moves; a move that would collide with ids already in the target is refused.
+"""
+import logging
+import os
+import sqlite3
+import time
+
+from config import Config
+from database import HOME, get_db, init_sqlite_db, shard_path, sharding_enabled
+
+logger = logging.getLogger(__name__)
+
+ID_RANGE_BITS = 40
+
+# Tenant tables, parents before children. All carry user_id.
+TENANT_TABLES = ("campaigns", "campaign_channels", "content_items", "content_hashtags", "calendar_events",
+                 "analytics", "chat_messages", "auto_reply_rules", "faqs")
+ID_TABLES = tuple(t for t in TENANT_TABLES if t not in ("campaign_channels", "content_hashtags"))
+
+class TenantMoveError(RuntimeError):
+    pass
+
+def placement(user_id):
+    """Shard for a new user."""
+    return f"g{user_id % Config.SHARD_COUNT}" if sharding_enabled() else HOME
+
+def migrate():
+    """Create the directory and the hashed group shards; pin pre-sharding users to home."""
+    home = get_db()
+    home.executescript("""
+        CREATE TABLE IF NOT EXISTS shards (
+            name TEXT PRIMARY KEY,
+            number INTEGER NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS tenant_shards (
+            user_id INTEGER PRIMARY KEY,
+            shard TEXT NOT NULL REFERENCES shards (name),
+            moving_since TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        );
+        INSERT OR IGNORE INTO shards (name, number) VALUES ('home', 0);
+    """)
+    # Signup always records a placement, so only users from before sharding lack one
+    home.execute("INSERT OR IGNORE INTO tenant_shards (user_id, shard) SELECT id, 'home' FROM users")
+    home.commit()
+    for n in range(Config.SHARD_COUNT):
+        ensure_shard(home, f"g{n}")
+    home.close()
+
+def ensure_shard(home, name):
+    """Register shard `name` and create its file and schema if they don't exist yet."""
+    if name == HOME:
+        return
+    row = home.execute("SELECT number FROM shards WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        row = home.execute(
+            "INSERT INTO shards (name, number) SELECT ?, coalesce(max(number), 0) + 1 FROM shards RETURNING number",
+            (name,)
+        ).fetchone()
+        home.commit()
+    init_sqlite_db(name)
+    db = get_db(name)
+    # Start this shard's AUTOINCREMENT sequences in its own id range
+    start = row["number"] << ID_RANGE_BITS
+    for table in ID_TABLES:
+        db.execute("DELETE FROM sqlite_sequence WHERE name = ? AND seq < ?", (table, start))
+        db.execute("INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? "
+                   "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)", (table, start, table))
+    db.commit()
+    db.close()
+
+def shards():
+    """Names of every shard the scheduler and admin queries have to visit."""
+    if not sharding_enabled():
+        return [HOME]
+    home = get_db()
+    try:
+        return [r["name"] for r in home.execute("SELECT name FROM shards ORDER BY number")]
+    finally:
+        home.close()
+
+def add_stub(db, user_id, email, name):
+    """The users row a shard needs for its foreign keys (the real one stays in home)."""
+    db.execute("INSERT OR IGNORE INTO users (id, email, name) VALUES (?, ?, ?)", (user_id, email, name))
+
+def place_new_user(home, user_id, email, name):
+    """Record a new user's shard on `home` (the caller commits) and add its stub there."""
+    shard = placement(user_id)
+    home.execute("INSERT INTO tenant_shards (user_id, shard) VALUES (?, ?)", (user_id, shard))
+    if shard != HOME:
+        db = get_db(shard)
+        try:
+            add_stub(db, user_id, email, name)
+            db.commit()
+        finally:
+            db.close()
+
+def _columns(db, schema, table):
+    return [r[1] for r in db.execute(f"PRAGMA {schema}.table_info({table})")]
+
+def _delete_tenant(db, user_id, schema="main"):
+    for table in reversed(TENANT_TABLES):
+        db.execute(f"DELETE FROM {schema}.{table} WHERE user_id = ?", (user_id,))
+
+def move_tenant(user_id, target, grace_seconds=None):
+    """Move a tenant's rows to shard `target` and repoint the directory; returns rows copied."""
+    if not sharding_enabled():
+        raise TenantMoveError("sharding is off (SHARD_COUNT=0)")
+    grace_seconds = Config.SHARD_MOVE_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    home = get_db()
+    try:
+        user = home.execute(
+            "SELECT u.id, u.email, u.name, ts.shard FROM users u "
+            "LEFT JOIN tenant_shards ts ON ts.user_id = u.id WHERE u.id = ?", (user_id,)
+        ).fetchone()
+        if user is None:
+            raise TenantMoveError(f"no user {user_id}")
+        source = user["shard"] or HOME
+        if source == target:
+            return 0
+        ensure_shard(home, target)
+        home.execute(
+            "INSERT INTO tenant_shards (user_id, shard, moving_since) VALUES (?, ?, CURRENT_TIMESTAMP) "
+            "ON CONFLICT (user_id) DO UPDATE SET moving_since = CURRENT_TIMESTAMP", (user_id, source))
+        home.commit()
+        try:
+            # New requests for the tenant now get 503; let the ones already running finish
+            time.sleep(grace_seconds)
+            copied = _copy_tenant(user, source, target)
+            if Config.SQLITE_REPLICA_REFRESH_SECONDS:
+                # The tenant's reads may go to the target's replica as soon as the directory
+                # points there, so the replica must have the copied rows first
+                import replicas
+                replicas.refresh(target)
+        except BaseException:
+            home.execute("UPDATE tenant_shards SET moving_since = NULL WHERE user_id = ?", (user_id,))
+            home.commit()
+            raise
+        home.execute("UPDATE tenant_shards SET shard = ?, moving_since = NULL WHERE user_id = ?", (target, user_id))
+        home.commit()
+    finally:
+        home.close()
+
+    # The directory points at the target now; what is left in the source is garbage
+    db = get_db(source)
+    try:
+        _delete_tenant(db, user_id)
+        if source != HOME:
+            db.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        db.commit()
+    finally:
+        db.close()
+    logger.info("moved tenant %s from %s to %s (%d rows)", user_id, source, target, copied)
+    return copied
+
+def _copy_tenant(user, source, target):
+    user_id = user["id"]
+    db = get_db(target)
+    try:
+        db.execute("ATTACH DATABASE ? AS src", (shard_path(source),))
+        db.execute("BEGIN IMMEDIATE")
+        # Rows left in the target by an earlier move that failed half way are not live
+        _delete_tenant(db, user_id)
+        for table in ID_TABLES:
+            clash = db.execute(
+                f"SELECT s.id FROM src.{table} s JOIN main.{table} m ON m.id = s.id WHERE s.user_id = ? LIMIT 1",
+                (user_id,)
+            ).fetchone()
+            if clash is not None:
+                raise TenantMoveError(f"{table} id {clash[0]} already exists in shard {target}; "
+                                      f"move the tenant to a new shard instead")
+        if target != HOME:
+            add_stub(db, user_id, user["email"], user["name"])
+        copied = 0
+        for table in TENANT_TABLES:
+            # Column lists, not *: files migrated at different times order their columns differently
+            source_columns = set(_columns(db, "src", table))
+            columns = ", ".join(c for c in _columns(db, "main", table) if c in source_columns)
+            copied += db.execute(
+                f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM src.{table} WHERE user_id = ?",
+                (user_id,)
+            ).rowcount
+        db.commit()
+        return copied
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.execute("DETACH DATABASE src")
+        db.close()
+
+def query_all(sql, params=()):
+    """Run a read-only query on every shard; returns [(shard, rows)]."""
+    results = []
+    for shard in shards():
+        conn = sqlite3.connect(f"file:{shard_path(shard)}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            results.append((shard, conn.execute(sql, params).fetchall()))
+        finally:
+            conn.close()
+    return results
+
+def stats():
+    """Tenants, rows and file size per shard."""
+    counts = {}
+    if sharding_enabled():
+        home = get_db()
+        counts = {r["shard"]: r["tenants"] for r in home.execute(
+            "SELECT shard, count(*) AS tenants FROM tenant_shards GROUP BY shard")}
+        home.close()
+    rows = query_all(" UNION ALL ".join(f"SELECT '{t}' AS tbl, count(*) AS n FROM {t}" for t in TENANT_TABLES))
+    return [{
+        "shard": shard,
+        "tenants": counts.get(shard, 0),
+        "rows": sum(r["n"] for r in table_rows),
+        "bytes": os.path.getsize(shard_path(shard)),
+    } for shard, table_rows in rows]
@@ -0,0 +1,94 @@
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+
+from flask import send_file
+
+import compression
+from config import Config
+
+FINGERPRINT_EXTENSIONS = {".js", ".css"}
+PRECOMPRESS_EXTENSIONS = {".js", ".css", ".html", ".svg", ".json"}
+ASSET_REF_RE = re.compile(r'(src|href)="((?:js|css)/[^"?#]+)"')
+
+def _write_atomic(path, data):
+    # Several workers may build at once; the content is identical so last rename wins.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+class AssetPipeline:
+    """Builds fingerprinted, pre-compressed copies of the frontend and serves them."""
+
+    def __init__(self, source_dir, build_dir):
+        self.source_dir = os.path.abspath(source_dir)
+        self.build_dir = os.path.abspath(build_dir)
+        self.manifest = {}
+        self.files = {}
+
+    def build(self):
+        self.manifest = {}
+        self.files = {}
+        for root, _, names in os.walk(self.source_dir):
+            for name in names:
+                src = os.path.join(root, name)
+                rel = os.path.relpath(src, self.source_dir).replace(os.sep, "/")
+                if rel == "index.html":
+                    continue
+                ext = os.path.splitext(name)[1]
+                # Unhashed paths stay reachable (revalidated on every use) for pages cached before a deploy.
+                self.files[rel] = {"path": src, "mimetype": self._mimetype(rel), "immutable": False, "encodings": {}}
+                if ext not in FINGERPRINT_EXTENSIONS:
+                    continue
+                with open(src, "rb") as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                stem, _ = os.path.splitext(rel)
+                hashed = f"{stem}.{digest}{ext}"
+                self.manifest[rel] = hashed
+                self._emit(hashed, data, immutable=True, mimetype=self._mimetype(rel))
+
+        index_src = os.path.join(self.source_dir, "index.html")
+        with open(index_src, "r", encoding="utf-8") as f:
+            html = f.read()
+        html = ASSET_REF_RE.sub(lambda m: f'{m.group(1)}="{self.manifest.get(m.group(2), m.group(2))}"', html)
+        self._emit("index.html", html.encode("utf-8"), immutable=False, mimetype="text/html")
+        return self
+
+    def _mimetype(self, rel):
+        return mimetypes.guess_type(rel)[0] or "application/octet-stream"
+
+    def _emit(self, rel, data, immutable, mimetype):
+        out = os.path.join(self.build_dir, *rel.split("/"))
+        _write_atomic(out, data)
+        entry = {"path": out, "mimetype": mimetype, "immutable": immutable, "encodings": {}}
+        if os.path.splitext(rel)[1] in PRECOMPRESS_EXTENSIONS and len(data) >= Config.COMPRESS_MIN_SIZE:
+            for encoding in compression.available_encodings():
+                suffix = ".br" if encoding == "br" else ".gz"
+                _write_atomic(out + suffix, compression.encode(data, encoding))
+                entry["encodings"][encoding] = out + suffix
+        self.files[rel] = entry
+
+    def serve(self, path):
+        entry = self.files.get(path) or self.files["index.html"]
+        encoding = compression.negotiate_encoding(list(entry["encodings"]))
+        file_path = entry["encodings"][encoding] if encoding else entry["path"]
+
+        if entry["immutable"]:
+            response = send_file(file_path, mimetype=entry["mimetype"], max_age=Config.STATIC_MAX_AGE)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        else:
+            response = send_file(file_path, mimetype=entry["mimetype"], max_age=0)
+            response.cache_control.no_cache = True
+
+        response.headers.pop("Content-Disposition", None)
+        if entry["encodings"]:
+            response.vary.add("Accept-Encoding")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,84 @@
+"""Normalized list columns: campaign channels and content hashtags.
+
+Lists are stored one row per element with an explicit position and come back as a single
+aggregated column (elements joined by SEPARATOR), so reading them never involves JSON.
+"""
+from config import Config
+
+SEPARATOR = "\x1f"
+
+def split(value):
+    return value.split(SEPARATOR) if value else []
+
+def normalize_tag(hashtag):
+    return hashtag.strip().lstrip("#").lower()
+
+def _grouped(table, key, value):
+    # SQLite's group_concat keeps the order of an ordered subquery; Postgres needs it spelled out.
+    if Config.DATABASE_TYPE == "postgresql":
+        return (f"SELECT {key}, string_agg({value}, chr(31) ORDER BY position) AS agg "
+                f"FROM {table} WHERE user_id = ? GROUP BY {key}")
+    return (f"SELECT {key}, group_concat({value}, char(31)) AS agg FROM "
+            f"(SELECT {key}, {value} FROM {table} WHERE user_id = ? ORDER BY {key}, position) GROUP BY {key}")
+
+def _correlated(table, key, value, outer):
+    if Config.DATABASE_TYPE == "postgresql":
+        return f"(SELECT string_agg({value}, chr(31) ORDER BY position) FROM {table} WHERE {key} = {outer}.id)"
+    return (f"(SELECT group_concat({value}, char(31)) FROM "
+            f"(SELECT {value} FROM {table} WHERE {key} = {outer}.id ORDER BY position))")
+
+def campaigns_select():
+    """SELECT campaigns aliased `c` plus their `channels`; first parameter is the user id."""
+    return (f"SELECT c.*, ch.agg AS channels FROM campaigns c "
+            f"LEFT JOIN ({_grouped('campaign_channels', 'campaign_id', 'channel')}) ch ON ch.campaign_id = c.id")
+
+def content_select():
+    """SELECT content_items aliased `ci` plus their `hashtags`; first parameter is the user id."""
+    return (f"SELECT ci.*, ht.agg AS hashtags FROM content_items ci "
+            f"LEFT JOIN ({_grouped('content_hashtags', 'content_id', 'hashtag')}) ht ON ht.content_id = ci.id")
+
+def channels_returning():
+    return f"*, {_correlated('campaign_channels', 'campaign_id', 'channel', 'campaigns')} AS channels"
+
+def hashtags_returning():
+    return f"*, {_correlated('content_hashtags', 'content_id', 'hashtag', 'content_items')} AS hashtags"
+
+def campaign_channel_rows(user_id, campaign_id, channels):
+    seen, rows = set(), []
+    for channel in channels:
+        channel = channel.strip()
+        if channel and channel not in seen:
+            seen.add(channel)
+            rows.append((campaign_id, user_id, channel, len(rows)))
+    return rows
+
+def content_hashtag_rows(user_id, content_id, hashtags):
+    seen, rows = set(), []
+    for hashtag in hashtags:
+        tag = normalize_tag(hashtag)
+        if tag and tag not in seen:
+            seen.add(tag)
+            rows.append((content_id, user_id, hashtag.strip(), tag, len(rows)))
+    return rows
+
+def insert_campaign_channels(db, rows):
+    if rows:
+        db.executemany(
+            "INSERT INTO campaign_channels (campaign_id, user_id, channel, position) VALUES (?, ?, ?, ?)", rows)
+
+def insert_content_hashtags(db, rows):
+    if rows:
+        db.executemany(
+            "INSERT INTO content_hashtags (content_id, user_id, hashtag, tag, position) VALUES (?, ?, ?, ?, ?)", rows)
+
+def replace_campaign_channels(db, user_id, campaign_id, channels):
+    db.execute("DELETE FROM campaign_channels WHERE campaign_id = ? AND user_id = ?", (campaign_id, user_id))
+    rows = campaign_channel_rows(user_id, campaign_id, channels)
+    insert_campaign_channels(db, rows)
+    return [r[2] for r in rows]
+
+def replace_content_hashtags(db, user_id, content_id, hashtags):
+    db.execute("DELETE FROM content_hashtags WHERE content_id = ? AND user_id = ?", (content_id, user_id))
+    rows = content_hashtag_rows(user_id, content_id, hashtags)
+    insert_content_hashtags(db, rows)
+    return [r[2] for r in rows]
@@ -87,7 +87,7 @@ window.AnalyticsPage = {
       <div class="card">
         <div class="card-header"><div class="card-title">🏆 Top Content</div></div>
         <div class="flex flex-col gap-10 list-animate">
-          ${topContent.map((item,i) => `
+          ${topContent.length ? topContent.map((item,i) => `
             <div class="flex items-center gap-12" style="padding:10px;background:rgba(255,255,255,0.02);border-radius:10px">
               <span style="font-size:1.2rem;font-weight:800;color:${i===0?'#ffd200':i===1?'#c0c0c0':i===2?'#cd7f32':'var(--text-muted)'}">
                 ${["🥇","🥈","🥉","4","5"][i]}
@@ -100,7 +100,7 @@ window.AnalyticsPage = {
                 <div class="font-bold text-sm text-success">${item.engagement_rate}%</div>
                 <div class="text-xs text-muted">engagement</div>
               </div>
-            </div>`).join("")}
+            </div>`).join("") : `<div class="empty-state" style="padding:30px"><div class="empty-state-icon">📭</div><div class="empty-state-title">No published content with metrics in the last 30 days</div></div>`}
         </div>
       </div>
     </div>
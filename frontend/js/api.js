@@ -103,6 +103,69 @@ class APIClient {
   getHeatmap()                        { return this.get("/analytics/heatmap"); }
   getOptimisationTips(channelData)    { return this.post("/analytics/optimisation-tips", channelData); }
 
+  /**
+   * Live metric deltas over server-sent events. Read with fetch rather than EventSource so the
+   * Authorization header can be sent. Reconnects (resuming from Last-Event-ID) until closed or
+   * logged out; calls onEvent(type, data) for each event.
+   */
+  streamLive(onEvent, onUnavailable) {
+    const controller = new AbortController();
+    let closed = false, lastEventId = null, retry = 1000;
+    const dispatch = (block) => {
+      const event = { type: "message", data: "" };
+      for (const line of block.split("\n")) {
+        const i = line.indexOf(":");
+        if (i === 0) continue; // comment (keepalive)
+        const field = i < 0 ? line : line.slice(0, i);
+        const value = i < 0 ? "" : line.slice(i + 1).replace(/^ /, "");
+        if (field === "id") lastEventId = value;
+        else if (field === "event") event.type = value;
+        else if (field === "data") event.data += (event.data ? "\n" : "") + value;
+        else if (field === "retry") retry = parseInt(value, 10) || retry;
+      }
+      if (event.data) onEvent(event.type, JSON.parse(event.data));
+    };
+    const run = async () => {
+      while (!closed && this._token) {
+        let wait = retry;
+        try {
+          const headers = { ...this.headers, Accept: "text/event-stream" };
+          if (lastEventId) headers["Last-Event-ID"] = lastEventId;
+          const res = await fetch(`${API_BASE}/analytics/live`, { headers, credentials: "include", signal: controller.signal });
+          if (res.status === 401) {
+            const refreshRes = await fetch(`${API_BASE}/auth/refresh`, { method: "POST", credentials: "include" });
+            if (!refreshRes.ok) return;
+            this.setToken((await refreshRes.json()).access_token);
+            continue;
+          }
+          if (res.status === 501) return onUnavailable?.(); // the server's workers can't hold streams
+          if (res.ok) {
+            const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+            let buffer = "";
+            for (;;) {
+              const { value, done } = await reader.read();
+              if (done) break;
+              buffer += value.replace(/\r\n?/g, "\n");
+              let end;
+              while ((end = buffer.indexOf("\n\n")) >= 0) {
+                dispatch(buffer.slice(0, end));
+                buffer = buffer.slice(end + 2);
+              }
+            }
+          } else {
+            wait = Math.max(retry, (parseInt(res.headers.get("Retry-After"), 10) || 5) * 1000);
+          }
+        } catch (err) {
+          if (closed) return;
+          wait = Math.max(retry, 5000);
+        }
+        await new Promise(resolve => setTimeout(resolve, wait));
+      }
+    };
+    run();
+    return { close() { closed = true; controller.abort(); } };
+  }
+
   // ── Chat ──
   sendMessage(message, context = "")  { return this.post("/chat/message", { message, context }); }
   getChatHistory()                    { return this.get("/chat/history"); }
@@ -35,6 +35,8 @@ window.AppRouter = {
 
   navigate(page) {
     if (!this.pages[page]) page = "dashboard";
+    // The dashboard's live stream holds a server thread; only keep it while the dashboard is shown
+    if (page !== "dashboard") window.DashboardPage?.stopLive();
     this.currentPage = page;
     Store.set("current_page", page);
 
@@ -95,6 +95,7 @@ window.Auth = {
       API.logout();
     } catch (_) {}
     this.user = null;
+    window.DashboardPage?.stopLive();
     API.clearToken();
     Store.remove("user");
     Store.remove("current_page");
@@ -20,6 +20,7 @@ window.DashboardPage = {
       page.innerHTML = this._render(overview, campaigns, channels);
       this._initCharts(channels);
       this._animateStats(overview);
+      this._startLive();
       initRipples();
     } catch (err) {
       page.innerHTML = `<div class="empty-state"><div class="empty-state-icon">⚠️</div><div class="empty-state-title">Couldn't load dashboard</div><div class="empty-state-desc">${err.message}</div><button class="btn btn-primary mt-16" onclick="DashboardPage.loaded=false;DashboardPage.load()">Retry</button></div>`;
@@ -51,10 +52,10 @@ window.DashboardPage = {
     </div>
 
     <div class="stats-grid stagger">
-      ${this._statCard("Total Reach", ov.total_reach, "👥", "grad-primary", g.reach, "K", 1000)}
-      ${this._statCard("Impressions", ov.total_impressions, "👁️", "grad-insta", g.reach, "K", 1000)}
-      ${this._statCard("Conversions", ov.total_conversions, "⚡", "grad-green", g.conversions, "", 1)}
-      ${this._statCard("Revenue", ov.total_revenue_attributed, "💰", "grad-warm", g.revenue, "", 1, true)}
+      ${this._statCard("Total Reach", ov.total_reach, "👥", "grad-primary", g.reach, "K", 1000, false, "reach")}
+      ${this._statCard("Impressions", ov.total_impressions, "👁️", "grad-insta", g.reach, "K", 1000, false, "impressions")}
+      ${this._statCard("Conversions", ov.total_conversions, "⚡", "grad-green", g.conversions, "", 1, false, "conversions")}
+      ${this._statCard("Revenue", ov.total_revenue_attributed, "💰", "grad-warm", g.revenue, "", 1, true, "revenue")}
     </div>
 
     <div class="grid-2 mt-20">
@@ -126,7 +127,7 @@ window.DashboardPage = {
     </div>`;
   },
 
-  _statCard(label, value, icon, grad, growth, suffix, divisor, isCurrency) {
+  _statCard(label, value, icon, grad, growth, suffix, divisor, isCurrency, metric) {
     const formatted = isCurrency ? formatCurrency(value) : (value >= 1000 ? formatNumber(value) : value);
     const growthHtml = growth !== undefined
       ? `<div class="stat-change ${growth >= 0 ? 'up' : 'down'}">${growth >= 0 ? "↑" : "↓"} ${Math.abs(growth)}% vs last month</div>`
@@ -136,7 +137,7 @@ window.DashboardPage = {
         <span class="stat-icon">${icon}</span>
       </div>
       <div>
-        <div class="stat-value" data-target="${value}" data-divisor="${divisor}" data-currency="${isCurrency ? 1 : 0}">${formatted}</div>
+        <div class="stat-value" data-metric="${metric || ""}" data-target="${value}" data-divisor="${divisor}" data-currency="${isCurrency ? 1 : 0}">${formatted}</div>
         <div class="stat-label">${label}</div>
       </div>
       ${growthHtml}
@@ -187,6 +188,53 @@ window.DashboardPage = {
     });
   },
 
+  // Adds live metric deltas to the stat cards instead of re-fetching the dashboard; where the
+  // server can't hold streams, re-reads the totals every LIVE_POLL_MS instead
+  LIVE_POLL_MS: 60000,
+
+  _startLive() {
+    if (this._live || this._poll || AppRouter.currentPage !== "dashboard") return;
+    this._live = API.streamLive((type, data) => {
+      if (type === "resync") return this.load();
+      if (type !== "metrics") return;
+      for (const [metric, delta] of Object.entries(data.metrics || {})) {
+        document.querySelectorAll(`.stat-value[data-metric="${metric}"]`).forEach(el => {
+          this._setStat(el, (parseFloat(el.dataset.target) || 0) + delta);
+        });
+      }
+    }, () => {
+      this._live = null;
+      this._poll = setInterval(() => this._pollStats(), this.LIVE_POLL_MS);
+    });
+  },
+
+  async _pollStats() {
+    const ov = await API.getAnalyticsOverview().catch(() => null);
+    if (!ov) return;
+    const totals = { reach: ov.total_reach, impressions: ov.total_impressions,
+                     conversions: ov.total_conversions, revenue: ov.total_revenue_attributed };
+    for (const [metric, value] of Object.entries(totals)) {
+      document.querySelectorAll(`.stat-value[data-metric="${metric}"]`).forEach(el => {
+        if (parseFloat(el.dataset.target) !== value) this._setStat(el, value);
+      });
+    }
+  },
+
+  _setStat(el, value) {
+    el.dataset.target = value;
+    el.textContent = el.dataset.currency === "1" ? formatCurrency(value) : (value >= 1000 ? formatNumber(value) : value);
+    el.classList.remove("value-updated");
+    void el.offsetWidth; // restart the animation
+    el.classList.add("value-updated");
+  },
+
+  stopLive() {
+    this._live?.close();
+    this._live = null;
+    clearInterval(this._poll);
+    this._poll = null;
+  },
+
   _animateStats(ov) {
     setTimeout(() => {
       document.querySelectorAll(".stat-value[data-target]").forEach(el => {
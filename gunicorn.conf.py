@@ -0,0 +1,48 @@
+# Gunicorn settings, picked up automatically from the repo root.
+# Every value can be overridden from the environment (or on the command line).
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+# With --preload the app is imported in the master before gunicorn's gevent worker patches
+# the stdlib, so patch here instead (the config file is loaded first).
+if worker_class == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+elif worker_class == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+    try:
+        from psycogreen.eventlet import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+def post_fork(server, worker):
+    from database import reset_pools
+    reset_pools()
+    # Threads do not survive fork; with --preload the master's scheduler has to be restarted
+    from config import Config
+    if Config.SCHEDULER_ENABLED:
+        import scheduler
+        scheduler.start_background()
+    # Likewise the engagement model's reload thread
+    from services import get_engagement_model
+    get_engagement_model()
+    # Live update streams may only take some of this worker's threads or connections
+    import live
+    live.configure_worker(worker)